@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+import numpy as np
+
+# Разрез отчёта: (сводная таблица, столбец ключа, выражение подписи, JOIN для подписи, мера количества)
+DIMENSIONS = {
+    'day': ('sales_daily', 's.sale_date', 's.sale_date', '', 'orders_count'),
+    'employee': ('sales_daily', 's.employee_id', 'e.full_name',
+                 'LEFT JOIN employees e ON e.employee_id = s.employee_id', 'orders_count'),
+    'payment_method': ('sales_daily', 's.payment_method', 's.payment_method', '', 'orders_count'),
+    'product': ('sales_daily_products', 's.product_id', 'p.product_name',
+                'LEFT JOIN products p ON p.product_id = s.product_id', 'quantity'),
+    'category': ('sales_daily_products', 's.category_id', 'c.category_name',
+                 'LEFT JOIN product_categories c ON c.category_id = s.category_id', 'quantity'),
+}
+
+
+class SalesAnalytics:
+    """Отчёты по дневным сводкам sales_daily/sales_daily_products.
+
+    Сводки уже агрегированы по дням, поэтому запрос читает не больше
+    (дней × значений разреза) строк независимо от числа заказов, а сравнение
+    периодов считается векторно в NumPy.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def load(self, dimension, start, end):
+        """Возвращает столбцы (sale_date, key, label, revenue, count) сводки за [start, end]."""
+        table, key, label, join, measure = DIMENSIONS[dimension]
+        rows = self.db.execute_query(f"""
+            SELECT s.sale_date, {key} AS dim_key, {label} AS label,
+                   SUM(s.revenue) AS revenue, SUM(s.{measure}) AS amount
+            FROM {table} s
+            {join}
+            WHERE s.sale_date BETWEEN %s AND %s
+            GROUP BY s.sale_date, {key}, {label}
+        """, (start, end))
+        return {
+            'sale_date': np.array([row['sale_date'] for row in rows], dtype='datetime64[D]'),
+            'key': np.array([str(row['dim_key']) for row in rows], dtype=object),
+            'label': np.array([str(row['label'] if row['label'] is not None else row['dim_key'])
+                               for row in rows], dtype=object),
+            'revenue': np.array([float(row['revenue']) for row in rows], dtype=np.float64),
+            'amount': np.array([float(row['amount']) for row in rows], dtype=np.float64),
+        }
+
+    def compare_periods(self, dimension, start, end):
+        """Сравнивает [start, end] с предыдущим периодом той же длины.
+
+        Возвращает строки, отсортированные по выручке текущего периода (для разреза
+        'day' — по дате).
+        """
+        length = (end - start).days + 1
+        previous_start = start - timedelta(days=length)
+        columns = self.load(dimension, previous_start, end)
+        if not len(columns['key']):
+            return []
+
+        current = columns['sale_date'] >= np.datetime64(start)
+        if dimension == 'day':
+            # День предыдущего периода сравнивается с днём на том же месте в текущем
+            aligned = np.where(current, columns['sale_date'],
+                               columns['sale_date'] + np.timedelta64(length, 'D'))
+            columns['key'] = columns['label'] = aligned.astype(str).astype(object)
+
+        keys, first_index, inverse = np.unique(columns['key'], return_index=True, return_inverse=True)
+        size = len(keys)
+
+        revenue = np.bincount(inverse, weights=np.where(current, columns['revenue'], 0.0), minlength=size)
+        previous = np.bincount(inverse, weights=np.where(current, 0.0, columns['revenue']), minlength=size)
+        amount = np.bincount(inverse, weights=np.where(current, columns['amount'], 0.0), minlength=size)
+        delta = revenue - previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta_pct = np.where(previous != 0, delta / previous * 100.0, np.nan)
+
+        labels = columns['label'][first_index]
+        order = np.arange(size) if dimension == 'day' else np.argsort(-revenue, kind='stable')
+        return [{
+            'key': keys[i],
+            'label': labels[i],
+            'amount': int(amount[i]),
+            'current': float(revenue[i]),
+            'previous': float(previous[i]),
+            'delta': float(delta[i]),
+            'delta_pct': None if np.isnan(delta_pct[i]) else float(delta_pct[i]),
+        } for i in order]
+
+    def totals(self, start, end):
+        """Выручка и число заказов за [start, end] и за предыдущий период той же длины."""
+        length = (end - start).days + 1
+        previous_start = start - timedelta(days=length)
+        columns = self.load('day', previous_start, end)
+        current = columns['sale_date'] >= np.datetime64(start)
+        return {
+            'current': float(columns['revenue'][current].sum()),
+            'previous': float(columns['revenue'][~current].sum()),
+            'orders': int(columns['amount'][current].sum()),
+            'previous_orders': int(columns['amount'][~current].sum()),
+        }
@@ -0,0 +1,336 @@
+"""HTTP/JSON API оформления заказов поверх BookingService.
+
+    python api.py --dsn mysql://root:@localhost/chetochny --port 8080 --workers 8
+
+Запросы разбираются в цикле событий asyncio, а вызовы сервиса (запросы к базе и
+проверка паролей) выполняются в пуле из workers потоков через run_in_executor.
+Пул соединений Database того же размера, поэтому каждый поток получает своё
+соединение, а лишние запросы ждут свободный поток, не открывая новых соединений.
+"""
+import argparse
+import asyncio
+import base64
+import functools
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from urllib.parse import parse_qs, urlsplit
+
+from database import Database, OutOfStockError, SlotFullError, sql_text
+from queries import Record
+from service import BookingService, NotFound, ValidationError
+
+log = logging.getLogger('flower_shop.api')
+
+MAX_BODY = 1 << 20
+TOKEN_TTL = 12 * 3600
+
+STATUS_TEXT = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+    404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        return sql_text(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'{type(value).__name__} не сериализуется в JSON')
+
+
+def plain(value):
+    # Записи queries.Record — кортежи, и json записал бы их массивами, а не объектами
+    if isinstance(value, Record):
+        return {key: plain(item) for key, item in zip(value.keys(), value)}
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+    return value
+
+
+def encode_json(payload):
+    return json.dumps(plain(payload), ensure_ascii=False, default=json_default).encode('utf-8')
+
+
+class TokenSigner:
+    """Токены 'тип.id.срок.подпись' с подписью HMAC-SHA256; сессии на сервере не хранятся."""
+
+    def __init__(self, secret=None, ttl=TOKEN_TTL, clock=time.time):
+        secret = secret or os.environ.get('FLOWER_SHOP_API_SECRET')
+        self.secret = secret.encode('utf-8') if secret else os.urandom(32)
+        self.ttl = ttl
+        self.clock = clock
+
+    def _sign(self, payload):
+        digest = hmac.new(self.secret, payload.encode('ascii'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).decode('ascii').rstrip('=')
+
+    def issue(self, user_type, user_id):
+        payload = f'{user_type}.{user_id}.{int(self.clock() + self.ttl)}'
+        return f'{payload}.{self._sign(payload)}'
+
+    def verify(self, token):
+        payload, _, signature = (token or '').rpartition('.')
+        parts = payload.split('.')
+        if len(parts) != 3 or not hmac.compare_digest(signature, self._sign(payload)):
+            raise HttpError(401, 'Требуется вход')
+        user_type, user_id, expires = parts
+        try:
+            user_id, expires = int(user_id), int(expires)
+        except ValueError:
+            raise HttpError(401, 'Требуется вход')
+        if expires < self.clock():
+            raise HttpError(401, 'Срок действия входа истёк')
+        return user_type, user_id
+
+
+async def read_request(reader):
+    """Очередной запрос соединения или None, если клиент закрыл его между запросами."""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise HttpError(400, 'Неполный запрос')
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, 'Слишком длинные заголовки')
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(400, 'Некорректная строка запроса')
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HttpError(400, 'Некорректный Content-Length')
+    if length < 0:
+        raise HttpError(400, 'Некорректный Content-Length')
+    if length > MAX_BODY:
+        raise HttpError(413, 'Слишком большой запрос')
+    body = await reader.readexactly(length) if length else b''
+
+    url = urlsplit(target)
+    return {
+        'method': method.upper(),
+        'path': url.path,
+        'query': {key: values[-1] for key, values in parse_qs(url.query).items()},
+        'headers': headers,
+        'body': body,
+        'keep_alive': headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1',
+    }
+
+
+def write_response(writer, status, payload, keep_alive):
+    body = encode_json(payload)
+    head = (f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+            f'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    writer.write(head.encode('latin-1') + body)
+
+
+def json_body(request):
+    try:
+        body = json.loads(request['body'] or b'{}')
+    except ValueError:
+        raise HttpError(400, 'Тело запроса должно быть JSON')
+    if not isinstance(body, dict):
+        raise HttpError(400, 'Тело запроса должно быть JSON-объектом')
+    return body
+
+
+class BookingApi:
+    def __init__(self, service, workers=8, secret=None):
+        self.service = service
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+        self.tokens = TokenSigner(secret)
+        self.routes = [
+            ('GET', re.compile(r'/api/health'), self.health),
+            ('POST', re.compile(r'/api/login'), self.login),
+            ('GET', re.compile(r'/api/products'), self.products),
+            ('GET', re.compile(r'/api/compositions'), self.compositions),
+            ('GET', re.compile(r'/api/slots'), self.slots),
+            ('GET', re.compile(r'/api/orders'), self.orders),
+            ('POST', re.compile(r'/api/orders'), self.create_order),
+            ('GET', re.compile(r'/api/orders/(\d+)'), self.order),
+            ('GET', re.compile(r'/api/me/stats'), self.stats),
+            ('GET', re.compile(r'/api/metrics'), self.metrics),
+        ]
+
+    async def call(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
+    async def start(self, host='127.0.0.1', port=8080):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await self.start(host, port)
+        log.info('API слушает %s', ', '.join(str(sock.getsockname()) for sock in server.sockets))
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    write_response(writer, e.status, {'error': e.message}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                status, payload = await self.dispatch(request)
+                write_response(writer, status, payload, request['keep_alive'])
+                await writer.drain()
+                if not request['keep_alive']:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        try:
+            allowed = False
+            for method, pattern, handler in self.routes:
+                match = pattern.fullmatch(request['path'])
+                if match:
+                    allowed = True
+                    if method == request['method']:
+                        return await handler(request, *match.groups())
+            raise HttpError(405 if allowed else 404, 'Метод не поддерживается' if allowed else 'Не найдено')
+        except HttpError as e:
+            return e.status, {'error': e.message}
+        except ValidationError as e:
+            return 400, {'error': str(e)}
+        except NotFound as e:
+            return 404, {'error': str(e)}
+        except (SlotFullError, OutOfStockError) as e:
+            return 409, {'error': str(e)}
+        except Exception:
+            log.exception('Ошибка обработки %s %s', request['method'], request['path'])
+            return 500, {'error': 'Внутренняя ошибка сервера'}
+
+    def authorize(self, request):
+        scheme, _, token = request['headers'].get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer':
+            raise HttpError(401, 'Требуется вход')
+        return self.tokens.verify(token)
+
+    def customer_id(self, request):
+        user_type, user_id = self.authorize(request)
+        if user_type != 'customer':
+            raise HttpError(403, 'Доступно только клиентам')
+        return user_id
+
+    async def health(self, request):
+        return 200, {'status': 'ok'}
+
+    async def login(self, request):
+        body = json_body(request)
+        result = await self.call(self.service.login, body.get('email'), body.get('password'))
+        if not result:
+            raise HttpError(401, 'Неверный логин или пароль')
+        user, user_type = result
+        user_id = user['employee_id'] if user_type == 'admin' else user['customer_id']
+        return 200, {'token': self.tokens.issue(user_type, user_id), 'user_type': user_type, 'user': user}
+
+    async def products(self, request):
+        query = request['query']
+        return 200, await self.call(self.service.search_products, query.get('q', ''), query.get('limit'))
+
+    async def compositions(self, request):
+        return 200, await self.call(self.service.compositions)
+
+    async def slots(self, request):
+        if 'date' not in request['query']:
+            raise HttpError(400, 'Укажите date=ГГГГ-ММ-ДД')
+        return 200, await self.call(self.service.available_slots, request['query']['date'])
+
+    async def orders(self, request):
+        customer_id = self.customer_id(request)
+        query = request['query']
+        after = None
+        if 'after_date' in query and 'after_id' in query:
+            after = (query['after_date'], query['after_id'])
+        return 200, await self.call(self.service.order_history, customer_id, query.get('limit'), after)
+
+    async def create_order(self, request):
+        customer_id = self.customer_id(request)
+        body = json_body(request)
+        order_id = await self.call(self.service.place_order, customer_id, body.get('delivery_date'),
+                                   body.get('slot_start'), body.get('delivery_address'),
+                                   body.get('payment_method'), body.get('items') or [])
+        return 201, {'order_id': order_id}
+
+    async def order(self, request, order_id):
+        user_type, user_id = self.authorize(request)
+        customer_id = None if user_type == 'admin' else user_id
+        return 200, await self.call(self.service.get_order, int(order_id), customer_id)
+
+    async def stats(self, request):
+        return 200, await self.call(self.service.customer_stats, self.customer_id(request))
+
+    async def metrics(self, request):
+        # Метрики SQL-запросов процесса; только для сотрудников
+        user_type, _ = self.authorize(request)
+        if user_type != 'admin':
+            raise HttpError(403, 'Доступно только сотрудникам')
+        top = request['query'].get('top')
+        return 200, self.service.db.metrics.snapshot(int(top) if top and top.isdigit() else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP/JSON API оформления заказов')
+    parser.add_argument('--dsn', help='DSN базы данных (по умолчанию FLOWER_SHOP_DSN)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=8, help='потоков для запросов к базе')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    db = Database(args.dsn, min_size=1, max_size=args.workers)
+    api = BookingApi(BookingService(db), workers=args.workers)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+        db.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
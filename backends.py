@@ -0,0 +1,264 @@
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from urllib.parse import urlparse, unquote
+
+import pymysql
+
+SQLITE_SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'flower_shop_sqlite.sql')
+
+# Коды pymysql, означающие потерю связи с сервером, а не ошибку запроса
+MYSQL_DISCONNECT_ERRORS = (2003, 2006, 2013, 2055)
+# Взаимоблокировка и таймаут ожидания блокировки: транзакцию можно повторить
+MYSQL_LOCK_ERRORS = (1213, 1205)
+
+
+def parse_dsn(dsn):
+    url = urlparse(dsn)
+    if url.scheme != 'mysql':
+        raise ValueError(f'Неподдерживаемая схема DSN: {url.scheme}')
+    return {
+        'host': url.hostname or 'localhost',
+        'port': url.port or 3306,
+        'user': unquote(url.username or 'root'),
+        'password': unquote(url.password or ''),
+        'database': url.path.lstrip('/'),
+    }
+
+
+def sqlite_path(dsn):
+    # sqlite:///shop.db — путь относительно текущего каталога, sqlite:////var/shop.db — абсолютный
+    url = urlparse(dsn)
+    path = unquote(url.path)
+    return path[1:] if path.startswith('/') else path
+
+
+def backend_for_dsn(dsn):
+    scheme = urlparse(dsn).scheme
+    if scheme == 'mysql':
+        return MySQLBackend(dsn)
+    if scheme == 'sqlite':
+        return SQLiteBackend(sqlite_path(dsn))
+    raise ValueError(f'Неподдерживаемая схема DSN: {scheme}')
+
+
+class MySQLBackend:
+    """Соединения pymysql со строками-словарями в режиме autocommit."""
+
+    name = 'mysql'
+    # Ошибки, после которых соединение нельзя возвращать в пул
+    broken_errors = (pymysql.err.OperationalError,)
+    # Класс курсора со строками-кортежами для conn.cursor(), см. Database.run
+    tuple_cursor = pymysql.cursors.Cursor
+
+    def __init__(self, dsn):
+        self.params = parse_dsn(dsn)
+
+    def connect(self):
+        return pymysql.connect(
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            autocommit=True,
+            **self.params
+        )
+
+    def ping(self, conn):
+        conn.ping(reconnect=True)
+
+    def is_disconnect(self, error):
+        return (isinstance(error, (pymysql.err.OperationalError, pymysql.err.InterfaceError))
+                and bool(error.args) and error.args[0] in MYSQL_DISCONNECT_ERRORS)
+
+    def is_lock_conflict(self, error):
+        return (isinstance(error, pymysql.err.OperationalError)
+                and bool(error.args) and error.args[0] in MYSQL_LOCK_ERRORS)
+
+    def initialize(self):
+        # Схема MySQL создаётся из flower_shop.txt и обновляется migrate.py
+        pass
+
+
+def _adapt_time(value):
+    seconds = int(value.total_seconds())
+    return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+def _convert_time(value):
+    hours, minutes, seconds = (int(float(part)) for part in value.decode().split(':'))
+    return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+
+
+def _convert_datetime(value):
+    text = value.decode()
+    return datetime.fromisoformat(text) if ' ' in text or 'T' in text else datetime.fromisoformat(text + ' 00:00:00')
+
+
+# Значения хранятся в том же виде, в каком их возвращает MySQL через pymysql:
+# DATE -> date, DATETIME -> datetime, TIME -> timedelta, DECIMAL -> Decimal
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(timedelta, _adapt_time)
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()[:10]))
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIME', _convert_time)
+sqlite3.register_converter('DECIMAL', lambda value: Decimal(value.decode()).quantize(Decimal('0.01')))
+
+SQLITE_REWRITES = [
+    (re.compile(r'^\s*EXPLAIN\s+(?!QUERY\b)', re.IGNORECASE), 'EXPLAIN QUERY PLAN '),
+    (re.compile(r'\bNOW\(\)', re.IGNORECASE), "datetime('now', 'localtime')"),
+    (re.compile(r'\bCURDATE\(\)', re.IGNORECASE), "date('now', 'localtime')"),
+    (re.compile(r'\bGREATEST\(', re.IGNORECASE), 'MAX('),
+    (re.compile(r'\bLEAST\(', re.IGNORECASE), 'MIN('),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.IGNORECASE), 'INSERT OR IGNORE'),
+    (re.compile(r'\s+FOR\s+UPDATE\b', re.IGNORECASE), ''),
+    # В MySQL обратная косая черта экранирует % и _ в LIKE по умолчанию, в SQLite — только с ESCAPE
+    (re.compile(r'\bLIKE\s+%s', re.IGNORECASE), r"LIKE %s ESCAPE '\\'"),
+]
+ON_DUPLICATE_RE = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.IGNORECASE)
+VALUES_FUNCTION_RE = re.compile(r'\bVALUES\((\w+)\)', re.IGNORECASE)
+QUALIFIED_TARGET_RE = re.compile(r'(^|,)(\s*)\w+\.(\w+)(\s*=)')
+
+
+@lru_cache(maxsize=1024)
+def translate_sql(sql):
+    """Переводит SQL в диалекте MySQL, который использует Database, в диалект SQLite.
+
+    Результат кэшируется, поэтому один и тот же текст запроса попадает в кэш
+    подготовленных выражений sqlite3 соединения и повторно не компилируется.
+    """
+    for pattern, replacement in SQLITE_REWRITES:
+        sql = pattern.sub(replacement, sql)
+
+    match = ON_DUPLICATE_RE.search(sql)
+    if match:
+        assignments = VALUES_FUNCTION_RE.sub(r'excluded.\1', sql[match.end():])
+        # В DO UPDATE SET столбцы слева от = не квалифицируются именем таблицы
+        assignments = QUALIFIED_TARGET_RE.sub(r'\1\2\3\4', assignments)
+        sql = sql[:match.start()] + 'ON CONFLICT DO UPDATE SET' + assignments
+
+    return sql.replace('%s', '?')
+
+
+def dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._cursor.close()
+
+    def execute(self, sql, params=None):
+        self._cursor.execute(translate_sql(sql), tuple(params) if params else ())
+        return self._cursor.rowcount
+
+    def executemany(self, sql, rows):
+        self._cursor.executemany(translate_sql(sql), [tuple(row) for row in rows])
+        return self._cursor.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+
+class SQLiteTupleCursor(SQLiteCursor):
+    def __init__(self, cursor):
+        cursor.row_factory = None
+        super().__init__(cursor)
+
+
+class SQLiteConnection:
+    """Соединение sqlite3 с интерфейсом соединения pymysql, которым пользуется Database."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def cursor(self, cursor=SQLiteCursor):
+        return cursor(self.raw.cursor())
+
+    def begin(self):
+        # IMMEDIATE сразу берёт блокировку записи: транзакции заказов в SQLite
+        # выполняются по очереди, как строки под SELECT ... FOR UPDATE в MySQL
+        self.raw.execute('BEGIN IMMEDIATE')
+
+    def commit(self):
+        if self.raw.in_transaction:
+            self.raw.commit()
+
+    def rollback(self):
+        if self.raw.in_transaction:
+            self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteBackend:
+    """Встроенная база SQLite в режиме WAL для тестов, бенчмарков и офлайн-очереди."""
+
+    name = 'sqlite'
+    broken_errors = ()
+    tuple_cursor = SQLiteTupleCursor
+
+    def __init__(self, path, schema_path=SQLITE_SCHEMA_PATH, busy_timeout=10):
+        self.path = path
+        self.schema_path = schema_path
+        self.busy_timeout = busy_timeout
+
+    def connect(self):
+        raw = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                              detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False,
+                              cached_statements=256)
+        raw.row_factory = dict_row
+        raw.execute('PRAGMA journal_mode = WAL')
+        raw.execute('PRAGMA synchronous = NORMAL')
+        raw.execute('PRAGMA foreign_keys = ON')
+        return SQLiteConnection(raw)
+
+    def ping(self, conn):
+        pass
+
+    def is_disconnect(self, error):
+        return False
+
+    def is_lock_conflict(self, error):
+        # 'database is locked' / 'database table is locked' после истечения busy_timeout
+        return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+    def initialize(self):
+        # Схема создаётся при первом подключении; все CREATE в файле идемпотентны
+        if not self.schema_path:
+            return
+        with open(self.schema_path, encoding='utf-8') as f:
+            script = f.read()
+        conn = self.connect()
+        try:
+            conn.raw.executescript(script)
+        finally:
+            conn.close()
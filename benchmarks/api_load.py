@@ -0,0 +1,144 @@
+"""Нагрузочный тест HTTP API: запросы в секунду и задержки по сценариям.
+
+Каждое виртуальное соединение входит под клиентом и затем в цикле смотрит
+свободные интервалы, ищет товары, листает историю и с вероятностью
+--order-ratio оформляет заказ. С --serve API поднимается в этом же процессе
+поверх --dsn; заказы создаются по-настоящему, поэтому нужна отдельная тестовая база.
+
+    python -m benchmarks.api_load --serve --dsn mysql://root:@localhost/chetochny_bench \\
+        --email client@example.com --password secret --connections 32 --duration 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from urllib.parse import quote, urlsplit
+
+from benchmarks.results import percentile
+
+
+async def http(reader, writer, method, path, body=None, token=None):
+    payload = json.dumps(body).encode('utf-8') if body is not None else b''
+    head = (f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(payload)}\r\n')
+    if token:
+        head += f'Authorization: Bearer {token}\r\n'
+    writer.write(head.encode('latin-1') + b'\r\n' + payload)
+    await writer.drain()
+
+    response = await reader.readuntil(b'\r\n\r\n')
+    lines = response.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    data = await reader.readexactly(length) if length else b''
+    return status, json.loads(data) if data else None
+
+
+async def virtual_user(host, port, args, deadline, seed, latencies, statuses):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def timed(name, method, path, body=None, token=None):
+        started = time.perf_counter()
+        status, data = await http(reader, writer, method, path, body, token)
+        latencies[name].append(time.perf_counter() - started)
+        statuses[name][status] += 1
+        return status, data
+
+    try:
+        status, data = await timed('login', 'POST', '/api/login',
+                                   {'email': args.email, 'password': args.password})
+        if status != 200:
+            raise SystemExit(f'Вход не удался: {status} {data}')
+        token = data['token']
+        _, products = await timed('products', 'GET', '/api/products?limit=50')
+        if not products:
+            raise SystemExit('В базе нет товаров')
+
+        while time.perf_counter() < deadline:
+            day = (date.today() + timedelta(days=rng.randint(1, args.days))).isoformat()
+            _, slots = await timed('slots', 'GET', f'/api/slots?date={day}')
+            await timed('products', 'GET', f'/api/products?q={quote(rng.choice(products)["product_name"][:2])}')
+            await timed('history', 'GET', '/api/orders?limit=20', token=token)
+
+            if slots and rng.random() < args.order_ratio:
+                lines = rng.sample(products, min(rng.randint(1, 3), len(products)))
+                await timed('order', 'POST', '/api/orders', {
+                    'delivery_date': day,
+                    'slot_start': rng.choice(slots)['slot_start'],
+                    'delivery_address': 'Нагрузочный тест',
+                    'payment_method': 'Карта',
+                    'items': [{'product_id': p['product_id'], 'quantity': rng.randint(1, 3)} for p in lines],
+                }, token)
+    finally:
+        writer.close()
+
+
+async def run(args):
+    server = api = db = None
+    if args.serve:
+        from api import BookingApi
+        from database import Database
+        from service import BookingService
+
+        db = Database(args.dsn, min_size=args.workers, max_size=args.workers)
+        api = BookingApi(BookingService(db), workers=args.workers)
+        server = await api.start('127.0.0.1', 0)
+        host, port = server.sockets[0].getsockname()[:2]
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    started = time.perf_counter()
+    deadline = started + args.duration
+    try:
+        await asyncio.gather(*(virtual_user(host, port, args, deadline, args.seed + i, latencies, statuses)
+                               for i in range(args.connections)))
+    finally:
+        wall = time.perf_counter() - started
+        if server:
+            server.close()
+            await server.wait_closed()
+            api.close()
+            db.disconnect()
+
+    total = sum(len(values) for values in latencies.values())
+    print(f'Соединений: {args.connections}, запросов: {total} за {wall:.1f} с, {total / wall:.1f} запросов/с')
+    print(f'{"сценарий":>10} {"запросов":>9} {"в сек":>8} {"p50, мс":>8} {"p95, мс":>8} {"p99, мс":>8}  статусы')
+    for name, values in sorted(latencies.items()):
+        codes = ' '.join(f'{code}:{count}' for code, count in sorted(statuses[name].items()))
+        print(f'{name:>10} {len(values):>9} {len(values) / wall:>8.1f} '
+              f'{percentile(values, 0.5) * 1000:>8.1f} {percentile(values, 0.95) * 1000:>8.1f} '
+              f'{percentile(values, 0.99) * 1000:>8.1f}  {codes}')
+    errors = sum(count for counter in statuses.values() for code, count in counter.items() if code >= 500)
+    return 0 if errors == 0 else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='адрес уже запущенного API')
+    parser.add_argument('--serve', action='store_true', help='поднять API в этом процессе поверх --dsn')
+    parser.add_argument('--dsn', help='DSN тестовой базы для --serve (по умолчанию FLOWER_SHOP_DSN)')
+    parser.add_argument('--workers', type=int, default=8, help='потоков API для --serve')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help='секунд')
+    parser.add_argument('--order-ratio', type=float, default=0.1, help='доля итераций с оформлением заказа')
+    parser.add_argument('--days', type=int, default=14, help='на сколько дней вперёд выбирать дату доставки')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+"""Генератор синтетических данных для бенчмарков: от тысяч до миллионов строк.
+
+Данные воспроизводимы: одни и те же --seed и размеры дают одни и те же строки.
+Строки вставляются пакетами (executemany) с явными первичными ключами, а сводки
+customer_stats, sales_daily* и delivery_slot_usage после загрузки пересчитываются
+целиком. Остатки на складе и вместимость интервалов доставки ставятся большими,
+чтобы бенчмарк create_order не упирался в OutOfStockError и SlotFullError.
+Запускать только на отдельной базе.
+
+    python -m benchmarks.datagen --dsn sqlite:///bench.db --scale 1
+    python -m benchmarks.datagen --dsn mysql://root:@localhost/chetochny_bench --scale 10
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from credentials import hash_password
+from database import CANCELLED_STATUS, COMPLETED_STATUS, Database
+
+# Размеры при --scale 1; при --scale 10 заказов 2 млн, строк заказов около 6 млн
+BASE_SIZES = {'customers': 20000, 'products': 2000, 'orders': 200000}
+
+PRODUCT_WORDS = ('Роза', 'Тюльпан', 'Лилия', 'Хризантема', 'Пион', 'Орхидея', 'Гербера', 'Гортензия',
+                 'Ромашка', 'Эустома', 'Фикус', 'Монстера', 'Кактус', 'Сукулент', 'Букет', 'Корзина')
+LAST_NAMES = ('Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов',
+              'Михайлов', 'Новиков', 'Фёдоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семёнов')
+FIRST_NAMES = ('Иван', 'Сергей', 'Анна', 'Мария', 'Алексей', 'Ольга', 'Дмитрий', 'Елена',
+               'Андрей', 'Наталья', 'Михаил', 'Татьяна', 'Николай', 'Ирина', 'Павел', 'Светлана')
+SOURCES = ('Реклама', 'Сайт', 'Рекомендация', 'Соцсети', 'Повторный')
+POSITIONS = ('Менеджер', 'Флорист', 'Кассир', 'Курьер')
+PAYMENT_METHODS = ('Карта', 'Наличные', 'Онлайн')
+STATUSES = (COMPLETED_STATUS, 'В обработке', CANCELLED_STATUS)
+STATUS_WEIGHTS = (0.85, 0.05, 0.10)
+SLOT_HOURS = np.arange(9, 18)
+
+
+def next_id(db, table, id_column):
+    return db.execute_query(f"SELECT COALESCE(MAX({id_column}), 0) AS max_id FROM {table}")[0]['max_id'] + 1
+
+
+def insert_rows(db, table, columns, rows, chunk):
+    query = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    for start in range(0, len(rows), chunk):
+        with db.transaction() as cursor:
+            cursor.executemany(query, rows[start:start + chunk])
+    return len(rows)
+
+
+def skewed(rng, size, count, first_id):
+    # Популярные клиенты и товары встречаются чаще: квадрат равномерного распределения
+    return (first_id + (count * rng.random(size) ** 2).astype(np.int64)).tolist()
+
+
+class DataGenerator:
+    def __init__(self, db, customers, products, orders, items_per_order=3, compositions=None,
+                 employees=20, categories=12, days=365, stock=10 ** 9, slot_capacity=10 ** 6,
+                 password='bench', seed=1, chunk=10000, log=print):
+        self.db = db
+        self.sizes = {'customers': customers, 'products': products, 'orders': orders,
+                      'compositions': compositions if compositions is not None else max(1, products // 10),
+                      'employees': employees, 'categories': categories}
+        self.items_per_order = items_per_order
+        self.days = days
+        self.stock = stock
+        self.slot_capacity = slot_capacity
+        self.password = password
+        self.rng = np.random.default_rng(seed)
+        self.chunk = chunk
+        self.log = log
+        self.timings = {}
+
+    def timed(self, table, fn):
+        started = time.perf_counter()
+        rows = fn()
+        elapsed = time.perf_counter() - started
+        self.timings[table] = {'rows': rows, 'seconds': elapsed}
+        self.log(f'{table:>22} {rows:>10} строк {elapsed:>8.1f} с {rows / elapsed if elapsed else 0:>10.0f} строк/с')
+        return rows
+
+    def run(self):
+        stored = hash_password(self.password)
+        self.timed('product_categories', self.categories)
+        self.timed('products + inventory', self.products)
+        self.timed('employees', lambda: self.people('employees', stored))
+        self.timed('customers', lambda: self.people('customers', stored))
+        self.timed('compositions', self.compositions)
+        self.timed('orders + lines', self.orders)
+        self.timed('сводки', self.refresh)
+        return self.timings
+
+    def categories(self):
+        self.category_first = next_id(self.db, 'product_categories', 'category_id')
+        rows = [(self.category_first + i, f'Категория {i + 1}', None) for i in range(self.sizes['categories'])]
+        return insert_rows(self.db, 'product_categories', ('category_id', 'category_name', 'description'),
+                           rows, self.chunk)
+
+    def products(self):
+        count = self.sizes['products']
+        self.product_first = next_id(self.db, 'products', 'product_id')
+        categories = self.rng.integers(0, self.sizes['categories'], count) + self.category_first
+        words = self.rng.integers(0, len(PRODUCT_WORDS), count)
+        self.product_prices = np.round(self.rng.integers(50, 5000, count) + self.rng.choice([0, 0.5], count), 2)
+        rows = [(self.product_first + i, int(categories[i]), f'{PRODUCT_WORDS[words[i]]} {i + 1}',
+                 None, float(self.product_prices[i]), 'шт', None) for i in range(count)]
+        insert_rows(self.db, 'products', ('product_id', 'category_id', 'product_name', 'description',
+                                          'price', 'unit', 'photo_url'), rows, self.chunk)
+        thresholds = self.rng.integers(0, 20, count)
+        stock_rows = [(self.product_first + i, self.stock, int(thresholds[i]), date.today())
+                      for i in range(count)]
+        insert_rows(self.db, 'inventory', ('product_id', 'quantity_in_stock', 'min_quantity_threshold',
+                                           'last_restock_date'), stock_rows, self.chunk)
+        return count * 2
+
+    def people(self, table, stored):
+        count = self.sizes[table]
+        id_column = 'employee_id' if table == 'employees' else 'customer_id'
+        first = next_id(self.db, table, id_column)
+        setattr(self, f'{table}_first', first)
+        last_names = self.rng.integers(0, len(LAST_NAMES), count)
+        first_names = self.rng.integers(0, len(FIRST_NAMES), count)
+        joined = self.rng.integers(0, 5 * 365, count)
+        today = date.today()
+        rows = []
+        for i in range(count):
+            name = f'{LAST_NAMES[last_names[i]]} {FIRST_NAMES[first_names[i]]} {first + i}'
+            phone = f'79{(first + i) % 10 ** 9:09d}'
+            email = f'{table[:-1]}{first + i}@bench.local'
+            since = today - timedelta(days=int(joined[i]))
+            if table == 'employees':
+                rows.append((first + i, name, POSITIONS[i % len(POSITIONS)], phone, email, since, stored))
+            else:
+                birthday = date(1950 + int(joined[i]) % 55, 1 + i % 12, 1 + i % 28)
+                rows.append((first + i, name, birthday, phone, email, since, SOURCES[i % len(SOURCES)], stored))
+        if table == 'employees':
+            columns = ('employee_id', 'full_name', 'position', 'phone', 'email', 'hire_date', 'password')
+        else:
+            columns = ('customer_id', 'full_name', 'birthday', 'phone', 'email', 'registration_date',
+                       'source_c', 'password')
+        return insert_rows(self.db, table, columns, rows, self.chunk)
+
+    def compositions(self):
+        count = self.sizes['compositions']
+        self.composition_first = next_id(self.db, 'floral_compositions', 'composition_id')
+        self.composition_prices = np.round(self.rng.integers(1000, 15000, count).astype(np.float64), 2)
+        rows = [(self.composition_first + i, f'Композиция {i + 1}', None, float(self.composition_prices[i]), None)
+                for i in range(count)]
+        insert_rows(self.db, 'floral_compositions', ('composition_id', 'composition_name', 'description',
+                                                     'price', 'photo_url'), rows, self.chunk)
+        item_rows = []
+        for i in range(count):
+            for product_id in skewed(self.rng, int(self.rng.integers(2, 6)), self.sizes['products'],
+                                     self.product_first):
+                item_rows.append((self.composition_first + i, product_id, int(self.rng.integers(1, 12))))
+        insert_rows(self.db, 'composition_items', ('composition_id', 'product_id', 'quantity'),
+                    item_rows, self.chunk)
+        self.db.invalidate_reference('composition_items')
+        return count + len(item_rows)
+
+    def orders(self):
+        total = self.sizes['orders']
+        first = next_id(self.db, 'orders', 'order_id')
+        start = np.datetime64(datetime.now().replace(microsecond=0) - timedelta(days=self.days), 's')
+        span = self.days * 86400
+        rows_written = 0
+        for chunk_start in range(0, total, self.chunk):
+            n = min(self.chunk, total - chunk_start)
+            ids = np.arange(first + chunk_start, first + chunk_start + n)
+            # Даты заказов растут вместе с order_id, как при обычной работе магазина
+            low, high = span * chunk_start // total, span * (chunk_start + n) // total
+            order_dates = start + np.sort(self.rng.integers(low, max(high, low + 1), n)).astype('timedelta64[s]')
+            delivery_dates = (order_dates.astype('datetime64[D]')
+                              + self.rng.integers(0, 4, n).astype('timedelta64[D]'))
+            hours = self.rng.choice(SLOT_HOURS, n)
+            customers = skewed(self.rng, n, self.sizes['customers'], self.customers_first)
+            employees = self.rng.integers(0, self.sizes['employees'], n) + self.employees_first
+            statuses = self.rng.choice(len(STATUSES), n, p=STATUS_WEIGHTS)
+            payments = self.rng.integers(0, len(PAYMENT_METHODS), n)
+
+            line_counts = self.rng.integers(1, 2 * self.items_per_order, n)
+            products = skewed(self.rng, int(line_counts.sum()), self.sizes['products'], self.product_first)
+            quantities = self.rng.integers(1, 6, len(products))
+            owners = np.repeat(ids, line_counts)
+            prices = self.product_prices[np.array(products) - self.product_first]
+            totals = np.bincount(owners - ids[0], weights=prices * quantities, minlength=n)
+
+            # Примерно каждый десятый заказ содержит готовую композицию
+            with_composition = np.flatnonzero(self.rng.random(n) < 0.1)
+            compositions = self.rng.integers(0, self.sizes['compositions'], len(with_composition))
+            totals[with_composition] += self.composition_prices[compositions]
+
+            order_rows = [(int(ids[i]), customers[i], int(employees[i]), order_dates[i].item(),
+                           delivery_dates[i].item(), f'{hours[i]:02d}:00:00', f'{hours[i] + 1:02d}:00:00',
+                           f'ул. Тестовая, д. {ids[i] % 200 + 1}', STATUSES[statuses[i]],
+                           round(float(totals[i]), 2), PAYMENT_METHODS[payments[i]]) for i in range(n)]
+            item_rows = [(int(owners[j]), products[j], int(quantities[j]), float(prices[j]))
+                         for j in range(len(products))]
+            composition_rows = [(int(ids[i]), self.composition_first + int(c), 1,
+                                 float(self.composition_prices[c])) for i, c in zip(with_composition, compositions)]
+
+            with self.db.transaction() as cursor:
+                cursor.executemany("""
+                    INSERT INTO orders (order_id, customer_id, employee_responsible_id, order_date,
+                                        delivery_date, delivery_time_from, delivery_time_to,
+                                        delivery_address, status, total_amount, payment_method)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, order_rows)
+                cursor.executemany(
+                    "INSERT INTO order_items (order_id, product_id, quantity, price_per_unit) VALUES (%s, %s, %s, %s)",
+                    item_rows)
+                if composition_rows:
+                    cursor.executemany("""
+                        INSERT INTO order_compositions (order_id, composition_id, quantity, price_per_unit)
+                        VALUES (%s, %s, %s, %s)
+                    """, composition_rows)
+            rows_written += len(order_rows) + len(item_rows) + len(composition_rows)
+        return rows_written
+
+    def refresh(self):
+        self.db.refresh_customer_stats()
+        self.db.refresh_composition_snapshots()
+        self.db.refresh_sales_rollups()
+        self.db.refresh_slot_usage()
+        if self.slot_capacity:
+            self.db.execute_query("UPDATE delivery_slots SET capacity = %s", (self.slot_capacity,))
+            self.db.slots.invalidate()
+        return self.sizes['orders']
+
+
+def table_counts(db, tables=('customers', 'products', 'orders', 'order_items', 'order_compositions')):
+    return {table: db.execute_query(f"SELECT COUNT(*) AS n FROM {table}")[0]['n'] for table in tables}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dsn', help='DSN отдельной базы для бенчмарков (по умолчанию FLOWER_SHOP_DSN)')
+    parser.add_argument('--scale', type=float, default=1.0, help='множитель размеров BASE_SIZES')
+    parser.add_argument('--customers', type=int)
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--orders', type=int)
+    parser.add_argument('--items-per-order', type=int, default=3, help='среднее число строк товаров в заказе')
+    parser.add_argument('--days', type=int, default=365, help='за сколько дней до сегодня распределить заказы')
+    parser.add_argument('--password', default='bench', help='пароль всех сгенерированных пользователей')
+    parser.add_argument('--chunk', type=int, default=10000, help='строк в одном пакетном INSERT')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    sizes = {name: getattr(args, name) or max(1, int(size * args.scale)) for name, size in BASE_SIZES.items()}
+    db = Database(args.dsn, min_size=1, max_size=1)
+    try:
+        started = time.perf_counter()
+        DataGenerator(db, sizes['customers'], sizes['products'], sizes['orders'],
+                      items_per_order=args.items_per_order, days=args.days, password=args.password,
+                      seed=args.seed, chunk=args.chunk).run()
+        print(f'Готово за {time.perf_counter() - started:.1f} с: {table_counts(db)}')
+    finally:
+        db.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
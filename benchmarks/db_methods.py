@@ -0,0 +1,155 @@
+"""Задержки (p50/p95/p99) и пропускная способность методов Database.
+
+Аргументы вызовов (заказы, клиенты, даты, курсоры keyset-пагинации) выбираются
+случайно из уже загруженных данных, поэтому сначала нужна база из benchmarks.datagen.
+Сценарии записи (create_order) запускаются только с --writes.
+
+    python -m benchmarks.datagen --dsn sqlite:///bench.db --scale 1
+    python -m benchmarks.db_methods --dsn sqlite:///bench.db --json before.json
+    python -m benchmarks.db_methods --dsn sqlite:///bench.db --compare before.json
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from benchmarks.datagen import table_counts
+from benchmarks.results import compare, environment, print_results, summarize, write_results
+from database import Database
+
+PAGE_SIZE = 200
+
+
+class Context:
+    """Случайная выборка существующих ключей, из которой сценарии берут аргументы."""
+
+    def __init__(self, db, rng, size=1000):
+        bounds = db.execute_query("SELECT MIN(order_id) AS first, MAX(order_id) AS last FROM orders")[0]
+        if bounds['first'] is None:
+            raise SystemExit('В базе нет заказов: сначала запустите benchmarks.datagen')
+        sample = sorted({rng.randint(bounds['first'], bounds['last']) for _ in range(size)})
+        placeholders = ', '.join(['%s'] * len(sample))
+        orders = db.execute_query(f"""
+            SELECT order_id, order_date, customer_id FROM orders WHERE order_id IN ({placeholders})
+        """, sample)
+        self.orders = [row['order_id'] for row in orders]
+        self.cursors = [(row['order_date'], row['order_id']) for row in orders]
+        self.customers = sorted({row['customer_id'] for row in orders})
+        self.days = sorted({row['order_date'].date() for row in orders})
+
+        products = db.execute_query("SELECT product_id, product_name, price FROM products ORDER BY product_id")
+        self.products = products
+        self.prefixes = sorted({row['product_name'][:length] for row in products[:size] for length in (1, 3)})
+        self.customer_id = self.customers[0]
+        self.employee_id = db.execute_query("SELECT MIN(employee_id) AS id FROM employees")[0]['id']
+        self.slots = db.get_delivery_slots()
+
+    def basket(self, rng, lines=3):
+        return [{'product_id': product['product_id'], 'product_name': product['product_name'],
+                 'price': product['price'], 'quantity': rng.randint(1, 3)}
+                for product in rng.sample(self.products, min(lines, len(self.products)))]
+
+    def delivery_day(self, rng):
+        return date.today() + timedelta(days=rng.randint(1, 14))
+
+
+READ_CASES = {
+    'get_orders': lambda db, ctx, rng: db.get_orders(limit=PAGE_SIZE),
+    'get_orders_status': lambda db, ctx, rng: db.get_orders('В обработке', limit=PAGE_SIZE),
+    'get_orders_date': lambda db, ctx, rng: db.get_orders(date_filter=rng.choice(ctx.days), limit=PAGE_SIZE),
+    'get_orders_keyset': lambda db, ctx, rng: db.get_orders(limit=PAGE_SIZE, after=rng.choice(ctx.cursors)),
+    'order_history': lambda db, ctx, rng: db.get_orders(limit=50, customer_id=rng.choice(ctx.customers)),
+    'get_order': lambda db, ctx, rng: db.get_order(rng.choice(ctx.orders)),
+    'get_order_items': lambda db, ctx, rng: db.get_order_items(rng.choice(ctx.orders)),
+    'get_products': lambda db, ctx, rng: db.get_products(limit=PAGE_SIZE),
+    'get_customers': lambda db, ctx, rng: db.get_customers(limit=PAGE_SIZE),
+    'search_products': lambda db, ctx, rng: db.search_products(rng.choice(ctx.prefixes)),
+    'customer_stats': lambda db, ctx, rng: db.get_customer_stats(rng.choice(ctx.customers)),
+    'available_slots': lambda db, ctx, rng: db.available_slots(ctx.delivery_day(rng)),
+    'check_stock': lambda db, ctx, rng: db.check_stock(ctx.basket(rng)),
+}
+
+
+def create_order(db, ctx, rng):
+    slot = rng.choice(ctx.slots)
+    return db.create_order(ctx.customer_id, ctx.employee_id, ctx.delivery_day(rng).isoformat(),
+                           slot['slot_start'], slot['slot_end'], 'Бенчмарк', 'Карта', ctx.basket(rng))
+
+
+WRITE_CASES = {
+    'create_order': create_order,
+}
+
+
+def run_case(fn, db, ctx, iterations, warmup, threads, seed):
+    """Вызывает fn iterations раз в threads потоках; возвращает (задержки в секундах, общее время)."""
+    rng = random.Random(seed)
+    for _ in range(warmup):
+        fn(db, ctx, rng)
+
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(worker_seed, count):
+        worker_rng = random.Random(worker_seed)
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            fn(db, ctx, worker_rng)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    shares = [iterations // threads + (1 if i < iterations % threads else 0) for i in range(threads)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for future in [pool.submit(worker, seed + i + 1, share) for i, share in enumerate(shares)]:
+            future.result()
+    return latencies, time.perf_counter() - started
+
+
+def main(argv=None):
+    cases = {**READ_CASES, **WRITE_CASES}
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dsn', help='DSN базы из benchmarks.datagen (по умолчанию FLOWER_SHOP_DSN)')
+    parser.add_argument('--cases', nargs='+', choices=sorted(cases), help='только эти сценарии')
+    parser.add_argument('--writes', action='store_true', help='добавить сценарии записи (create_order)')
+    parser.add_argument('--iterations', type=int, default=200, help='вызовов на сценарий')
+    parser.add_argument('--warmup', type=int, default=20, help='вызовов до начала замера')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--json', help='сохранить результаты в файл')
+    parser.add_argument('--compare', help='сравнить с результатами из файла')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='допустимый рост p50 при --compare (0.2 = 20%%)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    selected = args.cases or list(READ_CASES) + (list(WRITE_CASES) if args.writes else [])
+    db = Database(args.dsn, min_size=args.threads, max_size=args.threads)
+    try:
+        ctx = Context(db, random.Random(args.seed))
+        meta = environment(backend=db.backend.name, rows=table_counts(db), threads=args.threads,
+                           iterations=args.iterations, warmup=args.warmup, page_size=PAGE_SIZE)
+        results = {}
+        for name in selected:
+            latencies, wall = run_case(cases[name], db, ctx, args.iterations, args.warmup, args.threads, args.seed)
+            results[name] = summarize(latencies, wall)
+    finally:
+        db.disconnect()
+
+    print(f"База: {meta['backend']}, строк: {meta['rows']}, потоков: {args.threads}")
+    print_results(results)
+    if args.json:
+        write_results(args.json, 'db_methods', meta, results)
+    if args.compare:
+        regressions = compare(args.compare, results, args.max_regression, meta)
+        if regressions:
+            print(f'Регрессия p50 больше {args.max_regression:.0%}: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,43 @@
+"""Пропускная способность проверки паролей: входов в секунду на ядро.
+
+Измеряет credentials.verify_password в пуле потоков без базы данных — это
+CPU-часть входа, которая добавилась вместе с хэшированием. hashlib.pbkdf2_hmac
+отпускает GIL, поэтому потоки масштабируются по ядрам.
+
+    python -m benchmarks.login --iterations 600000 --threads 1 2 4 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from credentials import DEFAULT_ITERATIONS, hash_password, verify_password
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, nargs='+', default=[DEFAULT_ITERATIONS],
+                        help='число итераций PBKDF2 (можно несколько)')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--logins', type=int, default=32, help='проверок на каждый замер')
+    args = parser.parse_args(argv)
+
+    cores = os.cpu_count() or 1
+    print(f'Ядер: {cores}')
+    print(f'{"итераций":>10} {"потоков":>8} {"входов/с":>10} {"на ядро/с":>10}')
+    for iterations in args.iterations:
+        stored = hash_password('correct horse battery staple', iterations)
+        for threads in args.threads:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                started = time.perf_counter()
+                results = list(pool.map(lambda _: verify_password('correct horse battery staple', stored),
+                                        range(args.logins)))
+                wall = time.perf_counter() - started
+            assert all(results)
+            rate = args.logins / wall
+            print(f'{iterations:>10} {threads:>8} {rate:>10.1f} {rate / min(threads, cores):>10.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+"""Сводка замеров и сравнение прогонов бенчмарков через JSON-файлы.
+
+Результат прогона — {'suite', 'meta', 'results': {сценарий: метрики}}; метрики
+в миллисекундах, пропускная способность — вызовов в секунду.
+"""
+import json
+import os
+import platform
+import sys
+import time
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies, wall, **extra):
+    calls = len(latencies)
+    return {
+        'calls': calls,
+        'throughput': calls / wall if wall else 0.0,
+        'mean_ms': sum(latencies) / calls * 1000 if calls else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else 0.0,
+        **extra,
+    }
+
+
+def environment(**meta):
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        **meta,
+    }
+
+
+def print_results(results):
+    print(f'{"сценарий":>24} {"вызовов":>8} {"в сек":>9} {"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9} {"max, мс":>9}')
+    for name, row in results.items():
+        print(f'{name:>24} {row["calls"]:>8} {row["throughput"]:>9.1f} {row["p50_ms"]:>9.2f} '
+              f'{row["p95_ms"]:>9.2f} {row["p99_ms"]:>9.2f} {row["max_ms"]:>9.2f}')
+
+
+def write_results(path, suite, meta, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'suite': suite, 'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+
+
+# Параметры прогона, при различии которых сравнение задержек мало что значит
+COMPARABLE_META = ('backend', 'rows', 'threads', 'page_size')
+
+
+def compare(baseline_path, results, max_regression=0.2, meta=None):
+    """Печатает изменение p50/p95 и пропускной способности относительно baseline_path.
+
+    Возвращает список сценариев, у которых p50 вырос больше чем на max_regression.
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        data = json.load(f)
+    baseline = data['results']
+    for key in COMPARABLE_META:
+        if meta and key in meta and data['meta'].get(key) != meta[key]:
+            print(f'Внимание: {key} отличается от базового прогона: {data["meta"].get(key)} -> {meta[key]}')
+
+    regressions = []
+    print(f'{"сценарий":>24} {"p50 было":>9} {"стало":>9} {"изм.":>8} {"p95 изм.":>9} {"в сек изм.":>11}')
+    for name, row in results.items():
+        old = baseline.get(name)
+        if not old:
+            print(f'{name:>24} {"—":>9} {row["p50_ms"]:>9.2f}   (нет в базовом прогоне)')
+            continue
+        p50 = ratio(row['p50_ms'], old['p50_ms'])
+        print(f'{name:>24} {old["p50_ms"]:>9.2f} {row["p50_ms"]:>9.2f} {p50:>+8.1%} '
+              f'{ratio(row["p95_ms"], old["p95_ms"]):>+9.1%} {ratio(row["throughput"], old["throughput"]):>+11.1%}')
+        if p50 > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def ratio(new, old):
+    return new / old - 1 if old else 0.0
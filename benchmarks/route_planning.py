@@ -0,0 +1,57 @@
+"""Время планирования маршрутов RoutePlanner на синтетических заказах.
+
+База данных не нужна: точки равномерно разбросаны вокруг депо, окна доставки —
+часовые и двухчасовые интервалы рабочего дня.
+
+    python -m benchmarks.route_planning --stops 50 100 200 400
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from dispatch import DEFAULT_DEPOT, RoutePlanner, clock
+
+
+def synthetic_stops(count, radius_km, rng):
+    # Точки в круге радиуса radius_km вокруг депо (1° широты ≈ 111 км)
+    angle = rng.uniform(0, 2 * np.pi, count)
+    distance = radius_km * np.sqrt(rng.uniform(0, 1, count))
+    lat = DEFAULT_DEPOT[0] + distance * np.sin(angle) / 111.0
+    lon = DEFAULT_DEPOT[1] + distance * np.cos(angle) / (111.0 * np.cos(np.radians(DEFAULT_DEPOT[0])))
+    starts = rng.integers(9, 17, count) * 60
+    lengths = rng.choice([60, 120], count)
+    stops = [{'order_id': i + 1, 'delivery_address': f'Синтетический адрес {i + 1}',
+              'delivery_time_from': clock(start), 'delivery_time_to': clock(min(start + length, 18 * 60))}
+             for i, (start, length) in enumerate(zip(starts, lengths))]
+    return stops, np.column_stack([lat, lon])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stops', type=int, nargs='+', default=[50, 100, 200, 400])
+    parser.add_argument('--radius-km', type=float, default=15.0)
+    parser.add_argument('--max-stops', type=int, default=15, help='заказов на курьера')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    planner = RoutePlanner(max_stops=args.max_stops)
+    print(f'{"заказов":>8} {"медиана, мс":>12} {"макс, мс":>9} {"курьеров":>9} {"не вошло":>9} {"км всего":>9}')
+    for count in args.stops:
+        stops, points = synthetic_stops(count, args.radius_km, rng)
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            plan = planner.plan(stops, points)
+            timings.append(time.perf_counter() - started)
+        distance = sum(route['distance_km'] for route in plan['routes'])
+        print(f'{count:>8} {statistics.median(timings) * 1000:>12.1f} {max(timings) * 1000:>9.1f} '
+              f'{len(plan["routes"]):>9} {len(plan["unrouted"]):>9} {distance:>9.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
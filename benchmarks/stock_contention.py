@@ -0,0 +1,111 @@
+"""Пропускная способность create_order при конкуренции за одни и те же товары.
+
+Запускать только на отдельной тестовой базе: скрипт выставляет остатки выбранных
+товаров и создаёт реальные заказы.
+
+    python -m benchmarks.stock_contention --dsn mysql://root:@localhost/chetochny_bench --threads 16
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+
+from benchmarks.results import percentile
+from database import Database, OutOfStockError, SlotFullError
+
+FIRST_DELIVERY_DATE = date(2030, 1, 1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dsn', help='DSN тестовой базы (по умолчанию FLOWER_SHOP_DSN)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--orders-per-thread', type=int, default=200)
+    parser.add_argument('--hot-products', type=int, default=5, help='сколько товаров делят все заказы')
+    parser.add_argument('--lines', type=int, default=3, help='строк в заказе')
+    parser.add_argument('--stock', type=int, default=1000000, help='начальный остаток каждого товара')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    db = Database(args.dsn, min_size=args.threads, max_size=args.threads)
+    products = db.execute_query("SELECT product_id, price FROM products ORDER BY product_id LIMIT %s",
+                                (args.hot_products,))
+    customer_id = db.execute_query("SELECT MIN(customer_id) AS id FROM customers")[0]['id']
+    employee_id = db.execute_query("SELECT MIN(employee_id) AS id FROM employees")[0]['id']
+    if len(products) < args.hot_products or customer_id is None:
+        db.disconnect()
+        raise SystemExit(f'Нужно не меньше {args.hot_products} товаров и хотя бы один клиент: '
+                         f'сначала запустите benchmarks.datagen')
+    for product in products:
+        db.execute_query("""
+            INSERT INTO inventory (product_id, quantity_in_stock, min_quantity_threshold, last_restock_date)
+            VALUES (%s, %s, 0, CURDATE())
+            ON DUPLICATE KEY UPDATE quantity_in_stock = VALUES(quantity_in_stock)
+        """, (product['product_id'], args.stock))
+
+    # Заказы распределяются по интервалам и дням после уже занятых так, чтобы каждый
+    # (день, интервал) занимался не больше capacity раз: измеряется конкуренция за склад,
+    # а не за интервалы доставки
+    last_date = db.execute_query("SELECT MAX(delivery_date) AS d FROM orders")[0]['d']
+    first_date = FIRST_DELIVERY_DATE
+    if last_date:
+        first_date = max(first_date, date.fromisoformat(str(last_date)) + timedelta(days=1))
+    slots = [(slot['slot_start'], slot['slot_end'])
+             for slot in db.get_delivery_slots() for _ in range(slot['capacity'])]
+
+    latencies = []
+    counters = {'ok': 0, 'out_of_stock': 0, 'slot_full': 0, 'deadlock': 0}
+    lock = threading.Lock()
+
+    def worker(seed, first_order):
+        rng = random.Random(seed)
+        for n in range(first_order, first_order + args.orders_per_thread):
+            day, slot = divmod(n, len(slots))
+            delivery_date = (first_date + timedelta(days=day)).isoformat()
+            slot_start, slot_end = slots[slot]
+            lines = rng.sample(products, min(args.lines, len(products)))
+            items = [{'product_id': p['product_id'], 'quantity': rng.randint(1, 3), 'price': float(p['price'])}
+                     for p in lines]
+            started = time.perf_counter()
+            try:
+                db.create_order(customer_id, employee_id, delivery_date, slot_start, slot_end,
+                                'Нагрузочный тест', 'Карта', items)
+                outcome = 'ok'
+            except OutOfStockError:
+                outcome = 'out_of_stock'
+            except SlotFullError:
+                outcome = 'slot_full'
+            except Exception as e:
+                if not db.backend.is_lock_conflict(e):
+                    raise
+                outcome = 'deadlock'
+            elapsed = time.perf_counter() - started
+            with lock:
+                counters[outcome] += 1
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i, i * args.orders_per_thread))
+               for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    db.disconnect()
+
+    total = sum(counters.values())
+    print(f'Потоков: {args.threads}, заказов: {total}, горячих товаров: {len(products)}')
+    print(f'Пропускная способность: {counters["ok"] / wall:.1f} заказов/с за {wall:.2f} с')
+    print(f'Успешно: {counters["ok"]}, нет на складе: {counters["out_of_stock"]}, '
+          f'интервал занят: {counters["slot_full"]}, взаимоблокировок/таймаутов: {counters["deadlock"]}')
+    print(f'Задержка, мс: p50={percentile(latencies, 0.5) * 1000:.1f} '
+          f'p95={percentile(latencies, 0.95) * 1000:.1f} p99={percentile(latencies, 0.99) * 1000:.1f} '
+          f'среднее={statistics.mean(latencies) * 1000 if latencies else 0:.1f}')
+    return 0 if counters['deadlock'] == 0 else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+"""Время заполнения таблиц интерфейса (LazyTableModel + QTableView) без экрана.
+
+Таблицы создаются с теми же столбцами и keyset-пагинацией, что и в main.py, но
+страницы загружаются синхронно (без DbExecutor), чтобы замер не зависел от
+очереди потоков. Для каждой таблицы измеряются первая страница после reset(),
+догрузка страниц через fetchMore() до --rows строк (отдельно доля времени в
+базе), отрисовка видимой части представления и память одной загруженной
+страницы в байтах на строку (tracemalloc).
+
+    python -m benchmarks.table_population --dsn sqlite:///bench.db --rows 5000 --json gui.json
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication
+
+from benchmarks.datagen import table_counts
+from benchmarks.results import compare, environment, print_results, summarize, write_results
+from database import Database
+from main import (CUSTOMERS_COLUMNS, HISTORY_COLUMNS, ORDERS_COLUMNS, PAGE_SIZE, PRODUCTS_COLUMNS,
+                  make_table_view)
+from table_model import LazyTableModel, keyset_pager
+
+ORDER_KEYS = ('order_date', 'order_id')
+
+
+def tables(db, customer_id):
+    """(столбцы, fetch(limit, after), ключи курсора) для каждой таблицы окна."""
+    return {
+        'orders': (ORDERS_COLUMNS, lambda limit, after: db.order_rows(limit=limit, after=after), ORDER_KEYS),
+        'orders_status': (ORDERS_COLUMNS, lambda limit, after: db.order_rows('Завершен', limit=limit, after=after),
+                          ORDER_KEYS),
+        'history': (HISTORY_COLUMNS,
+                    lambda limit, after: db.order_rows(limit=limit, after=after, customer_id=customer_id),
+                    ORDER_KEYS),
+        'products': (PRODUCTS_COLUMNS, db.product_rows, ('product_name', 'product_id')),
+        'customers': (CUSTOMERS_COLUMNS, db.customer_rows, ('full_name', 'customer_id')),
+    }
+
+
+def populate(columns, fetch, keys, rows, page_size):
+    """Один прогон: (задержки страниц, время в базе, первая страница, отрисовка, строк загружено)."""
+    db_time = [0.0]
+
+    def timed_fetch(limit, after):
+        started = time.perf_counter()
+        try:
+            return fetch(limit=limit, after=after)
+        finally:
+            db_time[0] += time.perf_counter() - started
+
+    model = LazyTableModel(columns)
+    view = make_table_view(model)
+    view.resize(1200, 800)
+
+    started = time.perf_counter()
+    model.reset(keyset_pager(timed_fetch, keys, page_size))
+    first_page = time.perf_counter() - started
+
+    pages = [first_page]
+    while model.rowCount() < rows and model.canFetchMore():
+        started = time.perf_counter()
+        model.fetchMore()
+        pages.append(time.perf_counter() - started)
+
+    loaded, fetch_time = model.rowCount(), db_time[0]
+    # Отрисовка видимых строк; представление может само догрузить страницу, она в замер не входит
+    started = time.perf_counter()
+    view.grab()
+    render = time.perf_counter() - started
+    return pages, fetch_time, first_page, render, loaded
+
+
+def page_bytes(fetch, page_size):
+    """Память, которую занимает одна загруженная страница строк, в байтах на строку."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        rows = fetch(limit=page_size, after=None)
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return size / len(rows) if rows else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dsn', help='DSN базы из benchmarks.datagen (по умолчанию FLOWER_SHOP_DSN)')
+    parser.add_argument('--tables', nargs='+', help='только эти таблицы')
+    parser.add_argument('--rows', type=int, default=5000, help='сколько строк догружать в каждую таблицу')
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='сохранить результаты в файл')
+    parser.add_argument('--compare', help='сравнить с результатами из файла')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    app = QApplication.instance() or QApplication([])
+    db = Database(args.dsn)
+    try:
+        customers = db.execute_query("SELECT customer_id FROM orders ORDER BY order_id DESC LIMIT 1000")
+        customer_id = random.Random(args.seed).choice(customers)['customer_id']
+        meta = environment(backend=db.backend.name, rows=table_counts(db), threads=1,
+                           page_size=args.page_size, target_rows=args.rows, repeat=args.repeat,
+                           qt_platform=app.platformName())
+        results = {}
+        for name, (columns, fetch, keys) in tables(db, customer_id).items():
+            if args.tables and name not in args.tables:
+                continue
+            page_latencies, db_times, first_pages, renders = [], [], [], []
+            wall = 0.0
+            for _ in range(args.repeat):
+                # Справочники товаров и клиентов кэшируются: каждый прогон читает их из базы заново
+                db.invalidate_reference()
+                pages, db_time, first_page, render, loaded = populate(columns, fetch, keys, args.rows,
+                                                                      args.page_size)
+                page_latencies.extend(pages)
+                db_times.append(db_time)
+                first_pages.append(first_page)
+                renders.append(render)
+                wall += sum(pages)
+            db.invalidate_reference()
+            row_bytes = page_bytes(fetch, args.page_size)
+            results[name] = summarize(page_latencies, wall, rows=loaded, rows_per_s=loaded * args.repeat / wall,
+                                      first_page_ms=statistics.median(first_pages) * 1000,
+                                      render_ms=statistics.median(renders) * 1000, row_bytes=row_bytes,
+                                      db_share=sum(db_times) / wall if wall else 0.0)
+    finally:
+        db.disconnect()
+
+    print(f"База: {meta['backend']}, строк: {meta['rows']}, страница: {args.page_size}, "
+          f"до {args.rows} строк в таблице; задержки — на одну страницу")
+    print_results(results)
+    print(f'{"таблица":>24} {"строк":>8} {"строк/с":>10} {"1-я стр., мс":>13} {"отрисовка, мс":>14} {"в базе":>7} '
+          f'{"байт/строку":>12}')
+    for name, row in results.items():
+        print(f'{name:>24} {row["rows"]:>8} {row["rows_per_s"]:>10.0f} {row["first_page_ms"]:>13.2f} '
+              f'{row["render_ms"]:>14.2f} {row["db_share"]:>7.0%} {row["row_bytes"]:>12.0f}')
+    if args.json:
+        write_results(args.json, 'table_population', meta, results)
+    if args.compare:
+        regressions = compare(args.compare, results, args.max_regression, meta)
+        if regressions:
+            print(f'Регрессия p50 больше {args.max_regression:.0%}: {", ".join(regressions)}')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
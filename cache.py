@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+
+# ttl — время жизни записи в секундах: по его истечении запись всегда перечитывается;
+# max_entries — сколько разных выборок (например, страниц) одной таблицы держать в памяти;
+# id_column — столбец для отпечатка COUNT(*)/MAX(id), который раз в check_interval секунд
+# сверяется до истечения TTL, чтобы добавленные и удалённые строки появлялись раньше.
+# Изменения существующих строк (UPDATE) отпечаток не видит, их задержка ограничена ttl.
+# Для больших таблиц отпечаток выключен (fingerprint: False), т.к. COUNT(*) в InnoDB не бесплатен.
+DEFAULT_POLICIES = {
+    'customers': {'ttl': 60, 'max_entries': 64, 'id_column': 'customer_id', 'fingerprint': False},
+    'employees': {'ttl': 300, 'max_entries': 8, 'id_column': 'employee_id', 'fingerprint': True,
+                  'check_interval': 30},
+    'products': {'ttl': 120, 'max_entries': 64, 'id_column': 'product_id', 'fingerprint': True,
+                 'check_interval': 10},
+    # Составы букетов (BOM) целиком, одной записью
+    'composition_items': {'ttl': 600, 'max_entries': 1, 'id_column': 'composition_item_id', 'fingerprint': True,
+                          'check_interval': 10},
+}
+
+
+class ReferenceCache:
+    """Потокобезопасный кэш редко меняющихся справочных выборок с TTL и LRU-вытеснением."""
+
+    def __init__(self, policies=None, clock=time.monotonic):
+        self.policies = policies or DEFAULT_POLICIES
+        self.clock = clock
+        self._entries = {table: OrderedDict() for table in self.policies}
+        self._generations = {table: 0 for table in self.policies}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, table, key, loader, fingerprint=None):
+        """Возвращает закэшированный результат loader() для (table, key).
+
+        Запись с истёкшим TTL всегда загружается заново. fingerprint — необязательная
+        функция без аргументов: пока TTL не истёк, отпечаток таблицы сверяется не чаще
+        раза в check_interval секунд, и при его изменении запись перечитывается досрочно.
+        """
+        policy = self.policies[table]
+        entries = self._entries[table]
+        now = self.clock()
+
+        check = False
+        with self._lock:
+            generation = self._generations[table]
+            entry = entries.get(key)
+            if entry is not None:
+                entries.move_to_end(key)
+                if entry['expires'] > now:
+                    if fingerprint is None or entry['checked'] + policy.get('check_interval', 0) > now:
+                        self.hits += 1
+                        return entry['value']
+                    check = True
+
+        # Отпечаток снимается до загрузки, чтобы запись, сделанная во время
+        # загрузки, не оказалась скрыта за устаревшими данными
+        stamp = fingerprint() if fingerprint is not None else None
+        if check and stamp == entry['fingerprint']:
+            with self._lock:
+                entry['checked'] = now
+                self.hits += 1
+            return entry['value']
+
+        value = loader()
+        with self._lock:
+            self.misses += 1
+            if generation != self._generations[table]:
+                # Таблицу инвалидировали во время загрузки — результат не кэшируем
+                return value
+            entries[key] = {'value': value, 'expires': now + policy['ttl'], 'checked': now, 'fingerprint': stamp}
+            entries.move_to_end(key)
+            while len(entries) > policy['max_entries']:
+                entries.popitem(last=False)
+        return value
+
+    def invalidate(self, table=None):
+        with self._lock:
+            tables = [table] if table else list(self._entries)
+            for name in tables:
+                if name in self._entries:
+                    self._entries[name].clear()
+                    self._generations[name] += 1
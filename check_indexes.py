@@ -0,0 +1,52 @@
+import sys
+
+from database import Database
+
+# Каждая проверка: описание, (запрос, параметры), индексы, которые допустимо увидеть в EXPLAIN для orders
+CHECKS = [
+    # Список заказов без фильтров: первая страница и следующая по ключу (order_date, order_id)
+    ('Список заказов, первая страница',
+     lambda db: db.orders_query(limit=200),
+     {'idx_orders_date'}),
+    ('Список заказов, следующая страница',
+     lambda db: db.orders_query(limit=200, after=('2024-03-02 12:00:00', 1000)),
+     {'idx_orders_date'}),
+    ('Фильтр по дате',
+     lambda db: db.orders_query(date_filter='2024-03-02', limit=200),
+     {'idx_orders_date'}),
+    ('Фильтр по статусу и дате',
+     lambda db: db.orders_query('В обработке', '2024-03-02', limit=200),
+     {'idx_orders_status_date'}),
+    ('История заказов клиента',
+     lambda db: db.orders_query(customer_id=1, limit=200),
+     {'idx_orders_customer_date'}),
+    ('Доставки на день',
+     lambda db: ("SELECT order_id FROM orders WHERE delivery_date = %s ORDER BY delivery_time_from",
+                 ['2024-03-02']),
+     {'idx_orders_delivery_slot'}),
+]
+
+
+def main():
+    db = Database()
+    if not db.connect():
+        print('Не удалось подключиться к базе данных')
+        return 2
+
+    failed = 0
+    for title, build, expected in CHECKS:
+        query, params = build(db)
+        plan = db.explain(query, params)
+        row = next((r for r in plan if r['table'] in ('o', 'orders')), None)
+        key = row['key'] if row else None
+        ok = key in expected
+        failed += not ok
+        print(f"{'OK ' if ok else 'FAIL'} {title}: key={key}, rows={row['rows'] if row else '?'}")
+
+    # На нескольких строках оптимизатор вправе выбрать полный просмотр таблицы,
+    # поэтому проверку имеет смысл запускать на реалистичном объёме данных.
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import base64
+import hashlib
+import hmac
+import os
+
+ALGORITHM = 'pbkdf2_sha256'
+# Число итераций для новых хэшей; старые хэши с меньшим числом перехэшируются при входе
+DEFAULT_ITERATIONS = 600000
+SALT_BYTES = 16
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def hash_password(password, iterations=DEFAULT_ITERATIONS, salt=None):
+    """Хэш в виде 'pbkdf2_sha256$итерации$соль$хэш': параметры хранятся вместе с хэшем у каждого пользователя."""
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f'{ALGORITHM}${iterations}${_b64encode(salt)}${_b64encode(digest)}'
+
+
+def parse_hash(stored):
+    """(итерации, соль, хэш) или None, если stored — пароль в открытом виде из старой схемы."""
+    parts = (stored or '').split('$')
+    if len(parts) != 4 or parts[0] != ALGORITHM:
+        return None
+    return int(parts[1]), _b64decode(parts[2]), _b64decode(parts[3])
+
+
+def verify_password(password, stored):
+    """Проверяет пароль за постоянное время; понимает и хэши, и старые открытые пароли.
+
+    PBKDF2 из hashlib отпускает GIL, поэтому проверки в пуле потоков
+    (DbExecutor в интерфейсе, executor в api.py) идут параллельно на всех ядрах.
+    """
+    if not stored:
+        return False
+    parsed = parse_hash(stored)
+    if parsed is None:
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    iterations, salt, expected = parsed
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return hmac.compare_digest(digest, expected)
+
+
+_dummy_hash = None
+
+
+def dummy_verify(password):
+    # Для несуществующего email тратит столько же времени, сколько настоящая проверка
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password('')
+    verify_password(password, _dummy_hash)
+    return False
+
+
+def needs_rehash(stored, iterations=DEFAULT_ITERATIONS):
+    parsed = parse_hash(stored)
+    return parsed is None or parsed[0] < iterations
@@ -0,0 +1,1257 @@
+import os
+import threading
+import time
+from collections import deque
+from itertools import product
+from datetime import date, timedelta
+from decimal import Decimal
+from contextlib import contextmanager
+
+from backends import backend_for_dsn
+from cache import ReferenceCache
+from credentials import dummy_verify, hash_password, needs_rehash, verify_password
+from metrics import InstrumentedConnection, QueryMetrics
+from queries import QUERIES, record_rows, record_type, register, statement_kind
+from slots import SlotIndex
+
+DEFAULT_DSN = 'mysql://root:@localhost/chetochny'
+
+# Таблицы, запись в которые делает устаревшими закэшированные выборки другой таблицы
+CACHE_DEPENDENCIES = {'product_categories': 'products', 'floral_compositions': 'composition_items'}
+
+CANCELLED_STATUS = 'Отменен'
+COMPLETED_STATUS = 'Завершен'
+
+# Тип пользователя -> (таблица, первичный ключ)
+USER_TABLES = {'admin': ('employees', 'employee_id'), 'customer': ('customers', 'customer_id')}
+
+ORDER_FIELDS = ('customer_id', 'employee_responsible_id', 'delivery_date', 'delivery_time_from',
+                'delivery_time_to', 'delivery_address', 'status', 'payment_method')
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class OutOfStockError(Exception):
+    def __init__(self, product_id, requested, available):
+        super().__init__(f'Недостаточно товара #{product_id} на складе: '
+                         f'запрошено {requested}, доступно {available}')
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+class SlotFullError(Exception):
+    def __init__(self, delivery_date, slot_start):
+        super().__init__(f'Интервал доставки {delivery_date} {slot_start} уже занят')
+        self.delivery_date = delivery_date
+        self.slot_start = slot_start
+
+
+REFRESH_CUSTOMER_STATS_SQL = f"""
+    INSERT INTO customer_stats (customer_id, orders_count, total_spent, last_order_date)
+    SELECT customer_id,
+           SUM(status <> '{CANCELLED_STATUS}'),
+           SUM(CASE WHEN status <> '{CANCELLED_STATUS}' THEN total_amount ELSE 0 END),
+           MAX(order_date)
+    FROM orders
+    GROUP BY customer_id
+"""
+
+
+# Вклад заказов {ids} в дневные сводки; отменённые заказы вклада не дают
+SALES_DAILY_SELECT_SQL = f"""
+    SELECT DATE(order_date) AS sale_date, COALESCE(employee_responsible_id, 0) AS employee_id,
+           COALESCE(payment_method, '') AS payment_method, COUNT(*) AS orders_count,
+           SUM(total_amount) AS revenue
+    FROM orders
+    WHERE order_id IN ({{ids}}) AND status <> '{CANCELLED_STATUS}'
+    GROUP BY DATE(order_date), COALESCE(employee_responsible_id, 0), COALESCE(payment_method, '')
+"""
+
+# Товары из композиций учитываются по количеству без выручки: выручка композиции
+# входит в sales_daily, но не делится между её товарами. Состав композиции берётся
+# из снимка order_composition_items. {ids} подставляется дважды.
+SALES_PRODUCTS_SELECT_SQL = f"""
+    SELECT sale_date, product_id, category_id, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+    FROM (
+        SELECT DATE(o.order_date) AS sale_date, oi.product_id, COALESCE(p.category_id, 0) AS category_id,
+               oi.quantity, oi.quantity * oi.price_per_unit AS revenue
+        FROM orders o
+        JOIN order_items oi ON oi.order_id = o.order_id
+        JOIN products p ON p.product_id = oi.product_id
+        WHERE o.order_id IN ({{ids}}) AND o.status <> '{CANCELLED_STATUS}'
+        UNION ALL
+        SELECT DATE(o.order_date), oci.product_id, COALESCE(p.category_id, 0),
+               oc.quantity * oci.quantity, 0
+        FROM orders o
+        JOIN order_compositions oc ON oc.order_id = o.order_id
+        JOIN order_composition_items oci ON oci.order_composition_id = oc.order_composition_id
+        JOIN products p ON p.product_id = oci.product_id
+        WHERE o.order_id IN ({{ids}}) AND o.status <> '{CANCELLED_STATUS}'
+    ) order_lines
+    GROUP BY sale_date, product_id, category_id
+"""
+
+# Изменения сводок, накопленные за транзакцию (SalesRollup), прибавляются к строкам сводок
+SALES_DAILY_UPSERT_SQL = """
+    INSERT INTO sales_daily (sale_date, employee_id, payment_method, orders_count, revenue)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        orders_count = orders_count + VALUES(orders_count),
+        revenue = revenue + VALUES(revenue)
+"""
+SALES_PRODUCTS_UPSERT_SQL = """
+    INSERT INTO sales_daily_products (sale_date, product_id, category_id, quantity, revenue)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        quantity = quantity + VALUES(quantity),
+        revenue = revenue + VALUES(revenue)
+"""
+
+# Снимок состава для строк композиций заказов {ids}, у которых его ещё нет:
+# количество каждого товара на одну композицию по текущему composition_items
+ORDER_COMPOSITION_SNAPSHOT_SQL = """
+    INSERT INTO order_composition_items (order_composition_id, order_id, product_id, quantity)
+    SELECT oc.order_composition_id, oc.order_id, ci.product_id, SUM(ci.quantity)
+    FROM order_compositions oc
+    JOIN composition_items ci ON ci.composition_id = oc.composition_id
+    WHERE oc.order_id IN ({ids})
+      AND NOT EXISTS (SELECT 1 FROM order_composition_items s
+                      WHERE s.order_composition_id = oc.order_composition_id)
+    GROUP BY oc.order_composition_id, oc.order_id, ci.product_id
+"""
+
+# Потребность заказов {ids} в товарах: строки товаров и снимки составов композиций.
+# {ids} подставляется дважды.
+ORDER_DEMAND_SQL = """
+    SELECT product_id, SUM(quantity) AS quantity
+    FROM (
+        SELECT product_id, quantity FROM order_items WHERE order_id IN ({ids})
+        UNION ALL
+        SELECT oci.product_id, oc.quantity * oci.quantity
+        FROM order_compositions oc
+        JOIN order_composition_items oci ON oci.order_composition_id = oc.order_composition_id
+        WHERE oc.order_id IN ({ids})
+    ) order_lines
+    GROUP BY product_id
+"""
+
+# Именованные запросы чтения (см. queries.py): текст каждого сочетания условий
+# строится один раз при импорте, а не конкатенацией при каждом вызове
+CUSTOMERS_ALL = register('customers.all', "SELECT * FROM customers ORDER BY full_name")
+CUSTOMERS_PAGE = register('customers.page', """
+    SELECT * FROM customers ORDER BY full_name, customer_id LIMIT %s
+""")
+# Keyset-пагинация: после (full_name, customer_id) последней полученной строки;
+# full_name NOT NULL (миграция 0011), иначе сравнение с NULL обрывает листание
+CUSTOMERS_PAGE_AFTER = register('customers.page_after', """
+    SELECT * FROM customers
+    WHERE full_name > %s OR (full_name = %s AND customer_id > %s)
+    ORDER BY full_name, customer_id
+    LIMIT %s
+""")
+# LIKE 'префикс%' использует индекс idx_customers_full_name как диапазон
+CUSTOMERS_SEARCH = register('customers.search', """
+    SELECT customer_id, full_name, phone, email
+    FROM customers
+    WHERE full_name LIKE %s
+    ORDER BY full_name
+    LIMIT %s
+""")
+CUSTOMER_STATS = register('customers.stats', """
+    SELECT orders_count, total_spent, last_order_date FROM customer_stats WHERE customer_id = %s
+""", shape='one')
+EMPLOYEES_ALL = register('employees.all', "SELECT * FROM employees ORDER BY full_name")
+
+PRODUCTS_ALL = register('products.all', """
+    SELECT p.*, c.category_name
+    FROM products p
+    JOIN product_categories c ON p.category_id = c.category_id
+    ORDER BY p.product_name
+""")
+PRODUCTS_PAGE = register('products.page', """
+    SELECT p.*, c.category_name
+    FROM products p
+    JOIN product_categories c ON p.category_id = c.category_id
+    ORDER BY p.product_name, p.product_id
+    LIMIT %s
+""")
+# Keyset-пагинация: после (product_name, product_id) последней полученной строки;
+# product_name NOT NULL (миграция 0011)
+PRODUCTS_PAGE_AFTER = register('products.page_after', """
+    SELECT p.*, c.category_name
+    FROM products p
+    JOIN product_categories c ON p.category_id = c.category_id
+    WHERE p.product_name > %s OR (p.product_name = %s AND p.product_id > %s)
+    ORDER BY p.product_name, p.product_id
+    LIMIT %s
+""")
+PRODUCTS_SEARCH = register('products.search', """
+    SELECT product_id, product_name, price, unit
+    FROM products
+    WHERE product_name LIKE %s
+    ORDER BY product_name
+    LIMIT %s
+""")
+COMPOSITION_BOMS = register('compositions.boms', """
+    SELECT fc.composition_id, fc.composition_name, fc.description, fc.price,
+           ci.product_id, ci.quantity
+    FROM floral_compositions fc
+    LEFT JOIN composition_items ci ON ci.composition_id = fc.composition_id
+    ORDER BY fc.composition_name, fc.composition_id, ci.composition_item_id
+""")
+
+DELIVERY_SLOTS = register('slots.all', "SELECT slot_start, slot_end, capacity FROM delivery_slots ORDER BY slot_start")
+SLOT_USAGE_DAY = register('slots.usage_day', "SELECT slot_start, reserved FROM delivery_slot_usage WHERE delivery_date = %s")
+SET_SLOT_CAPACITY = register('slots.set_capacity', "UPDATE delivery_slots SET capacity = %s WHERE slot_start = %s",
+                             shape='rowcount')
+
+# Незавершённые заказы дня для планирования маршрутов; выборка по idx_orders_delivery_slot
+DELIVERIES_DAY = register('orders.deliveries', f"""
+    SELECT o.order_id, o.delivery_address, o.delivery_time_from, o.delivery_time_to,
+           c.full_name AS customer_name
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.customer_id
+    WHERE o.delivery_date = %s AND o.status NOT IN ('{CANCELLED_STATUS}', '{COMPLETED_STATUS}')
+    ORDER BY o.delivery_time_from, o.order_id
+""")
+
+# Строки товаров и композиций приходят одним запросом вместе с заказом; у строки композиции
+# заполнены order_composition_id и composition_id, у строки товара — order_item_id и product_id
+ORDER_WITH_LINES = register('orders.get', """
+    SELECT o.*, c.full_name as customer_name, e.full_name as employee_name,
+           l.order_item_id, l.order_composition_id, l.product_id, l.composition_id,
+           l.quantity, l.price_per_unit, l.product_name
+    FROM orders o
+    JOIN customers c ON o.customer_id = c.customer_id
+    JOIN employees e ON o.employee_responsible_id = e.employee_id
+    LEFT JOIN (
+        SELECT oi.order_id, oi.order_item_id, NULL AS order_composition_id,
+               oi.product_id, NULL AS composition_id, oi.quantity, oi.price_per_unit,
+               p.product_name
+        FROM order_items oi
+        JOIN products p ON oi.product_id = p.product_id
+        WHERE oi.order_id = %s
+        UNION ALL
+        SELECT oc.order_id, NULL, oc.order_composition_id,
+               NULL, oc.composition_id, oc.quantity, oc.price_per_unit,
+               fc.composition_name
+        FROM order_compositions oc
+        JOIN floral_compositions fc ON oc.composition_id = fc.composition_id
+        WHERE oc.order_id = %s
+    ) l ON l.order_id = o.order_id
+    WHERE o.order_id = %s
+    ORDER BY l.order_composition_id IS NOT NULL, l.order_item_id, l.order_composition_id
+""")
+ORDER_ITEMS = register('orders.items', """
+    SELECT oi.*, p.product_name
+    FROM order_items oi
+    JOIN products p ON oi.product_id = p.product_id
+    WHERE oi.order_id = %s
+""")
+
+# Условия списка заказов в порядке параметров запроса
+ORDER_LIST_FILTERS = ('customer', 'status', 'date', 'after', 'limit')
+ORDER_LIST_SELECT = 'o.*, c.full_name as customer_name, e.full_name as employee_name'
+
+
+def orders_list_sql(select, customer, status, day, after, limit):
+    conditions = []
+    if customer:
+        conditions.append("o.customer_id = %s")
+    if status:
+        conditions.append("o.status = %s")
+    if day:
+        # Полуоткрытый диапазон вместо DATE(o.order_date), чтобы работал индекс по order_date
+        conditions.append("o.order_date >= %s AND o.order_date < %s")
+    if after:
+        # Keyset-пагинация: после (order_date, order_id) последней полученной строки
+        conditions.append("(o.order_date < %s OR (o.order_date = %s AND o.order_id < %s))")
+    return f"""
+        SELECT {select}
+        FROM orders o
+        JOIN customers c ON o.customer_id = c.customer_id
+        JOIN employees e ON o.employee_responsible_id = e.employee_id
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY o.order_date DESC, o.order_id DESC
+        {'LIMIT %s' if limit else ''}
+    """
+
+
+def register_orders_list(name, select, row=None):
+    """Запросы списка заказов для всех сочетаний условий: {(customer, status, date, after, limit): Query}."""
+    queries = {}
+    for flags in product((False, True), repeat=len(ORDER_LIST_FILTERS)):
+        suffix = '+'.join(key for key, on in zip(ORDER_LIST_FILTERS, flags) if on) or 'all'
+        queries[flags] = register(f'{name}:{suffix}', orders_list_sql(select, *flags), row=row)
+    return queries
+
+
+ORDERS_LIST = register_orders_list('orders.list', ORDER_LIST_SELECT)
+
+# Компактные записи для таблиц интерфейса: только отображаемые столбцы и ключи
+# keyset-пагинации, значения в кортеже без словаря на строку
+OrderRow = record_type('OrderRow', ('order_id', 'order_date', 'delivery_date', 'delivery_address', 'status',
+                                    'total_amount', 'payment_method', 'customer_name', 'employee_name'))
+ORDER_ROWS_LIST = register_orders_list('orders.rows', """
+    o.order_id, o.order_date, o.delivery_date, o.delivery_address, o.status,
+    o.total_amount, o.payment_method, c.full_name AS customer_name, e.full_name AS employee_name
+""", record_rows(OrderRow))
+
+ProductRow = record_type('ProductRow', ('product_id', 'category_name', 'product_name', 'description',
+                                        'price', 'unit'))
+PRODUCT_ROWS_PAGE = register('products.rows_page', """
+    SELECT p.product_id, c.category_name, p.product_name, p.description, p.price, p.unit
+    FROM products p
+    JOIN product_categories c ON p.category_id = c.category_id
+    ORDER BY p.product_name, p.product_id
+    LIMIT %s
+""", row=record_rows(ProductRow))
+PRODUCT_ROWS_PAGE_AFTER = register('products.rows_page_after', """
+    SELECT p.product_id, c.category_name, p.product_name, p.description, p.price, p.unit
+    FROM products p
+    JOIN product_categories c ON p.category_id = c.category_id
+    WHERE p.product_name > %s OR (p.product_name = %s AND p.product_id > %s)
+    ORDER BY p.product_name, p.product_id
+    LIMIT %s
+""", row=record_rows(ProductRow))
+
+CustomerRow = record_type('CustomerRow', ('customer_id', 'full_name', 'birthday', 'phone', 'email',
+                                          'registration_date', 'source_c'))
+CUSTOMER_ROWS_PAGE = register('customers.rows_page', """
+    SELECT customer_id, full_name, birthday, phone, email, registration_date, source_c
+    FROM customers
+    ORDER BY full_name, customer_id
+    LIMIT %s
+""", row=record_rows(CustomerRow))
+CUSTOMER_ROWS_PAGE_AFTER = register('customers.rows_page_after', """
+    SELECT customer_id, full_name, birthday, phone, email, registration_date, source_c
+    FROM customers
+    WHERE full_name > %s OR (full_name = %s AND customer_id > %s)
+    ORDER BY full_name, customer_id
+    LIMIT %s
+""", row=record_rows(CustomerRow))
+
+# Таблицы строк заказа: (таблица, первичный ключ, ссылка на товар или композицию)
+ORDER_LINE_TABLES = (
+    ('order_items', 'order_item_id', 'product_id'),
+    ('order_compositions', 'order_composition_id', 'composition_id'),
+)
+
+
+def stats_contribution(status, total_amount):
+    # Отменённые заказы не входят в число заказов и сумму покупок клиента
+    if status == CANCELLED_STATUS:
+        return 0, Decimal(0)
+    return 1, Decimal(sql_text(total_amount))
+
+
+def stats_change(old, new):
+    """Изменения customer_stats при переходе заказа из состояния old в new."""
+    old_count, old_spent = stats_contribution(old['status'], old['total_amount'])
+    new_count, new_spent = stats_contribution(new['status'], new['total_amount'])
+    if old['customer_id'] != new['customer_id']:
+        return [(old['customer_id'], -old_count, -old_spent, None),
+                (new['customer_id'], new_count, new_spent, new['order_date'])]
+    if (old_count, old_spent) == (new_count, new_spent):
+        return []
+    return [(new['customer_id'], new_count - old_count, new_spent - old_spent, None)]
+
+
+def is_composition(item):
+    return item.get('composition_id') is not None
+
+
+def add_demand(demand, items, boms, sign=1):
+    # Суммирует потребность в товарах по product_id; строки с composition_id
+    # раскрываются по составу из boms. sign=-1 вычитает
+    for item in items:
+        if is_composition(item):
+            for product_id, quantity in boms[item['composition_id']]['items']:
+                demand[product_id] = demand.get(product_id, 0) + sign * quantity * item['quantity']
+        else:
+            demand[item['product_id']] = demand.get(item['product_id'], 0) + sign * item['quantity']
+    return demand
+
+
+def add_rollup(totals, rows, key_columns, value_columns, sign=1):
+    # Суммирует строки сводки по ключу {key: [значения]}; sign=-1 вычитает
+    for row in rows:
+        values = totals.setdefault(tuple(row[column] for column in key_columns), [0] * len(value_columns))
+        for i, column in enumerate(value_columns):
+            values[i] += sign * row[column]
+    return totals
+
+
+def add_slot_usage(usage, order, sign=1):
+    # Неотменённый заказ занимает интервал доставки (delivery_date, delivery_time_from)
+    if order['status'] == CANCELLED_STATUS or not order['delivery_date'] or not order['delivery_time_from']:
+        return usage
+    key = (sql_text(order['delivery_date']), sql_text(order['delivery_time_from']))
+    usage[key] = usage.get(key, 0) + sign
+    return usage
+
+
+def like_prefix(prefix):
+    escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return escaped + '%'
+
+
+def sql_text(value):
+    # Приводит значения из pymysql и из формы к одному текстовому виду для сравнения
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        return f'{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+    if isinstance(value, (Decimal, float)):
+        return f'{value:.2f}'
+    return None if value is None else str(value)
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений бэкенда (backends.MySQLBackend или SQLiteBackend).
+
+    Держит не меньше min_size открытых соединений и не больше max_size всего.
+    Соединение, простоявшее дольше validate_after секунд, проверяется
+    backend.ping() при выдаче и при обрыве переподключается.
+    """
+
+    def __init__(self, backend, min_size=1, max_size=5, timeout=10, validate_after=5):
+        self.backend = backend
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.validate_after = validate_after
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+        for _ in range(min_size):
+            self._idle.append((self._open(), time.monotonic()))
+            self._size += 1
+
+    def _open(self):
+        return self.backend.connect()
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('Пул соединений закрыт')
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    raise PoolTimeout('Нет свободных соединений с базой данных')
+
+        try:
+            if conn is None:
+                return self._open()
+            if time.monotonic() - released_at >= self.validate_after:
+                self.backend.ping(conn)
+            return conn
+        except Exception:
+            self._discard(conn)
+            raise
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._closed:
+                conn.close()
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn):
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except self.backend.broken_errors:
+            self.release(conn, broken=True)
+            raise
+        except Exception:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                conn.close()
+                self._size -= 1
+            self._cond.notify_all()
+
+
+class Database:
+    def __init__(self, dsn=None, min_size=1, max_size=5, cache=None, metrics=None):
+        self.dsn = dsn or os.environ.get('FLOWER_SHOP_DSN', DEFAULT_DSN)
+        self.backend = backend_for_dsn(self.dsn)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        self.cache = cache or ReferenceCache()
+        self.slots = SlotIndex()
+        # Время, число строк и вызывающий метод каждого запроса (см. metrics.py)
+        self.metrics = metrics or QueryMetrics.from_env()
+
+    def connect(self):
+        try:
+            self._get_pool()
+            return True
+        except Exception as e:
+            return False
+
+    def disconnect(self):
+        with self._pool_lock:
+            if self.pool:
+                self.pool.close()
+                self.pool = None
+        self.metrics.flush()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self.pool is None:
+                self.backend.initialize()
+                self.pool = ConnectionPool(self.backend, self.min_size, self.max_size)
+            return self.pool
+
+    @contextmanager
+    def connection(self):
+        with self._get_pool().connection() as conn:
+            yield InstrumentedConnection(conn, self.metrics)
+
+    def is_unavailable(self, error):
+        # База недоступна (обрыв связи или нет свободных соединений), а не отклонила запрос
+        return isinstance(error, PoolTimeout) or self.backend.is_disconnect(error)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            conn.begin()
+            try:
+                with conn.cursor() as cursor:
+                    yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def execute_query(self, query, params=None):
+        # Разбор текста кэшируется: повторный запрос не классифицируется заново
+        is_select, table = statement_kind(query)
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                if is_select:
+                    return cursor.fetchall()
+                self._invalidate_written(table)
+                return cursor.lastrowid
+
+    def run(self, query, params=None):
+        """Выполняет зарегистрированный запрос (Query или его имя в queries.QUERIES).
+
+        Строки читаются курсором кортежей и собираются фабрикой запроса; результат —
+        в объявленной при регистрации форме ('rows', 'one', 'value', 'rowcount', 'lastrowid').
+        """
+        if isinstance(query, str):
+            query = QUERIES[query]
+        with self.connection() as conn:
+            with conn.cursor(self.backend.tuple_cursor) as cursor:
+                cursor.execute(query.sql, params)
+                result = query.result(cursor)
+        self._invalidate_written(query.table)
+        return result
+
+    def _invalidate_written(self, table):
+        if table:
+            self.cache.invalidate(CACHE_DEPENDENCIES.get(table, table))
+
+    def invalidate_reference(self, table=None):
+        self.cache.invalidate(table)
+
+    def _cached(self, table, key, loader):
+        policy = self.cache.policies[table]
+        fingerprint = None
+        if policy.get('fingerprint'):
+            fingerprint = lambda: self._table_fingerprint(table, policy['id_column'])
+        return self.cache.get(table, key, loader, fingerprint)
+
+    def _table_fingerprint(self, table, id_column):
+        row = self.execute_query(f"SELECT COUNT(*) AS row_count, MAX({id_column}) AS max_id FROM {table}")[0]
+        return row['row_count'], row['max_id']
+
+    def get_customers(self, limit=None, after=None):
+        return self._cached('customers', (limit, after), lambda: self._load_customers(limit, after))
+
+    def _load_customers(self, limit, after):
+        if limit is None:
+            return self.run(CUSTOMERS_ALL)
+        # Keyset-пагинация: after — (full_name, customer_id) последней полученной строки
+        if after:
+            last_name, last_id = after
+            return self.run(CUSTOMERS_PAGE_AFTER, (last_name, last_name, last_id, limit))
+        return self.run(CUSTOMERS_PAGE, (limit,))
+
+    def customer_rows(self, limit, after=None):
+        """Страница клиентов для таблицы интерфейса: записи CustomerRow без пароля и служебных столбцов."""
+        return self._cached('customers', ('rows', limit, after), lambda: self._load_customer_rows(limit, after))
+
+    def _load_customer_rows(self, limit, after):
+        if after:
+            last_name, last_id = after
+            return self.run(CUSTOMER_ROWS_PAGE_AFTER, (last_name, last_name, last_id, limit))
+        return self.run(CUSTOMER_ROWS_PAGE, (limit,))
+
+    def search_customers(self, prefix, limit=20):
+        return self.run(CUSTOMERS_SEARCH, (like_prefix(prefix), limit))
+
+    def get_product_prices(self, product_ids):
+        # Текущие цены товаров одним запросом: {product_id: {product_id, product_name, price}}
+        ids = sorted(set(product_ids))
+        if not ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(ids))
+        rows = self.execute_query(
+            f"SELECT product_id, product_name, price FROM products WHERE product_id IN ({placeholders})", ids)
+        return {row['product_id']: row for row in rows}
+
+    def get_composition_prices(self, composition_ids):
+        # Текущие цены композиций одним запросом в обход кэша составов:
+        # {composition_id: {composition_id, composition_name, price}}
+        ids = sorted(set(composition_ids))
+        if not ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(ids))
+        rows = self.execute_query(
+            f"SELECT composition_id, composition_name, price FROM floral_compositions "
+            f"WHERE composition_id IN ({placeholders})", ids)
+        return {row['composition_id']: row for row in rows}
+
+    def search_products(self, prefix, limit=20):
+        return self.run(PRODUCTS_SEARCH, (like_prefix(prefix), limit))
+
+    def get_employees(self):
+        return self._cached('employees', None, lambda: self.run(EMPLOYEES_ALL))
+
+    def get_products(self, limit=None, after=None):
+        return self._cached('products', (limit, after), lambda: self._load_products(limit, after))
+
+    def _load_products(self, limit, after):
+        if limit is None:
+            return self.run(PRODUCTS_ALL)
+        # Keyset-пагинация: after — (product_name, product_id) последней полученной строки
+        if after:
+            last_name, last_id = after
+            return self.run(PRODUCTS_PAGE_AFTER, (last_name, last_name, last_id, limit))
+        return self.run(PRODUCTS_PAGE, (limit,))
+
+    def product_rows(self, limit, after=None):
+        """Страница товаров для таблицы интерфейса: записи ProductRow."""
+        return self._cached('products', ('rows', limit, after), lambda: self._load_product_rows(limit, after))
+
+    def _load_product_rows(self, limit, after):
+        if after:
+            last_name, last_id = after
+            return self.run(PRODUCT_ROWS_PAGE_AFTER, (last_name, last_name, last_id, limit))
+        return self.run(PRODUCT_ROWS_PAGE, (limit,))
+
+    def get_composition_boms(self):
+        """Составы всех композиций: {composition_id: {..., 'items': [(product_id, quantity)]}}.
+
+        Справочник кэшируется целиком, поэтому цена корзины композиций и её
+        раскрытие в товары не требуют запросов на каждую строку.
+        """
+        return self._cached('composition_items', None, self._load_composition_boms)
+
+    def _load_composition_boms(self):
+        boms = {}
+        for row in self.run(COMPOSITION_BOMS):
+            bom = boms.get(row['composition_id'])
+            if bom is None:
+                bom = boms[row['composition_id']] = {
+                    'composition_id': row['composition_id'],
+                    'composition_name': row['composition_name'],
+                    'description': row['description'],
+                    'price': row['price'],
+                    'items': [],
+                }
+            if row['product_id'] is not None:
+                bom['items'].append((row['product_id'], row['quantity'] or 0))
+        return boms
+
+    def _boms_for(self, items):
+        # Композиция могла появиться после загрузки кэша — тогда перечитываем его один раз
+        boms = self.get_composition_boms()
+        missing = {item['composition_id'] for item in items if is_composition(item)} - boms.keys()
+        if missing:
+            self.cache.invalidate('composition_items')
+            boms = self.get_composition_boms()
+            missing -= boms.keys()
+            if missing:
+                raise ValueError(f'Композиция #{min(missing)} не найдена')
+        return boms
+
+    def get_compositions(self):
+        return list(self.get_composition_boms().values())
+
+    def expand_compositions(self, items):
+        """Потребность в товарах {product_id: количество} для строк корзины с учётом составов."""
+        return add_demand({}, items, self._boms_for(items))
+
+    def check_stock(self, items):
+        """Товары корзины, которых не хватает на складе: {product_id: (нужно, в наличии)}.
+
+        Проверка без блокировок для подсказки пользователю; окончательно остаток
+        проверяется при оформлении заказа в _reserve_stock.
+        """
+        demand = {product_id: quantity for product_id, quantity in self.expand_compositions(items).items()
+                  if quantity > 0}
+        if not demand:
+            return {}
+        placeholders = ', '.join(['%s'] * len(demand))
+        rows = self.execute_query(
+            f"SELECT product_id, quantity_in_stock FROM inventory WHERE product_id IN ({placeholders})",
+            tuple(demand))
+        return {row['product_id']: (demand[row['product_id']], row['quantity_in_stock'])
+                for row in rows if row['quantity_in_stock'] < demand[row['product_id']]}
+
+    def set_composition_items(self, composition_id, items):
+        """Заменяет состав композиции; items — пары (product_id, quantity)."""
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM composition_items WHERE composition_id = %s", (composition_id,))
+            if items:
+                cursor.executemany(
+                    "INSERT INTO composition_items (composition_id, product_id, quantity) VALUES (%s, %s, %s)",
+                    [(composition_id, product_id, quantity) for product_id, quantity in items])
+        # После фиксации, чтобы параллельная загрузка не закэшировала старый состав
+        self.cache.invalidate('composition_items')
+
+    def get_delivery_slots(self):
+        return self.slots.slots(self._load_delivery_slots)
+
+    def _load_delivery_slots(self):
+        return [{'slot_start': sql_text(row['slot_start']), 'slot_end': sql_text(row['slot_end']),
+                 'capacity': row['capacity']} for row in self.run(DELIVERY_SLOTS)]
+
+    def available_slots(self, delivery_date):
+        """Интервалы дня со свободными местами: определения плюс reserved и free.
+
+        Занятость берётся из индекса в памяти (self.slots), поэтому повторные
+        запросы не читают базу, а заказы не пересчитываются через COUNT.
+        """
+        day = sql_text(delivery_date)
+        reserved = self.slots.reserved(day, lambda: {
+            sql_text(row['slot_start']): row['reserved'] for row in self.run(SLOT_USAGE_DAY, (day,))
+        })
+        available = []
+        for slot in self.get_delivery_slots():
+            taken = reserved.get(slot['slot_start'], 0)
+            if taken < slot['capacity']:
+                available.append({**slot, 'reserved': taken, 'free': slot['capacity'] - taken})
+        return available
+
+    def set_slot_capacity(self, slot_start, capacity):
+        self.run(SET_SLOT_CAPACITY, (capacity, slot_start))
+        self.slots.invalidate()
+
+    def get_orders(self, status_filter=None, date_filter=None, limit=None, after=None, customer_id=None):
+        return self.run(*self._orders_list(status_filter, date_filter, limit, after, customer_id))
+
+    def order_rows(self, status_filter=None, date_filter=None, limit=None, after=None, customer_id=None):
+        """Список заказов для таблиц интерфейса: те же условия, что у get_orders, но записи OrderRow."""
+        flags, params = self._orders_list_params(status_filter, date_filter, limit, after, customer_id)
+        return self.run(ORDER_ROWS_LIST[flags], params)
+
+    def orders_query(self, status_filter=None, date_filter=None, limit=None, after=None, customer_id=None):
+        """(текст запроса, параметры) списка заказов — для EXPLAIN в check_indexes.py."""
+        query, params = self._orders_list(status_filter, date_filter, limit, after, customer_id)
+        return query.sql, params
+
+    def _orders_list(self, status_filter, date_filter, limit, after, customer_id):
+        flags, params = self._orders_list_params(status_filter, date_filter, limit, after, customer_id)
+        return ORDERS_LIST[flags], params
+
+    def _orders_list_params(self, status_filter, date_filter, limit, after, customer_id):
+        # Набор условий (ключ заранее построенного запроса) и параметры запроса
+        status = status_filter if status_filter and status_filter != "Все" else None
+        params = []
+        if customer_id is not None:
+            params.append(customer_id)
+        if status:
+            params.append(status)
+        if date_filter:
+            day = date_filter if isinstance(date_filter, date) else date.fromisoformat(date_filter)
+            params.extend([day, day + timedelta(days=1)])
+        if after:
+            last_date, last_id = after
+            params.extend([last_date, last_date, last_id])
+        if limit:
+            params.append(limit)
+        flags = (customer_id is not None, bool(status), bool(date_filter), bool(after), bool(limit))
+        return flags, params
+
+    def get_deliveries(self, delivery_date):
+        return self.run(DELIVERIES_DAY, (delivery_date,))
+
+    def explain(self, query, params=None):
+        with self.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("EXPLAIN " + query, params or None)
+                return cursor.fetchall()
+
+    def get_order(self, order_id):
+        rows = self.run(ORDER_WITH_LINES, (order_id, order_id, order_id))
+        if not rows:
+            return None
+
+        item_keys = ('order_item_id', 'product_id', 'quantity', 'price_per_unit', 'product_name')
+        composition_keys = ('order_composition_id', 'composition_id', 'quantity', 'price_per_unit', 'product_name')
+        line_keys = set(item_keys) | set(composition_keys)
+        order = {key: value for key, value in zip(rows[0].keys(), rows[0]) if key not in line_keys}
+        order['items'] = []
+        for row in rows:
+            if row['order_item_id'] is not None:
+                order['items'].append({key: row[key] for key in item_keys})
+            elif row['order_composition_id'] is not None:
+                order['items'].append({key: row[key] for key in composition_keys})
+        return order
+
+    def get_order_items(self, order_id):
+        return self.run(ORDER_ITEMS, (order_id,))
+
+    def create_order(self, customer_id, employee_id, delivery_date, delivery_time_from,
+                     delivery_time_to, delivery_address, payment_method, items):
+        order = {
+            'customer_id': customer_id,
+            'employee_id': employee_id,
+            'delivery_date': delivery_date,
+            'delivery_time_from': delivery_time_from,
+            'delivery_time_to': delivery_time_to,
+            'delivery_address': delivery_address,
+            'payment_method': payment_method,
+            'items': items,
+        }
+        return self.create_orders([order])[0]
+
+    def create_orders(self, orders):
+        """Создаёт несколько заказов в одной транзакции.
+
+        Каждый заказ — словарь с ключами параметров create_order; необязательные
+        order_date и status позволяют импортировать заказы задним числом, а
+        client_ref — идентификатор заказа из офлайн-очереди (уникален в orders).
+        Строка заказа ссылается либо на товар (product_id), либо на композицию
+        (composition_id). Строки всех заказов вставляются пакетными INSERT.
+        """
+        order_query = """
+            INSERT INTO orders (customer_id, employee_responsible_id, order_date, 
+                              delivery_date, delivery_time_from, delivery_time_to, 
+                              delivery_address, status, total_amount, payment_method, client_ref)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+        item_query = """
+            INSERT INTO order_items (order_id, product_id, quantity, price_per_unit)
+            VALUES (%s, %s, %s, %s)
+        """
+        composition_query = """
+            INSERT INTO order_compositions (order_id, composition_id, quantity, price_per_unit)
+            VALUES (%s, %s, %s, %s)
+        """
+
+        # Проверка композиций по кэшу до начала транзакции, чтобы не держать блокировки;
+        # потребность в товарах считается внутри транзакции по снимку составов
+        self._boms_for([item for order in orders for item in order['items']])
+
+        order_ids = []
+        active_ids = []
+        item_rows = []
+        composition_rows = []
+        stats = []
+        slot_usage = {}
+        with self.transaction() as cursor:
+            cursor.execute("SELECT NOW() AS now")
+            now = cursor.fetchone()['now']
+
+            for order in orders:
+                items = order['items']
+                total_amount = sum(item['quantity'] * item['price'] for item in items)
+                order_date = order.get('order_date') or now
+                status = order.get('status', 'В обработке')
+                cursor.execute(order_query, (order['customer_id'], order['employee_id'],
+                                             order_date, order['delivery_date'],
+                                             order['delivery_time_from'], order['delivery_time_to'],
+                                             order['delivery_address'], status,
+                                             total_amount, order['payment_method'],
+                                             order.get('client_ref')))
+                order_id = cursor.lastrowid
+                order_ids.append(order_id)
+                for item in items:
+                    if is_composition(item):
+                        composition_rows.append((order_id, item['composition_id'], item['quantity'], item['price']))
+                    else:
+                        item_rows.append((order_id, item['product_id'], item['quantity'], item['price']))
+                stats.append((order['customer_id'], *stats_contribution(status, total_amount), order_date))
+                if status != CANCELLED_STATUS:
+                    active_ids.append(order_id)
+                add_slot_usage(slot_usage, {**order, 'status': status})
+
+            if item_rows:
+                cursor.executemany(item_query, item_rows)
+            if composition_rows:
+                cursor.executemany(composition_query, composition_rows)
+                self._snapshot_compositions(cursor, order_ids)
+            self._adjust_customer_stats(cursor, stats)
+            self._reserve_slots(cursor, slot_usage)
+            self._reserve_stock(cursor, self._order_demand(cursor, active_ids))
+            self._apply_sales_rollup(cursor, self._collect_sales(cursor, {}, order_ids, 1))
+
+        self.slots.apply(slot_usage)
+        return order_ids
+
+    def find_client_refs(self, client_refs):
+        # Какие из идентификаторов офлайн-заказов уже есть в orders: {client_ref: order_id}
+        refs = list(client_refs)
+        if not refs:
+            return {}
+        placeholders = ', '.join(['%s'] * len(refs))
+        rows = self.execute_query(
+            f"SELECT client_ref, order_id FROM orders WHERE client_ref IN ({placeholders})", refs)
+        return {row['client_ref']: row['order_id'] for row in rows}
+
+    def update_order(self, order_id, header, items):
+        """Применяет к заказу только изменённые поля и разницу по строкам заказа.
+
+        header — поля из ORDER_FIELDS; items — строки заказа (товары и композиции),
+        у сохранённых есть order_item_id или order_composition_id. Новые строки
+        добавляются, отсутствующие в items удаляются, у остальных обновляются
+        количество и цена, если они изменились. Возвращает словарь изменённых полей заголовка.
+        """
+        # Новые композиции должны существовать; их состав запоминается в транзакции
+        self._boms_for(items)
+
+        with self.transaction() as cursor:
+            cursor.execute("SELECT * FROM orders WHERE order_id = %s FOR UPDATE", (order_id,))
+            current = cursor.fetchone()
+            if not current:
+                raise ValueError(f'Заказ #{order_id} не найден')
+
+            line_changes = []
+            for table, id_column, ref_column in ORDER_LINE_TABLES:
+                cursor.execute(f"""
+                    SELECT {id_column}, {ref_column}, quantity, price_per_unit
+                    FROM {table} WHERE order_id = %s FOR UPDATE
+                """, (order_id,))
+                existing = {row[id_column]: row for row in cursor.fetchall()}
+
+                kept = set()
+                updated = []
+                inserted = []
+                for item in items:
+                    if item.get(ref_column) is None:
+                        continue
+                    old = existing.get(item.get(id_column))
+                    if old is None:
+                        inserted.append((order_id, item[ref_column], item['quantity'], item['price']))
+                        continue
+                    kept.add(old[id_column])
+                    if (item['quantity'] != old['quantity']
+                            or sql_text(item['price']) != sql_text(old['price_per_unit'])):
+                        updated.append((item['quantity'], item['price'], old[id_column]))
+                deleted = [line_id for line_id in existing if line_id not in kept]
+                if deleted or updated or inserted:
+                    line_changes.append((table, id_column, ref_column, deleted, updated, inserted))
+
+            changes = {field: header[field] for field in ORDER_FIELDS
+                       if field in header and sql_text(header[field]) != sql_text(current[field])}
+            total_amount = sum(item['quantity'] * item['price'] for item in items)
+            if sql_text(total_amount) != sql_text(current['total_amount']):
+                changes['total_amount'] = total_amount
+
+            if not (line_changes or changes):
+                return changes
+
+            new_status = changes.get('status', current['status'])
+            # Потребность пересчитывается, только если менялись строки или заказ отменялся/восстанавливался
+            demand_changed = bool(line_changes) or (current['status'] == CANCELLED_STATUS) != (
+                new_status == CANCELLED_STATUS)
+            old_demand = {}
+            if demand_changed and current['status'] != CANCELLED_STATUS:
+                old_demand = self._order_demand(cursor, [order_id])
+
+            rollup = self._collect_sales(cursor, {}, [order_id], -1)
+
+            for table, id_column, ref_column, deleted, updated, inserted in line_changes:
+                if deleted:
+                    placeholders = ', '.join(['%s'] * len(deleted))
+                    if table == 'order_compositions':
+                        cursor.execute(
+                            f"DELETE FROM order_composition_items WHERE order_composition_id IN ({placeholders})",
+                            deleted)
+                    cursor.execute(f"DELETE FROM {table} WHERE {id_column} IN ({placeholders})", deleted)
+                if updated:
+                    cursor.executemany(
+                        f"UPDATE {table} SET quantity = %s, price_per_unit = %s WHERE {id_column} = %s",
+                        updated)
+                if inserted:
+                    cursor.executemany(
+                        f"INSERT INTO {table} (order_id, {ref_column}, quantity, price_per_unit) "
+                        f"VALUES (%s, %s, %s, %s)", inserted)
+                    if table == 'order_compositions':
+                        self._snapshot_compositions(cursor, [order_id])
+
+            slot_usage = {}
+            if changes:
+                assignments = ', '.join(f'{field} = %s' for field in changes)
+                cursor.execute(f"UPDATE orders SET {assignments} WHERE order_id = %s",
+                               (*changes.values(), order_id))
+
+                new = {**current, **changes}
+                self._adjust_customer_stats(cursor, stats_change(current, new))
+                add_slot_usage(add_slot_usage(slot_usage, current, -1), new)
+
+            self._collect_sales(cursor, rollup, [order_id], 1)
+
+            demand = {}
+            if demand_changed:
+                if new_status != CANCELLED_STATUS:
+                    demand = self._order_demand(cursor, [order_id])
+                for product_id, quantity in old_demand.items():
+                    demand[product_id] = demand.get(product_id, 0) - quantity
+            self._reserve_slots(cursor, slot_usage)
+            self._reserve_stock(cursor, demand)
+            self._apply_sales_rollup(cursor, rollup)
+
+        self.slots.apply(slot_usage)
+        return changes
+
+    def update_order_status(self, order_id, status):
+        with self.transaction() as cursor:
+            cursor.execute("SELECT * FROM orders WHERE order_id = %s FOR UPDATE", (order_id,))
+            current = cursor.fetchone()
+            if not current:
+                raise ValueError(f'Заказ #{order_id} не найден')
+            if current['status'] == status:
+                return
+
+            rollup = self._collect_sales(cursor, {}, [order_id], -1)
+            cursor.execute("UPDATE orders SET status = %s WHERE order_id = %s", (status, order_id))
+            self._adjust_customer_stats(cursor, stats_change(current, {**current, 'status': status}))
+            self._collect_sales(cursor, rollup, [order_id], 1)
+            slot_usage = add_slot_usage(add_slot_usage({}, current, -1), {**current, 'status': status})
+            self._reserve_slots(cursor, slot_usage)
+
+            # Отмена возвращает товар на склад, снятие отмены резервирует его снова
+            # по снимку состава композиций на момент оформления
+            if (current['status'] == CANCELLED_STATUS) != (status == CANCELLED_STATUS):
+                sign = -1 if status == CANCELLED_STATUS else 1
+                demand = self._order_demand(cursor, [order_id])
+                self._reserve_stock(cursor, {product_id: sign * quantity
+                                             for product_id, quantity in demand.items()})
+            self._apply_sales_rollup(cursor, rollup)
+
+        self.slots.apply(slot_usage)
+
+    def _reserve_slots(self, cursor, usage):
+        """Занимает (положительное число) или освобождает (отрицательное) места в интервалах доставки.
+
+        Место занимается одним условным UPDATE, который не даёт превысить capacity.
+        Строки счётчиков блокируются в порядке (дата, начало интервала), до строк
+        inventory. Время, не совпадающее с началом интервала, не ограничивается.
+        """
+        for (delivery_date, slot_start), count in sorted(usage.items()):
+            if count > 0:
+                # Создаёт счётчик дня под эксклюзивной блокировкой (ON DUPLICATE KEY, а не
+                # INSERT IGNORE, чтобы две транзакции не взаимоблокировались на повышении блокировки)
+                cursor.execute("""
+                    INSERT INTO delivery_slot_usage (delivery_date, slot_start, reserved)
+                    SELECT %s, slot_start, 0 FROM delivery_slots WHERE slot_start = %s
+                    ON DUPLICATE KEY UPDATE reserved = delivery_slot_usage.reserved
+                """, (delivery_date, slot_start))
+                cursor.execute("""
+                    UPDATE delivery_slot_usage SET reserved = reserved + %s
+                    WHERE delivery_date = %s AND slot_start = %s
+                      AND reserved + %s <= (SELECT capacity FROM delivery_slots WHERE slot_start = %s)
+                """, (count, delivery_date, slot_start, count, slot_start))
+                if cursor.rowcount == 0:
+                    cursor.execute("SELECT capacity FROM delivery_slots WHERE slot_start = %s", (slot_start,))
+                    if cursor.fetchone() is not None:
+                        # Занятость дня в памяти устарела — её перечитают при следующем запросе
+                        self.slots.forget(delivery_date)
+                        raise SlotFullError(delivery_date, slot_start)
+            elif count < 0:
+                cursor.execute("""
+                    UPDATE delivery_slot_usage SET reserved = GREATEST(reserved - %s, 0)
+                    WHERE delivery_date = %s AND slot_start = %s
+                """, (-count, delivery_date, slot_start))
+
+    def _reserve_stock(self, cursor, demand):
+        """Списывает (положительное количество) или возвращает (отрицательное) товар на склад.
+
+        Строки inventory блокируются в порядке product_id, поэтому параллельные
+        заказы с общими товарами ждут друг друга, но не взаимоблокируются. Списание —
+        один условный UPDATE на товар без предварительного SELECT ... FOR UPDATE.
+        Товары без строки в inventory считаются неучитываемыми.
+        """
+        for product_id, quantity in sorted(demand.items()):
+            if quantity > 0:
+                cursor.execute("""
+                    UPDATE inventory SET quantity_in_stock = quantity_in_stock - %s
+                    WHERE product_id = %s AND quantity_in_stock >= %s
+                """, (quantity, product_id, quantity))
+                if cursor.rowcount == 0:
+                    cursor.execute("SELECT quantity_in_stock FROM inventory WHERE product_id = %s",
+                                   (product_id,))
+                    row = cursor.fetchone()
+                    if row is not None:
+                        raise OutOfStockError(product_id, quantity, row['quantity_in_stock'])
+            elif quantity < 0:
+                cursor.execute(
+                    "UPDATE inventory SET quantity_in_stock = quantity_in_stock + %s WHERE product_id = %s",
+                    (-quantity, product_id))
+
+    def _snapshot_compositions(self, cursor, order_ids):
+        # Запоминает текущий состав новых строк композиций заказов order_ids
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        cursor.execute(ORDER_COMPOSITION_SNAPSHOT_SQL.format(ids=placeholders), order_ids)
+
+    def _order_demand(self, cursor, order_ids):
+        # Потребность заказов в товарах {product_id: количество} по строкам и снимкам составов
+        if not order_ids:
+            return {}
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        cursor.execute(ORDER_DEMAND_SQL.format(ids=placeholders), (*order_ids, *order_ids))
+        return {row['product_id']: int(row['quantity']) for row in cursor.fetchall()}
+
+    def _collect_sales(self, cursor, rollup, order_ids, sign):
+        # Прибавляет к rollup вклад заказов в их текущем состоянии со знаком sign
+        # (отменённые заказы вклада не дают). Только чтение: строки сводок не блокируются
+        if not order_ids:
+            return rollup
+        placeholders = ', '.join(['%s'] * len(order_ids))
+        cursor.execute(SALES_DAILY_SELECT_SQL.format(ids=placeholders), order_ids)
+        add_rollup(rollup.setdefault('sales_daily', {}), cursor.fetchall(),
+                   ('sale_date', 'employee_id', 'payment_method'), ('orders_count', 'revenue'), sign)
+        cursor.execute(SALES_PRODUCTS_SELECT_SQL.format(ids=placeholders), (*order_ids, *order_ids))
+        add_rollup(rollup.setdefault('sales_daily_products', {}), cursor.fetchall(),
+                   ('sale_date', 'product_id', 'category_id'), ('quantity', 'revenue'), sign)
+        return rollup
+
+    def _apply_sales_rollup(self, cursor, rollup):
+        """Прибавляет накопленные в rollup изменения к дневным сводкам.
+
+        Вызывается последним запросом транзакции заказа: строка sales_daily общая
+        для всех заказов дня, и её блокировка держится только до COMMIT. Строки
+        обновляются в порядке ключа, нулевые изменения пропускаются.
+        """
+        for table, sql in (('sales_daily', SALES_DAILY_UPSERT_SQL),
+                           ('sales_daily_products', SALES_PRODUCTS_UPSERT_SQL)):
+            rows = [(*key, *values) for key, values in sorted(rollup.get(table, {}).items()) if any(values)]
+            if rows:
+                cursor.executemany(sql, rows)
+
+    def _adjust_customer_stats(self, cursor, rows):
+        # rows — (customer_id, изменение числа заказов, изменение суммы, дата заказа или None)
+        if not rows:
+            return
+
+        cursor.executemany("""
+            INSERT INTO customer_stats (customer_id, orders_count, total_spent, last_order_date)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                orders_count = orders_count + VALUES(orders_count),
+                total_spent = total_spent + VALUES(total_spent),
+                last_order_date = GREATEST(COALESCE(last_order_date, VALUES(last_order_date)),
+                                           COALESCE(VALUES(last_order_date), last_order_date))
+        """, rows)
+
+    def get_customer_stats(self, customer_id):
+        stats = self.run(CUSTOMER_STATS, (customer_id,))
+        return stats or {'orders_count': 0, 'total_spent': 0, 'last_order_date': None}
+
+    def refresh_customer_stats(self):
+        # Полный пересчёт сводки; нужен только для восстановления после ручных правок в orders
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM customer_stats")
+            cursor.execute(REFRESH_CUSTOMER_STATS_SQL)
+
+    def refresh_composition_snapshots(self):
+        # Снимки составов для строк композиций, вставленных в обход create_orders/update_order
+        with self.transaction() as cursor:
+            cursor.execute(ORDER_COMPOSITION_SNAPSHOT_SQL.format(ids='SELECT order_id FROM orders'))
+
+    def refresh_sales_rollups(self):
+        # Полный пересчёт дневных сводок, например после массовой загрузки заказов в обход create_orders
+        all_orders = 'SELECT order_id FROM orders'
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM sales_daily")
+            cursor.execute("DELETE FROM sales_daily_products")
+            cursor.execute("INSERT INTO sales_daily (sale_date, employee_id, payment_method, orders_count, revenue)"
+                           + SALES_DAILY_SELECT_SQL.format(ids=all_orders))
+            cursor.execute("INSERT INTO sales_daily_products (sale_date, product_id, category_id, quantity, revenue)"
+                           + SALES_PRODUCTS_SELECT_SQL.format(ids=all_orders))
+
+    def refresh_slot_usage(self):
+        # Полный пересчёт занятости интервалов доставки по неотменённым заказам
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM delivery_slot_usage")
+            cursor.execute("""
+                INSERT INTO delivery_slot_usage (delivery_date, slot_start, reserved)
+                SELECT o.delivery_date, s.slot_start, COUNT(*)
+                FROM orders o
+                JOIN delivery_slots s ON s.slot_start = o.delivery_time_from
+                WHERE o.status <> %s AND o.delivery_date IS NOT NULL
+                GROUP BY o.delivery_date, s.slot_start
+            """, (CANCELLED_STATUS,))
+        self.slots.invalidate()
+
+    def authenticate_user(self, email, password, user_type):
+        result = self._verify_user(email, password, [user_type])
+        return result[0] if result else None
+
+    def authenticate(self, email, password):
+        """(пользователь, 'admin' | 'customer') по email и паролю или None; сотрудники проверяются первыми."""
+        return self._verify_user(email, password, USER_TABLES)
+
+    def _verify_user(self, email, password, user_types):
+        # Выборка идёт по индексу email, пароль проверяется в приложении. Открытый
+        # пароль или хэш с устаревшими параметрами сразу перехэшируется.
+        found = False
+        for user_type in user_types:
+            table, id_column = USER_TABLES[user_type]
+            for user in self.execute_query(f"SELECT * FROM {table} WHERE email = %s", (email,)):
+                found = True
+                stored = user.pop('password')
+                if verify_password(password, stored):
+                    if needs_rehash(stored):
+                        self.execute_query(f"UPDATE {table} SET password = %s WHERE {id_column} = %s",
+                                           (hash_password(password), user[id_column]))
+                    return user, user_type
+        if not found:
+            dummy_verify(password)
+        return None
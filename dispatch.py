@@ -0,0 +1,236 @@
+import csv
+import json
+import os
+from datetime import timedelta
+
+import numpy as np
+
+from paths import data_path
+
+EARTH_RADIUS_KM = 6371.0
+DAY_END = 24 * 60
+
+# Точка отправления курьеров (магазин); переопределяется FLOWER_SHOP_DEPOT="широта,долгота"
+DEFAULT_DEPOT = (55.7558, 37.6173)
+# Файл кэша координат в каталоге данных пользователя (см. paths.py)
+GEOCODE_CACHE_FILE_NAME = 'geocode_cache.json'
+
+
+def default_depot():
+    value = os.environ.get('FLOWER_SHOP_DEPOT')
+    if not value:
+        return DEFAULT_DEPOT
+    lat, lon = value.split(',')
+    return float(lat), float(lon)
+
+
+def normalize_address(address):
+    return ' '.join(address.lower().replace('ё', 'е').split())
+
+
+class GeocodeCache:
+    """Координаты адресов из JSON-файла {адрес: [широта, долгота]}.
+
+    geocoder — необязательная функция address -> (lat, lon) или None для адресов,
+    которых нет в файле; найденные координаты добавляются в кэш и записываются save().
+    Без geocoder работает полностью офлайн, а координаты загружаются import_csv().
+    """
+
+    def __init__(self, path=None, geocoder=None):
+        self.path = path or data_path(GEOCODE_CACHE_FILE_NAME)
+        self.geocoder = geocoder
+        self._points = {}
+        self._dirty = False
+        if os.path.exists(self.path):
+            with open(self.path, encoding='utf-8') as f:
+                self._points = {normalize_address(address): tuple(point)
+                                for address, point in json.load(f).items()}
+
+    def __len__(self):
+        return len(self._points)
+
+    def import_csv(self, path):
+        """Добавляет координаты из CSV «адрес,широта,долгота» и сохраняет кэш.
+
+        Первая строка может быть заголовком. Возвращает число загруженных адресов.
+        """
+        count = 0
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            for line_number, row in enumerate(csv.reader(f), 1):
+                if not row or not row[0].strip():
+                    continue
+                try:
+                    address, lat, lon = row
+                    point = (float(lat), float(lon))
+                except ValueError:
+                    if line_number == 1:
+                        continue
+                    raise ValueError(f'{path}, строка {line_number}: ожидается «адрес,широта,долгота»')
+                self._points[normalize_address(address)] = point
+                count += 1
+        self._dirty = self._dirty or count > 0
+        self.save()
+        return count
+
+    def lookup(self, address):
+        key = normalize_address(address or '')
+        point = self._points.get(key)
+        if point is None and key and self.geocoder is not None:
+            point = self.geocoder(address)
+            if point is not None:
+                point = self._points[key] = tuple(point)
+                self._dirty = True
+        return point
+
+    def save(self):
+        if not (self._dirty and self.path):
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({address: list(point) for address, point in self._points.items()},
+                      f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.path)
+        self._dirty = False
+
+
+def haversine_matrix(points):
+    """Матрица расстояний по большому кругу в км между точками (n × 2, градусы)."""
+    lat = np.radians(points[:, 0])
+    lon = np.radians(points[:, 1])
+    dlat = lat[None, :] - lat[:, None]
+    dlon = lon[None, :] - lon[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def minutes(value, default=None):
+    # TIME из pymysql приходит как timedelta, из формы — строкой 'ЧЧ:ММ[:СС]'
+    if value is None or value == '':
+        return default
+    if isinstance(value, timedelta):
+        return value.total_seconds() / 60
+    hours, mins = str(value).split(':')[:2]
+    return int(hours) * 60 + int(mins)
+
+
+def clock(value):
+    value = int(round(value))
+    return f'{value // 60:02d}:{value % 60:02d}'
+
+
+class RoutePlanner:
+    """Разбивает доставки дня на маршруты курьеров с учётом окон доставки.
+
+    Жадная эвристика «ближайший допустимый сосед»: маршрут начинается в депо
+    в shift_start, и на каждом шаге курьер едет к заказу с самым ранним
+    возможным началом вручения среди тех, куда он успевает до конца окна.
+    Когда таких заказов нет или набрано max_stops, начинается маршрут
+    следующего курьера. Шаг считается векторно по всем оставшимся заказам,
+    поэтому несколько сотен точек планируются за миллисекунды.
+    """
+
+    def __init__(self, depot=None, speed_kmh=25.0, service_minutes=10.0, max_stops=15,
+                 shift_start='08:00', max_couriers=None):
+        self.depot = depot or default_depot()
+        self.speed_kmh = speed_kmh
+        self.service_minutes = service_minutes
+        self.max_stops = max_stops
+        self.shift_start = minutes(shift_start)
+        self.max_couriers = max_couriers
+
+    def plan(self, stops, points):
+        """Строит маршруты для stops (словари с delivery_time_from/delivery_time_to).
+
+        points — координаты тех же заказов (n × 2). Возвращает
+        {'routes': [...], 'unrouted': [...]}; у невключённых заказов есть 'reason'.
+        """
+        count = len(stops)
+        if not count:
+            return {'routes': [], 'unrouted': []}
+
+        coordinates = np.vstack([np.asarray(self.depot, dtype=np.float64)[None, :],
+                                 np.asarray(points, dtype=np.float64).reshape(count, 2)])
+        distance = haversine_matrix(coordinates)
+        travel = distance / self.speed_kmh * 60.0
+
+        earliest = np.array([minutes(stop.get('delivery_time_from'), self.shift_start) for stop in stops],
+                            dtype=np.float64)
+        latest = np.array([minutes(stop.get('delivery_time_to'), DAY_END) for stop in stops],
+                          dtype=np.float64)
+        remaining = np.ones(count, dtype=bool)
+
+        routes = []
+        unrouted = []
+        while remaining.any():
+            if self.max_couriers is not None and len(routes) >= self.max_couriers:
+                unrouted.extend({**stops[i], 'reason': 'не хватает курьеров'} for i in np.flatnonzero(remaining))
+                break
+
+            route = self._build_route(stops, distance, travel, earliest, latest, remaining)
+            if not route['stops']:
+                # Ни в одно оставшееся окно нельзя успеть даже прямо из депо
+                unrouted.extend({**stops[i], 'reason': 'окно недостижимо'} for i in np.flatnonzero(remaining))
+                break
+            route['courier'] = len(routes) + 1
+            routes.append(route)
+
+        return {'routes': routes, 'unrouted': unrouted}
+
+    def _build_route(self, stops, distance, travel, earliest, latest, remaining):
+        now = self.shift_start
+        position = 0
+        route_stops = []
+        total_km = 0.0
+        while len(route_stops) < self.max_stops:
+            arrival = now + travel[position, 1:]
+            feasible = remaining & (arrival <= latest)
+            if not feasible.any():
+                break
+            start = np.maximum(arrival, earliest)
+            # Самое раннее начало вручения; при равенстве — ближайший заказ
+            score = np.where(feasible, start + travel[position, 1:] * 1e-3, np.inf)
+            index = int(np.argmin(score))
+
+            remaining[index] = False
+            total_km += distance[position, index + 1]
+            route_stops.append({
+                **stops[index],
+                'arrival': clock(arrival[index]),
+                'service_start': clock(start[index]),
+                'wait_minutes': float(start[index] - arrival[index]),
+                'leg_km': float(distance[position, index + 1]),
+            })
+            now = start[index] + self.service_minutes
+            position = index + 1
+
+        if route_stops:
+            total_km += distance[position, 0]
+            now += travel[position, 0]
+        return {
+            'stops': route_stops,
+            'distance_km': float(total_km),
+            'start': clock(self.shift_start),
+            'finish': clock(now),
+        }
+
+
+def plan_deliveries(db, delivery_date, geocode_cache=None, planner=None):
+    """Маршруты на день: заказы с доставкой на delivery_date, координаты из geocode_cache."""
+    geocode_cache = geocode_cache or GeocodeCache()
+    planner = planner or RoutePlanner()
+
+    located = []
+    points = []
+    unrouted = []
+    for stop in db.get_deliveries(delivery_date):
+        point = geocode_cache.lookup(stop['delivery_address'])
+        if point is None:
+            unrouted.append({**stop, 'reason': 'адрес не найден'})
+        else:
+            located.append(stop)
+            points.append(point)
+    geocode_cache.save()
+
+    plan = planner.plan(located, np.array(points, dtype=np.float64).reshape(len(points), 2))
+    plan['unrouted'] = unrouted + plan['unrouted']
+    return plan
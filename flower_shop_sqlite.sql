@@ -0,0 +1,168 @@
+-- Схема встроенной базы SQLite (SQLiteBackend) — то же, что flower_shop.txt после всех
+-- миграций из migrations/. При добавлении миграции повторите её изменения здесь.
+-- Все операторы идемпотентны: файл выполняется при каждом подключении Database.
+
+CREATE TABLE IF NOT EXISTS customers (
+customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+full_name VARCHAR(255) NOT NULL DEFAULT '',
+birthday DATE,
+phone VARCHAR(20),
+email VARCHAR(255),
+registration_date DATE,
+source_c VARCHAR(50),
+password VARCHAR(255));
+
+CREATE INDEX IF NOT EXISTS idx_customers_full_name ON customers (full_name);
+CREATE INDEX IF NOT EXISTS idx_customers_email ON customers (email);
+
+CREATE TABLE IF NOT EXISTS employees (
+employee_id INTEGER PRIMARY KEY AUTOINCREMENT,
+full_name VARCHAR(255),
+position VARCHAR(100),
+phone VARCHAR(20),
+email VARCHAR(255),
+hire_date DATE,
+password VARCHAR(255));
+
+CREATE INDEX IF NOT EXISTS idx_employees_email ON employees (email);
+
+CREATE TABLE IF NOT EXISTS product_categories (
+category_id INTEGER PRIMARY KEY AUTOINCREMENT,
+category_name VARCHAR(100),
+description TEXT);
+
+CREATE TABLE IF NOT EXISTS products (
+product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+category_id INT,
+product_name VARCHAR(255) NOT NULL DEFAULT '',
+description TEXT,
+price DECIMAL(10, 2),
+unit VARCHAR(50),
+photo_url VARCHAR(255),
+FOREIGN KEY (category_id) REFERENCES product_categories(category_id));
+
+CREATE INDEX IF NOT EXISTS idx_products_product_name ON products (product_name);
+
+CREATE TABLE IF NOT EXISTS orders (
+order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+customer_id INT,
+employee_responsible_id INT,
+order_date DATETIME,
+delivery_date DATE,
+delivery_time_from TIME,
+delivery_time_to TIME,
+delivery_address VARCHAR(255),
+status VARCHAR(50),
+total_amount DECIMAL(10, 2),
+payment_method VARCHAR(50),
+client_ref CHAR(36),
+FOREIGN KEY (customer_id) REFERENCES customers(customer_id),
+FOREIGN KEY (employee_responsible_id) REFERENCES employees(employee_id));
+
+CREATE INDEX IF NOT EXISTS idx_orders_date ON orders (order_date, order_id);
+CREATE INDEX IF NOT EXISTS idx_orders_customer_date ON orders (customer_id, order_date);
+CREATE INDEX IF NOT EXISTS idx_orders_status_date ON orders (status, order_date);
+CREATE INDEX IF NOT EXISTS idx_orders_delivery_slot ON orders (delivery_date, delivery_time_from);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_client_ref ON orders (client_ref);
+
+CREATE TABLE IF NOT EXISTS order_items (
+order_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+order_id INT,
+product_id INT,
+quantity INT,
+price_per_unit DECIMAL(10, 2),
+FOREIGN KEY (order_id) REFERENCES orders(order_id),
+FOREIGN KEY (product_id) REFERENCES products(product_id));
+
+CREATE TABLE IF NOT EXISTS floral_compositions (
+composition_id INTEGER PRIMARY KEY AUTOINCREMENT,
+composition_name VARCHAR(255),
+description TEXT,
+price DECIMAL(10, 2),
+photo_url VARCHAR(255));
+
+CREATE TABLE IF NOT EXISTS composition_items (
+composition_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
+composition_id INT,
+product_id INT,
+quantity INT,
+FOREIGN KEY (composition_id) REFERENCES floral_compositions(composition_id),
+FOREIGN KEY (product_id) REFERENCES products(product_id));
+
+CREATE TABLE IF NOT EXISTS order_compositions (
+order_composition_id INTEGER PRIMARY KEY AUTOINCREMENT,
+order_id INT NOT NULL,
+composition_id INT NOT NULL,
+quantity INT NOT NULL,
+price_per_unit DECIMAL(10, 2) NOT NULL,
+FOREIGN KEY (order_id) REFERENCES orders(order_id),
+FOREIGN KEY (composition_id) REFERENCES floral_compositions(composition_id));
+
+CREATE TABLE IF NOT EXISTS order_composition_items (
+order_composition_id INT NOT NULL,
+order_id INT NOT NULL,
+product_id INT NOT NULL,
+quantity INT NOT NULL,
+PRIMARY KEY (order_composition_id, product_id),
+FOREIGN KEY (order_composition_id) REFERENCES order_compositions(order_composition_id),
+FOREIGN KEY (order_id) REFERENCES orders(order_id),
+FOREIGN KEY (product_id) REFERENCES products(product_id));
+CREATE INDEX IF NOT EXISTS idx_order_composition_items_order ON order_composition_items (order_id);
+
+CREATE TABLE IF NOT EXISTS inventory (
+product_id INT PRIMARY KEY,
+quantity_in_stock INT,
+min_quantity_threshold INT,
+last_restock_date DATE,
+stock_margin INT AS (quantity_in_stock - min_quantity_threshold) VIRTUAL,
+FOREIGN KEY (product_id) REFERENCES products(product_id));
+
+CREATE INDEX IF NOT EXISTS idx_inventory_stock_margin ON inventory (stock_margin);
+
+CREATE TABLE IF NOT EXISTS customer_stats (
+customer_id INT PRIMARY KEY,
+orders_count INT NOT NULL DEFAULT 0,
+total_spent DECIMAL(12, 2) NOT NULL DEFAULT 0,
+last_order_date DATETIME NULL,
+FOREIGN KEY (customer_id) REFERENCES customers(customer_id));
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+sale_date DATE NOT NULL,
+employee_id INT NOT NULL,
+payment_method VARCHAR(50) NOT NULL,
+orders_count INT NOT NULL DEFAULT 0,
+revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+PRIMARY KEY (sale_date, employee_id, payment_method));
+
+CREATE TABLE IF NOT EXISTS sales_daily_products (
+sale_date DATE NOT NULL,
+product_id INT NOT NULL,
+category_id INT NOT NULL,
+quantity INT NOT NULL DEFAULT 0,
+revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+PRIMARY KEY (sale_date, product_id));
+
+CREATE INDEX IF NOT EXISTS idx_sales_daily_products_category ON sales_daily_products (category_id, sale_date);
+
+CREATE TABLE IF NOT EXISTS delivery_slots (
+slot_start TIME PRIMARY KEY,
+slot_end TIME NOT NULL,
+capacity INT NOT NULL);
+
+INSERT OR IGNORE INTO delivery_slots (slot_start, slot_end, capacity)
+VALUES ('09:00:00', '10:00:00', 4),
+('10:00:00', '11:00:00', 4),
+('11:00:00', '12:00:00', 4),
+('12:00:00', '13:00:00', 4),
+('13:00:00', '14:00:00', 4),
+('14:00:00', '15:00:00', 4),
+('15:00:00', '16:00:00', 4),
+('16:00:00', '17:00:00', 4),
+('17:00:00', '18:00:00', 4);
+
+CREATE TABLE IF NOT EXISTS delivery_slot_usage (
+delivery_date DATE NOT NULL,
+slot_start TIME NOT NULL,
+reserved INT NOT NULL DEFAULT 0,
+PRIMARY KEY (delivery_date, slot_start),
+FOREIGN KEY (slot_start) REFERENCES delivery_slots(slot_start));
@@ -0,0 +1,118 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+
+class InventoryMonitor:
+    """Товары ниже порога дозаказа и прогноз даты исчерпания остатков.
+
+    Расход берётся из дневной сводки sales_daily_products, которую заказы
+    обновляют инкрементально, поэтому проверка читает не больше
+    (window_days × проданных товаров) строк, а не всю историю order_items.
+    Скорость расхода — экспоненциально взвешенное среднее за окно с периодом
+    полураспада half_life дней, считается одним матричным умножением.
+    """
+
+    def __init__(self, db, window_days=28, half_life=7, horizon_days=14):
+        self.db = db
+        self.window_days = window_days
+        self.half_life = half_life
+        self.horizon_days = horizon_days
+
+    def low_stock(self):
+        # stock_margin — генерируемый столбец с индексом idx_inventory_stock_margin
+        return self.db.execute_query("""
+            SELECT i.product_id, p.product_name, i.quantity_in_stock, i.min_quantity_threshold,
+                   i.last_restock_date
+            FROM inventory i
+            JOIN products p ON p.product_id = i.product_id
+            WHERE i.stock_margin < 0
+            ORDER BY i.stock_margin
+        """)
+
+    def consumption(self, as_of):
+        """Возвращает отсортированные product_id и матрицу расхода (товары × дни) за окно до as_of."""
+        start = as_of - timedelta(days=self.window_days)
+        rows = self.db.execute_query("""
+            SELECT sale_date, product_id, SUM(quantity) AS quantity
+            FROM sales_daily_products
+            WHERE sale_date >= %s AND sale_date < %s
+            GROUP BY sale_date, product_id
+        """, (start, as_of))
+        ids = np.array([row['product_id'] for row in rows], dtype=np.int64)
+        days = (np.array([row['sale_date'] for row in rows], dtype='datetime64[D]')
+                - np.datetime64(start, 'D')).astype(np.int64)
+        quantities = np.array([float(row['quantity']) for row in rows], dtype=np.float64)
+
+        product_ids, index = np.unique(ids, return_inverse=True)
+        matrix = np.zeros((len(product_ids), self.window_days), dtype=np.float64)
+        np.add.at(matrix, (index, days), quantities)
+        return product_ids, matrix
+
+    def daily_rates(self, matrix):
+        # Последний столбец — вчерашний день, он весит больше всего
+        age = np.arange(self.window_days - 1, -1, -1, dtype=np.float64)
+        weights = 0.5 ** (age / self.half_life)
+        return matrix @ weights / weights.sum()
+
+    def forecast(self, as_of=None):
+        """Прогноз по товарам с расходом за окно, отсортированный по дате выхода на порог.
+
+        Даты дальше горизонта horizon_days не прогнозируются: reorder_by и
+        depletion_date равны None, то есть нехватки в пределах горизонта нет.
+        """
+        as_of = as_of or date.today()
+        product_ids, matrix = self.consumption(as_of)
+        if not len(product_ids):
+            return []
+        rates = self.daily_rates(matrix)
+
+        placeholders = ', '.join(['%s'] * len(product_ids))
+        rows = self.db.execute_query(f"""
+            SELECT i.product_id, p.product_name, i.quantity_in_stock, i.min_quantity_threshold,
+                   i.last_restock_date
+            FROM inventory i
+            JOIN products p ON p.product_id = i.product_id
+            WHERE i.product_id IN ({placeholders})
+        """, tuple(int(product_id) for product_id in product_ids))
+        if not rows:
+            return []
+
+        stock_ids = np.array([row['product_id'] for row in rows], dtype=np.int64)
+        stock = np.array([row['quantity_in_stock'] or 0 for row in rows], dtype=np.float64)
+        threshold = np.array([row['min_quantity_threshold'] or 0 for row in rows], dtype=np.float64)
+        rate = rates[np.searchsorted(product_ids, stock_ids)]
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            days_left = np.where(rate > 0, np.maximum(stock, 0) / rate, np.inf)
+            days_to_threshold = np.where(rate > 0, np.maximum(stock - threshold, 0) / rate, np.inf)
+        # При почти нулевом расходе дни могут не поместиться в timedelta
+        days_left[days_left > self.horizon_days] = np.inf
+        days_to_threshold[days_to_threshold > self.horizon_days] = np.inf
+
+        result = []
+        for i in np.argsort(days_to_threshold, kind='stable'):
+            row = rows[i]
+            result.append({
+                **row,
+                'daily_rate': float(rate[i]),
+                'reorder_by': as_of + timedelta(days=int(days_to_threshold[i]))
+                if np.isfinite(days_to_threshold[i]) else None,
+                'depletion_date': as_of + timedelta(days=int(days_left[i]))
+                if np.isfinite(days_left[i]) else None,
+            })
+        return result
+
+    def check(self, as_of=None):
+        """Оповещения: товары ниже порога и товары, которые выйдут на порог в ближайшие horizon_days дней."""
+        as_of = as_of or date.today()
+        horizon = as_of + timedelta(days=self.horizon_days)
+        alerts = {}
+        for row in self.forecast(as_of):
+            if row['reorder_by'] is not None and row['reorder_by'] <= horizon:
+                alerts[row['product_id']] = row
+        for row in self.low_stock():
+            if row['product_id'] not in alerts:
+                alerts[row['product_id']] = {**row, 'daily_rate': 0.0, 'reorder_by': as_of,
+                                             'depletion_date': None}
+        return sorted(alerts.values(), key=lambda row: (row['reorder_by'] or horizon, row['product_id']))
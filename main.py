@@ -1,149 +1,190 @@
 import sys
-import pymysql
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QComboBox, QMessageBox,
-                             QTabWidget, QTableWidget, QTableWidgetItem, QDateEdit, QTimeEdit,
-                             QSpinBox, QFormLayout, QDialog, QHeaderView, QGroupBox)
-from PyQt5.QtCore import Qt, QDate, QTime, QSettings
+                             QTabWidget, QTableWidget, QTableWidgetItem, QTableView, QDateEdit,
+                             QTimeEdit, QSpinBox, QFormLayout, QDialog, QHeaderView, QGroupBox,
+                             QProgressBar, QFileDialog)
+from PyQt5.QtCore import Qt, QDate, QTime, QTimer, QSettings
+
+from analytics import SalesAnalytics
+from database import Database, SlotFullError
+from dispatch import GeocodeCache, clock, minutes, plan_deliveries
+from inventory import InventoryMonitor
+from offline import OfflineOrderQueue
+from search_picker import SearchPicker
+from service import BookingService, ValidationError
+from table_model import LazyTableModel, keyset_pager
+from workers import DbExecutor
+
+PAGE_SIZE = 200
+INVENTORY_CHECK_INTERVAL = 5 * 60 * 1000  # мс
+OFFLINE_SYNC_INTERVAL = 60 * 1000  # мс
+
+
+def money(value):
+    return f"{value:.2f}"
+
+
+ORDERS_COLUMNS = [
+    ('ID', 'order_id', None),
+    ('Клиент', 'customer_name', None),
+    ('Сотрудник', 'employee_name', None),
+    ('Дата заказа', 'order_date', None),
+    ('Дата доставки', 'delivery_date', None),
+    ('Адрес', 'delivery_address', None),
+    ('Статус', 'status', None),
+    ('Сумма', 'total_amount', money),
+    ('Оплата', 'payment_method', None),
+]
+
+PRODUCTS_COLUMNS = [
+    ('ID', 'product_id', None),
+    ('Категория', 'category_name', None),
+    ('Название', 'product_name', None),
+    ('Описание', 'description', None),
+    ('Цена', 'price', money),
+    ('Ед. изм.', 'unit', None),
+]
+
+CUSTOMERS_COLUMNS = [
+    ('ID', 'customer_id', None),
+    ('ФИО', 'full_name', None),
+    ('День рождения', 'birthday', None),
+    ('Телефон', 'phone', None),
+    ('Email', 'email', None),
+    ('Дата рег.', 'registration_date', None),
+    ('Источник', 'source_c', None),
+]
+
+HISTORY_COLUMNS = [
+    ('ID', 'order_id', None),
+    ('Дата заказа', 'order_date', None),
+    ('Дата доставки', 'delivery_date', None),
+    ('Адрес', 'delivery_address', None),
+    ('Статус', 'status', None),
+    ('Сумма', 'total_amount', money),
+    ('Оплата', 'payment_method', None),
+]
+
+
+def percent(value):
+    return f"{value:+.1f}%"
+
+
+REPORT_COLUMNS = [
+    ('Показатель', 'label', None),
+    ('Кол-во', 'amount', None),
+    ('Выручка', 'current', money),
+    ('Пред. период', 'previous', money),
+    ('Изменение', 'delta', money),
+    ('Изменение, %', 'delta_pct', percent),
+]
+
+
+def rate(value):
+    return f"{value:.1f}"
+
+
+STOCK_COLUMNS = [
+    ('ID', 'product_id', None),
+    ('Товар', 'product_name', None),
+    ('Остаток', 'quantity_in_stock', None),
+    ('Порог', 'min_quantity_threshold', None),
+    ('Расход в день', 'daily_rate', rate),
+    ('Дозаказать до', 'reorder_by', None),
+    ('Закончится', 'depletion_date', None),
+    ('Посл. поставка', 'last_restock_date', None),
+]
+
+
+def km(value):
+    return f"{value:.1f}"
+
+
+DISPATCH_COLUMNS = [
+    ('Курьер', 'courier', None),
+    ('№', 'position', None),
+    ('Заказ', 'order_id', None),
+    ('Клиент', 'customer_name', None),
+    ('Адрес', 'delivery_address', None),
+    ('Окно', 'window', None),
+    ('Прибытие', 'arrival', None),
+    ('Км', 'leg_km', km),
+    ('Примечание', 'note', None),
+]
+
+
+def dispatch_rows(plan):
+    # Маршруты построчно: сначала остановки курьеров по порядку, затем нераспределённые заказы
+    def window(stop):
+        start = minutes(stop['delivery_time_from'])
+        end = minutes(stop['delivery_time_to'])
+        return f"{clock(start) if start is not None else ''}-{clock(end) if end is not None else ''}"
+
+    rows = []
+    for route in plan['routes']:
+        for position, stop in enumerate(route['stops'], 1):
+            rows.append({**stop, 'courier': route['courier'], 'position': position, 'window': window(stop),
+                         'note': f"ожидание {stop['wait_minutes']:.0f} мин" if stop['wait_minutes'] >= 1 else None})
+    for stop in plan['unrouted']:
+        rows.append({**stop, 'courier': None, 'position': None, 'window': window(stop),
+                     'arrival': None, 'leg_km': None, 'note': stop['reason']})
+    return rows
+
+
+REPORT_DIMENSIONS = [
+    ('По дням', 'day'),
+    ('По товарам', 'product'),
+    ('По категориям', 'category'),
+    ('По сотрудникам', 'employee'),
+    ('По способам оплаты', 'payment_method'),
+]
+
+
+def product_label(product):
+    return f"{product['product_name']} - {product['price']:.2f}"
+
+
+def composition_label(composition):
+    return f"{composition['composition_name']} - {composition['price']:.2f}"
+
+
+def composition_item(composition, quantity):
+    # Строка заказа с композицией; product_name — подпись строки в таблицах
+    return {
+        'composition_id': composition['composition_id'],
+        'product_name': composition['composition_name'],
+        'price': float(composition['price']),
+        'quantity': quantity
+    }
 
 
-class Database:
-    def __init__(self):
-        self.connection = None
-
-    def connect(self, host='localhost', user='root', password='', database='chetochny'):
-        try:
-            self.connection = pymysql.connect(
-                host=host,
-                user=user,
-                password=password,
-                database=database,
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor
-            )
-            return True
-        except Exception as e:
-            return False
-
-    def disconnect(self):
-        if self.connection:
-            self.connection.close()
-            self.connection = None
-
-    def execute_query(self, query, params=None):
-        if not self.connection:
-            return None
-        try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(query, params)
-                if query.strip().upper().startswith('SELECT'):
-                    result = cursor.fetchall()
-                    return result
-                else:
-                    self.connection.commit()
-                    return cursor.lastrowid
-        except Exception as e:
-            self.connection.rollback()
-            raise e
-
-    def get_customers(self):
-        return self.execute_query("SELECT * FROM customers ORDER BY full_name")
-
-    def get_employees(self):
-        return self.execute_query("SELECT * FROM employees ORDER BY full_name")
-
-    def get_products(self):
-        return self.execute_query("""
-            SELECT p.*, c.category_name 
-            FROM products p 
-            JOIN product_categories c ON p.category_id = c.category_id 
-            ORDER BY p.product_name
-        """)
+def fill_compositions(combo, compositions):
+    combo.clear()
+    for composition in compositions:
+        combo.addItem(composition_label(composition), composition)
 
-    def get_orders(self, status_filter=None, date_filter=None):
-        query = """
-            SELECT o.*, c.full_name as customer_name, e.full_name as employee_name
-            FROM orders o
-            JOIN customers c ON o.customer_id = c.customer_id
-            JOIN employees e ON o.employee_responsible_id = e.employee_id
-        """
-        params = []
-
-        if status_filter and status_filter != "Все":
-            query += " WHERE o.status = %s"
-            params.append(status_filter)
-
-        if date_filter:
-            if params:
-                query += " AND DATE(o.order_date) = %s"
-            else:
-                query += " WHERE DATE(o.order_date) = %s"
-            params.append(date_filter)
-
-        query += " ORDER BY o.order_date DESC"
-
-        return self.execute_query(query, params) if params else self.execute_query(query)
-
-    def get_order_items(self, order_id):
-        return self.execute_query("""
-            SELECT oi.*, p.product_name
-            FROM order_items oi
-            JOIN products p ON oi.product_id = p.product_id
-            WHERE oi.order_id = %s
-        """, (order_id,))
-
-    def create_order(self, customer_id, employee_id, delivery_date, delivery_time_from,
-                     delivery_time_to, delivery_address, payment_method, items):
-        order_query = """
-            INSERT INTO orders (customer_id, employee_responsible_id, order_date, 
-                              delivery_date, delivery_time_from, delivery_time_to, 
-                              delivery_address, status, total_amount, payment_method)
-            VALUES (%s, %s, NOW(), %s, %s, %s, %s, 'В обработке', %s, %s)
-        """
-
-        total_amount = sum(item['quantity'] * item['price'] for item in items)
-
-        try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(order_query, (customer_id, employee_id, delivery_date,
-                                             delivery_time_from, delivery_time_to,
-                                             delivery_address, total_amount, payment_method))
-                order_id = cursor.lastrowid
-
-                for item in items:
-                    item_query = """
-                        INSERT INTO order_items (order_id, product_id, quantity, price_per_unit)
-                        VALUES (%s, %s, %s, %s)
-                    """
-                    cursor.execute(item_query, (order_id, item['product_id'],
-                                                item['quantity'], item['price']))
-
-                self.connection.commit()
-                return order_id
-        except Exception as e:
-            self.connection.rollback()
-            raise e
-
-    def update_order_status(self, order_id, status):
-        return self.execute_query(
-            "UPDATE orders SET status = %s WHERE order_id = %s",
-            (status, order_id)
-        )
-
-    def authenticate_user(self, email, password, user_type):
-        if user_type == "admin":
-            query = "SELECT * FROM employees WHERE email = %s AND password = %s"
-        else:
-            query = "SELECT * FROM customers WHERE email = %s AND password = %s"
 
-        result = self.execute_query(query, (email, password))
-        return result[0] if result else None
+def stock_warning(shortages):
+    lines = [f'Товар #{product_id}: нужно {needed}, в наличии {available}'
+             for product_id, (needed, available) in sorted(shortages.items())]
+    return 'Не хватает товаров на складе:\n' + '\n'.join(lines)
+
+
+def make_table_view(model):
+    view = QTableView()
+    view.setModel(model)
+    view.setEditTriggers(QTableView.NoEditTriggers)
+    view.setSelectionBehavior(QTableView.SelectRows)
+    view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+    return view
 
 
 class OrderDialog(QDialog):
-    def __init__(self, db, parent=None, order_id=None):
+    def __init__(self, db, executor, parent=None, order_id=None):
         super().__init__(parent)
         self.db = db
+        self.executor = executor
         self.order_id = order_id
         self.order_items = []
         self.initUI()
@@ -159,11 +200,10 @@ class OrderDialog(QDialog):
 
         form_layout = QFormLayout()
 
-        self.customer_combo = QComboBox()
-        customers = self.db.get_customers()
-        for customer in customers:
-            self.customer_combo.addItem(customer['full_name'], customer['customer_id'])
-        form_layout.addRow('Клиент:', self.customer_combo)
+        self.customer_picker = SearchPicker(self.db.search_customers, self.executor,
+                                            lambda customer: customer['full_name'])
+        self.customer_picker.setPlaceholderText('Начните вводить ФИО клиента')
+        form_layout.addRow('Клиент:', self.customer_picker)
 
         self.employee_combo = QComboBox()
         employees = self.db.get_employees()
@@ -211,12 +251,10 @@ class OrderDialog(QDialog):
 
         add_product_layout = QHBoxLayout()
 
-        self.product_combo = QComboBox()
-        products = self.db.get_products()
-        for product in products:
-            self.product_combo.addItem(f"{product['product_name']} - {product['price']:.2f}", product)
+        self.product_picker = SearchPicker(self.db.search_products, self.executor, product_label)
+        self.product_picker.setPlaceholderText('Начните вводить название товара')
         add_product_layout.addWidget(QLabel('Товар:'))
-        add_product_layout.addWidget(self.product_combo)
+        add_product_layout.addWidget(self.product_picker)
 
         self.quantity_spin = QSpinBox()
         self.quantity_spin.setMinimum(1)
@@ -232,6 +270,28 @@ class OrderDialog(QDialog):
         add_product_layout.addStretch()
         layout.addLayout(add_product_layout)
 
+        add_composition_layout = QHBoxLayout()
+
+        self.composition_combo = QComboBox()
+        add_composition_layout.addWidget(QLabel('Композиция:'))
+        add_composition_layout.addWidget(self.composition_combo)
+        self.executor.submit(self.db.get_compositions,
+                             on_done=lambda compositions: fill_compositions(self.composition_combo, compositions))
+
+        self.composition_quantity_spin = QSpinBox()
+        self.composition_quantity_spin.setMinimum(1)
+        self.composition_quantity_spin.setMaximum(100)
+        self.composition_quantity_spin.setValue(1)
+        add_composition_layout.addWidget(QLabel('Кол-во:'))
+        add_composition_layout.addWidget(self.composition_quantity_spin)
+
+        add_composition_button = QPushButton('Добавить композицию')
+        add_composition_button.clicked.connect(self.add_composition)
+        add_composition_layout.addWidget(add_composition_button)
+
+        add_composition_layout.addStretch()
+        layout.addLayout(add_composition_layout)
+
         total_layout = QHBoxLayout()
         total_layout.addStretch()
 
@@ -243,7 +303,7 @@ class OrderDialog(QDialog):
 
         button_layout = QHBoxLayout()
 
-        save_button = QPushButton('Сохранить')
+        self.save_button = save_button = QPushButton('Сохранить')
         save_button.setStyleSheet("""
             QPushButton {
                 background-color: white;
@@ -295,7 +355,7 @@ class OrderDialog(QDialog):
         self.update_total()
 
     def add_product(self):
-        product = self.product_combo.currentData()
+        product = self.product_picker.currentData()
         quantity = self.quantity_spin.value()
 
         if product:
@@ -308,6 +368,12 @@ class OrderDialog(QDialog):
             self.order_items.append(item)
             self.load_products_table()
 
+    def add_composition(self):
+        composition = self.composition_combo.currentData()
+        if composition:
+            self.order_items.append(composition_item(composition, self.composition_quantity_spin.value()))
+            self.load_products_table()
+
     def remove_product(self, row):
         if row < len(self.order_items):
             del self.order_items[row]
@@ -318,13 +384,22 @@ class OrderDialog(QDialog):
         self.total_label.setText(f'Итого: {total:.2f} руб.')
 
     def load_order_data(self):
-        orders = self.db.get_orders()
-        order = next((o for o in orders if o['order_id'] == self.order_id), None)
+        self.save_button.setEnabled(False)
+        self.executor.submit(self.db.get_order, self.order_id,
+                             on_done=self.on_order_loaded, on_error=self.on_load_failed,
+                             on_cancel=self.reject)
 
+    def on_load_failed(self, error):
+        QMessageBox.critical(self, 'Ошибка', f'Ошибка при загрузке заказа: {str(error)}')
+        self.reject()
+
+    def on_order_loaded(self, order):
+        self.save_button.setEnabled(True)
         if order:
-            customer_index = self.customer_combo.findData(order['customer_id'])
-            if customer_index >= 0:
-                self.customer_combo.setCurrentIndex(customer_index)
+            self.customer_picker.set_current(order['customer_name'], {
+                'customer_id': order['customer_id'],
+                'full_name': order['customer_name'],
+            })
 
             employee_index = self.employee_combo.findData(order['employee_responsible_id'])
             if employee_index >= 0:
@@ -342,14 +417,15 @@ class OrderDialog(QDialog):
             self.payment_method.setCurrentText(order['payment_method'])
             self.status_combo.setCurrentText(order['status'])
 
-            order_items = self.db.get_order_items(self.order_id)
-            for item in order_items:
-                self.order_items.append({
-                    'product_id': item['product_id'],
+            for item in order['items']:
+                line = {key: item[key] for key in
+                        ('order_item_id', 'product_id', 'order_composition_id', 'composition_id') if key in item}
+                line.update({
                     'product_name': item['product_name'],
                     'price': float(item['price_per_unit']),
                     'quantity': item['quantity']
                 })
+                self.order_items.append(line)
 
             self.load_products_table()
 
@@ -358,7 +434,12 @@ class OrderDialog(QDialog):
             QMessageBox.warning(self, 'Ошибка', 'Добавьте хотя бы один товар в заказ')
             return
 
-        customer_id = self.customer_combo.currentData()
+        customer = self.customer_picker.currentData()
+        if not customer:
+            QMessageBox.warning(self, 'Ошибка', 'Выберите клиента из списка')
+            return
+
+        customer_id = customer['customer_id']
         employee_id = self.employee_combo.currentData()
         delivery_date = self.delivery_date.date().toString('yyyy-MM-dd')
         delivery_time_from = self.delivery_time_from.time().toString('hh:mm:ss')
@@ -370,30 +451,55 @@ class OrderDialog(QDialog):
             QMessageBox.warning(self, 'Ошибка', 'Введите адрес доставки')
             return
 
-        try:
+        items = list(self.order_items)
+        status = self.status_combo.currentText() if self.order_id else None
+
+        def save():
             if self.order_id:
-                self.db.create_order(customer_id, employee_id, delivery_date,
-                                     delivery_time_from, delivery_time_to,
-                                     delivery_address, payment_method, self.order_items)
-                QMessageBox.information(self, 'Успех', 'Заказ успешно обновлен')
-            else:
-                order_id = self.db.create_order(customer_id, employee_id, delivery_date,
-                                                delivery_time_from, delivery_time_to,
-                                                delivery_address, payment_method, self.order_items)
-                QMessageBox.information(self, 'Успех', f'Заказ #{order_id} успешно создан')
+                header = {
+                    'customer_id': customer_id,
+                    'employee_responsible_id': employee_id,
+                    'delivery_date': delivery_date,
+                    'delivery_time_from': delivery_time_from,
+                    'delivery_time_to': delivery_time_to,
+                    'delivery_address': delivery_address,
+                    'payment_method': payment_method,
+                    'status': status,
+                }
+                self.db.update_order(self.order_id, header, items)
+                return self.order_id
+            return self.db.create_order(customer_id, employee_id, delivery_date,
+                                        delivery_time_from, delivery_time_to,
+                                        delivery_address, payment_method, items)
+
+        self.save_button.setEnabled(False)
+        self.setCursor(Qt.BusyCursor)
+        self.executor.submit(save, on_done=self.on_order_saved, on_error=self.on_save_failed,
+                             on_cancel=self.on_save_cancelled)
+
+    def on_order_saved(self, order_id):
+        self.unsetCursor()
+        if self.order_id:
+            QMessageBox.information(self, 'Успех', 'Заказ успешно обновлен')
+        else:
+            QMessageBox.information(self, 'Успех', f'Заказ #{order_id} успешно создан')
+        self.accept()
 
-            if self.order_id and hasattr(self, 'status_combo'):
-                self.db.update_order_status(self.order_id, self.status_combo.currentText())
+    def on_save_cancelled(self):
+        self.unsetCursor()
+        self.save_button.setEnabled(True)
 
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, 'Ошибка', f'Ошибка при сохранении заказа: {str(e)}')
+    def on_save_failed(self, error):
+        self.unsetCursor()
+        self.save_button.setEnabled(True)
+        QMessageBox.critical(self, 'Ошибка', f'Ошибка при сохранении заказа: {str(error)}')
 
 
 class OrderDetailsDialog(QDialog):
-    def __init__(self, order_id, db, parent=None):
+    def __init__(self, order_id, db, executor, parent=None):
         super().__init__(parent)
         self.db = db
+        self.executor = executor
         self.order_id = order_id
         self.initUI()
         self.load_order_data()
@@ -464,9 +570,11 @@ class OrderDetailsDialog(QDialog):
         self.setLayout(layout)
 
     def load_order_data(self):
-        orders = self.db.get_orders()
-        order = next((o for o in orders if o['order_id'] == self.order_id), None)
+        self.executor.submit(self.db.get_order, self.order_id, on_done=self.on_order_loaded,
+                             on_error=lambda e: QMessageBox.critical(
+                                 self, 'Ошибка', f'Ошибка при загрузке заказа: {str(e)}'))
 
+    def on_order_loaded(self, order):
         if order:
             self.info_layout.addRow('ID заказа:', QLabel(str(order['order_id'])))
             self.info_layout.addRow('Клиент:', QLabel(order['customer_name']))
@@ -482,7 +590,7 @@ class OrderDetailsDialog(QDialog):
             if hasattr(self, 'status_combo'):
                 self.status_combo.setCurrentText(order['status'])
 
-            order_items = self.db.get_order_items(self.order_id)
+            order_items = order['items']
             self.items_table.setRowCount(len(order_items))
 
             total = 0
@@ -498,20 +606,26 @@ class OrderDetailsDialog(QDialog):
 
     def update_status(self):
         new_status = self.status_combo.currentText()
-        try:
-            self.db.update_order_status(self.order_id, new_status)
-            QMessageBox.information(self, 'Успех', 'Статус заказа обновлен')
-            self.load_order_data()
-        except Exception as e:
-            QMessageBox.critical(self, 'Ошибка', f'Ошибка при обновлении статуса: {str(e)}')
+        self.executor.submit(self.db.update_order_status, self.order_id, new_status,
+                             on_done=self.on_status_updated,
+                             on_error=lambda e: QMessageBox.critical(
+                                 self, 'Ошибка', f'Ошибка при обновлении статуса: {str(e)}'))
+
+    def on_status_updated(self, _):
+        QMessageBox.information(self, 'Успех', 'Статус заказа обновлен')
+        self.load_order_data()
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, user, user_type, db):
+    def __init__(self, user, user_type, db, executor):
         super().__init__()
         self.user = user
         self.user_type = user_type
         self.db = db
+        self.executor = executor
+        # Заказы клиента, оформленные без связи с базой, ждут синхронизации в локальной очереди
+        self.offline_queue = OfflineOrderQueue() if user_type == 'customer' else None
+        self.service = BookingService(db, queue=self.offline_queue)
         self.initUI()
 
     def initUI(self):
@@ -532,6 +646,20 @@ class MainWindow(QMainWindow):
 
         layout.addLayout(header_layout)
 
+        # Индикатор фоновых запросов к базе данных
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setMaximumWidth(150)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton('Отмена')
+        self.cancel_button.clicked.connect(self.executor.cancel_all)
+        self.cancel_button.hide()
+        self.statusBar().addPermanentWidget(self.cancel_button)
+
+        self.executor.busy_changed.connect(self.on_busy_changed)
+
         self.tabs = QTabWidget()
 
         if self.user_type == 'admin':
@@ -542,6 +670,22 @@ class MainWindow(QMainWindow):
         layout.addWidget(self.tabs)
         central_widget.setLayout(layout)
 
+    def make_model(self, columns):
+        model = LazyTableModel(columns, executor=self.executor, parent=self)
+        model.load_failed.connect(self.show_load_error)
+        return model
+
+    def show_load_error(self, error):
+        QMessageBox.critical(self, 'Ошибка', f'Ошибка при загрузке данных: {str(error)}')
+
+    def on_busy_changed(self, busy):
+        self.progress_bar.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+        if busy:
+            self.statusBar().showMessage('Загрузка...')
+        else:
+            self.statusBar().clearMessage()
+
     def setup_admin_tabs(self):
         orders_tab = QWidget()
         self.setup_orders_tab(orders_tab)
@@ -555,6 +699,18 @@ class MainWindow(QMainWindow):
         self.setup_customers_tab(customers_tab)
         self.tabs.addTab(customers_tab, 'Клиенты')
 
+        reports_tab = QWidget()
+        self.setup_reports_tab(reports_tab)
+        self.tabs.addTab(reports_tab, 'Отчёты')
+
+        stock_tab = QWidget()
+        self.setup_stock_tab(stock_tab)
+        self.stock_tab_index = self.tabs.addTab(stock_tab, 'Склад')
+
+        dispatch_tab = QWidget()
+        self.setup_dispatch_tab(dispatch_tab)
+        self.tabs.addTab(dispatch_tab, 'Доставка')
+
     def setup_customer_tabs(self):
         booking_tab = QWidget()
         self.setup_booking_tab(booking_tab)
@@ -568,6 +724,38 @@ class MainWindow(QMainWindow):
         self.setup_profile_tab(profile_tab)
         self.tabs.addTab(profile_tab, 'Профиль')
 
+        self.offline_sync_task = None
+        self.offline_timer = QTimer(self)
+        self.offline_timer.setInterval(OFFLINE_SYNC_INTERVAL)
+        self.offline_timer.timeout.connect(self.sync_offline_orders)
+        self.offline_timer.start()
+        self.sync_offline_orders()
+
+    def sync_offline_orders(self):
+        if self.offline_sync_task and not self.offline_sync_task.cancelled:
+            return
+        self.offline_sync_task = self.executor.submit(self.service.sync_offline_orders,
+                                                      on_done=self.on_offline_orders_synced,
+                                                      on_error=self.on_offline_sync_failed)
+
+    def on_offline_orders_synced(self, result):
+        self.offline_sync_task = None
+        if result['synced']:
+            self.statusBar().showMessage(f"Отправлено заказов, оформленных без связи: {result['synced']}", 10000)
+            self.load_customer_stats()
+            self.load_order_history()
+        if result['rejected']:
+            QMessageBox.warning(self, 'Заказы не приняты',
+                                'Часть заказов, оформленных без связи, не удалось создать:\n'
+                                + '\n'.join(result['rejected'].values()))
+
+    def on_offline_sync_failed(self, error):
+        # Связи всё ещё нет — заказы остаются в очереди до следующей попытки по таймеру
+        self.offline_sync_task = None
+        pending = self.offline_queue.count()
+        if pending:
+            self.statusBar().showMessage(f'Нет связи с базой, заказов в очереди: {pending}')
+
     def setup_orders_tab(self, tab):
         layout = QVBoxLayout()
 
@@ -621,14 +809,8 @@ class MainWindow(QMainWindow):
         filter_group.setLayout(filter_layout)
         layout.addWidget(filter_group)
 
-        self.orders_table = QTableWidget()
-        self.orders_table.setColumnCount(9)
-        self.orders_table.setHorizontalHeaderLabels([
-            'ID', 'Клиент', 'Сотрудник', 'Дата заказа', 'Дата доставки',
-            'Адрес', 'Статус', 'Сумма', 'Оплата'
-        ])
-        self.orders_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.orders_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.orders_model = self.make_model(ORDERS_COLUMNS)
+        self.orders_table = make_table_view(self.orders_model)
         layout.addWidget(self.orders_table)
 
         button_layout = QHBoxLayout()
@@ -674,13 +856,8 @@ class MainWindow(QMainWindow):
     def setup_products_tab(self, tab):
         layout = QVBoxLayout()
 
-        self.products_table = QTableWidget()
-        self.products_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.products_table.setColumnCount(6)
-        self.products_table.setHorizontalHeaderLabels([
-            'ID', 'Категория', 'Название', 'Описание', 'Цена', 'Ед. изм.'
-        ])
-        self.products_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.products_model = self.make_model(PRODUCTS_COLUMNS)
+        self.products_table = make_table_view(self.products_model)
         layout.addWidget(self.products_table)
 
         tab.setLayout(layout)
@@ -689,18 +866,212 @@ class MainWindow(QMainWindow):
     def setup_customers_tab(self, tab):
         layout = QVBoxLayout()
 
-        self.customers_table = QTableWidget()
-        self.customers_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.customers_table.setColumnCount(7)
-        self.customers_table.setHorizontalHeaderLabels([
-            'ID', 'ФИО', 'День рождения', 'Телефон', 'Email', 'Дата рег.', 'Источник'
-        ])
-        self.customers_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.customers_model = self.make_model(CUSTOMERS_COLUMNS)
+        self.customers_table = make_table_view(self.customers_model)
         layout.addWidget(self.customers_table)
 
         tab.setLayout(layout)
         self.load_customers()
 
+    def setup_reports_tab(self, tab):
+        layout = QVBoxLayout()
+        self.analytics = SalesAnalytics(self.db)
+
+        period_group = QGroupBox("Период")
+        period_layout = QHBoxLayout()
+
+        self.report_start = QDateEdit()
+        self.report_start.setDate(QDate.currentDate().addDays(-29))
+        self.report_start.setCalendarPopup(True)
+        period_layout.addWidget(QLabel('С:'))
+        period_layout.addWidget(self.report_start)
+
+        self.report_end = QDateEdit()
+        self.report_end.setDate(QDate.currentDate())
+        self.report_end.setCalendarPopup(True)
+        period_layout.addWidget(QLabel('По:'))
+        period_layout.addWidget(self.report_end)
+
+        self.report_dimension = QComboBox()
+        for title, dimension in REPORT_DIMENSIONS:
+            self.report_dimension.addItem(title, dimension)
+        period_layout.addWidget(self.report_dimension)
+
+        report_button = QPushButton('Сформировать')
+        report_button.setStyleSheet("""
+            QPushButton {
+                background-color: white;
+                color: black;
+                padding: 5px 15px;
+                border: 1px solid #ccc;
+                border-radius: 3px;
+            }
+            QPushButton:hover {
+                background-color: #f5f5f5;
+            }
+        """)
+        report_button.clicked.connect(self.load_report)
+        period_layout.addWidget(report_button)
+
+        period_layout.addStretch()
+        period_group.setLayout(period_layout)
+        layout.addWidget(period_group)
+
+        self.report_totals_label = QLabel('')
+        self.report_totals_label.setStyleSheet("font-size: 14px; font-weight: bold; padding: 5px;")
+        layout.addWidget(self.report_totals_label)
+
+        self.report_model = self.make_model(REPORT_COLUMNS)
+        self.report_table = make_table_view(self.report_model)
+        layout.addWidget(self.report_table)
+
+        tab.setLayout(layout)
+        self.load_report()
+
+    def load_report(self):
+        start = self.report_start.date().toPyDate()
+        end = self.report_end.date().toPyDate()
+        if end < start:
+            QMessageBox.warning(self, 'Ошибка', 'Дата окончания периода раньше даты начала')
+            return
+        dimension = self.report_dimension.currentData()
+
+        self.report_model.reset(lambda cursor: (self.analytics.compare_periods(dimension, start, end), None))
+        self.executor.submit(self.analytics.totals, start, end,
+                             on_done=self.on_report_totals_loaded, on_error=self.show_load_error)
+
+    def on_report_totals_loaded(self, totals):
+        self.report_totals_label.setText(
+            f"Выручка: {totals['current']:,.2f} руб. (пред. период: {totals['previous']:,.2f} руб.), "
+            f"заказов: {totals['orders']} (пред. период: {totals['previous_orders']})")
+
+    def setup_stock_tab(self, tab):
+        layout = QVBoxLayout()
+        self.inventory = InventoryMonitor(self.db)
+        self.stock_check_task = None
+
+        stock_layout = QHBoxLayout()
+        self.stock_status_label = QLabel('')
+        stock_layout.addWidget(self.stock_status_label)
+        stock_layout.addStretch()
+
+        check_button = QPushButton('Проверить сейчас')
+        check_button.clicked.connect(self.check_stock_alerts)
+        stock_layout.addWidget(check_button)
+        layout.addLayout(stock_layout)
+
+        self.stock_model = self.make_model(STOCK_COLUMNS)
+        self.stock_table = make_table_view(self.stock_model)
+        layout.addWidget(self.stock_table)
+
+        tab.setLayout(layout)
+
+        # Фоновая проверка остатков, пока открыто окно администратора
+        self.stock_timer = QTimer(self)
+        self.stock_timer.setInterval(INVENTORY_CHECK_INTERVAL)
+        self.stock_timer.timeout.connect(self.check_stock_alerts)
+        self.stock_timer.start()
+        self.check_stock_alerts()
+
+    def check_stock_alerts(self):
+        # Не запускаем новую проверку, пока идёт предыдущая (отменённая не ответит)
+        if self.stock_check_task and not self.stock_check_task.cancelled:
+            return
+        self.stock_check_task = self.executor.submit(self.inventory.check,
+                                                     on_done=self.on_stock_alerts_loaded,
+                                                     on_error=self.on_stock_check_failed)
+
+    def on_stock_alerts_loaded(self, alerts):
+        self.stock_check_task = None
+        self.stock_model.reset(lambda cursor: (alerts, None))
+        checked_at = QTime.currentTime().toString('hh:mm')
+        self.stock_status_label.setText(f'Требуют дозаказа: {len(alerts)} (проверено в {checked_at})')
+        self.tabs.setTabText(self.stock_tab_index, f'Склад ({len(alerts)})' if alerts else 'Склад')
+
+    def on_stock_check_failed(self, error):
+        # Фоновая проверка не открывает окно с ошибкой, следующая попытка будет по таймеру
+        self.stock_check_task = None
+        self.stock_status_label.setText(f'Ошибка проверки остатков: {error}')
+
+    def setup_dispatch_tab(self, tab):
+        layout = QVBoxLayout()
+
+        dispatch_layout = QHBoxLayout()
+        self.dispatch_date = QDateEdit()
+        self.dispatch_date.setDate(QDate.currentDate())
+        self.dispatch_date.setCalendarPopup(True)
+        dispatch_layout.addWidget(QLabel('Дата доставки:'))
+        dispatch_layout.addWidget(self.dispatch_date)
+
+        self.dispatch_button = QPushButton('Рассчитать маршруты')
+        self.dispatch_button.clicked.connect(self.load_dispatch)
+        dispatch_layout.addWidget(self.dispatch_button)
+
+        # Координаты адресов берутся только из кэша, без них маршруты не строятся
+        self.geocode_cache = GeocodeCache()
+        self.geocode_import_button = QPushButton('Импорт координат...')
+        self.geocode_import_button.clicked.connect(self.import_geocodes)
+        dispatch_layout.addWidget(self.geocode_import_button)
+        dispatch_layout.addStretch()
+        layout.addLayout(dispatch_layout)
+
+        self.dispatch_summary_label = QLabel('')
+        self.dispatch_summary_label.setStyleSheet("font-size: 14px; font-weight: bold; padding: 5px;")
+        layout.addWidget(self.dispatch_summary_label)
+
+        self.dispatch_model = self.make_model(DISPATCH_COLUMNS)
+        self.dispatch_table = make_table_view(self.dispatch_model)
+        layout.addWidget(self.dispatch_table)
+
+        tab.setLayout(layout)
+        self.update_dispatch_state()
+
+    def update_dispatch_state(self):
+        has_points = len(self.geocode_cache) > 0
+        self.dispatch_button.setEnabled(has_points)
+        if not has_points:
+            self.dispatch_summary_label.setText(
+                'Нет координат адресов: загрузите CSV «адрес,широта,долгота» кнопкой «Импорт координат»')
+
+    def import_geocodes(self):
+        path, _ = QFileDialog.getOpenFileName(self, 'Координаты адресов', '', 'CSV (*.csv);;Все файлы (*)')
+        if not path:
+            return
+        self.geocode_import_button.setEnabled(False)
+        self.executor.submit(self.geocode_cache.import_csv, path,
+                             on_done=self.on_geocodes_imported, on_error=self.on_geocodes_failed,
+                             on_cancel=lambda: self.geocode_import_button.setEnabled(True))
+
+    def on_geocodes_imported(self, count):
+        self.geocode_import_button.setEnabled(True)
+        self.update_dispatch_state()
+        self.dispatch_summary_label.setText(f'Загружено адресов: {count}, всего в кэше: {len(self.geocode_cache)}')
+
+    def on_geocodes_failed(self, error):
+        self.geocode_import_button.setEnabled(True)
+        QMessageBox.critical(self, 'Ошибка', f'Не удалось загрузить координаты: {error}')
+
+    def load_dispatch(self):
+        day = self.dispatch_date.date().toString('yyyy-MM-dd')
+        self.dispatch_button.setEnabled(False)
+        self.executor.submit(plan_deliveries, self.db, day, self.geocode_cache,
+                             on_done=self.on_dispatch_planned, on_error=self.on_dispatch_failed,
+                             on_cancel=lambda: self.dispatch_button.setEnabled(True))
+
+    def on_dispatch_planned(self, plan):
+        self.dispatch_button.setEnabled(True)
+        rows = dispatch_rows(plan)
+        self.dispatch_model.reset(lambda cursor: (rows, None))
+        routed = sum(len(route['stops']) for route in plan['routes'])
+        distance = sum(route['distance_km'] for route in plan['routes'])
+        self.dispatch_summary_label.setText(
+            f"Курьеров: {len(plan['routes'])}, заказов в маршрутах: {routed}, "
+            f"не распределено: {len(plan['unrouted'])}, пробег: {distance:.1f} км")
+
+    def on_dispatch_failed(self, error):
+        self.dispatch_button.setEnabled(True)
+        self.show_load_error(error)
+
     def setup_booking_tab(self, tab):
         layout = QVBoxLayout()
 
@@ -719,11 +1090,11 @@ class MainWindow(QMainWindow):
         self.delivery_date = QDateEdit()
         self.delivery_date.setDate(QDate.currentDate().addDays(1))
         self.delivery_date.setCalendarPopup(True)
+        self.delivery_date.dateChanged.connect(self.load_delivery_slots)
         info_layout.addRow('Дата:', self.delivery_date)
 
+        # Только интервалы со свободными местами на выбранную дату
         self.delivery_time = QComboBox()
-        self.delivery_time.addItems(['09:00-10:00', '10:00-11:00', '11:00-12:00', '12:00-13:00',
-                                     '13:00-14:00', '14:00-15:00', '15:00-16:00', '16:00-17:00', '17:00-18:00'])
         info_layout.addRow('Время:', self.delivery_time)
 
         self.payment_method = QComboBox()
@@ -739,9 +1110,12 @@ class MainWindow(QMainWindow):
 
         add_product_layout = QHBoxLayout()
 
-        self.product_combo = QComboBox()
+        self.product_picker = SearchPicker(self.db.search_products, self.executor, product_label)
+        self.product_picker.setPlaceholderText('Начните вводить название товара')
+        self.product_picker.search_failed.connect(
+            lambda error: self.statusBar().showMessage(f'Ошибка поиска товаров: {error}', 5000))
         add_product_layout.addWidget(QLabel('Товар:'))
-        add_product_layout.addWidget(self.product_combo)
+        add_product_layout.addWidget(self.product_picker)
 
         self.quantity_spin = QSpinBox()
         self.quantity_spin.setMinimum(1)
@@ -757,6 +1131,26 @@ class MainWindow(QMainWindow):
         add_product_layout.addStretch()
         products_layout.addLayout(add_product_layout)
 
+        add_composition_layout = QHBoxLayout()
+
+        self.composition_combo = QComboBox()
+        add_composition_layout.addWidget(QLabel('Композиция:'))
+        add_composition_layout.addWidget(self.composition_combo)
+
+        self.composition_quantity_spin = QSpinBox()
+        self.composition_quantity_spin.setMinimum(1)
+        self.composition_quantity_spin.setMaximum(100)
+        self.composition_quantity_spin.setValue(1)
+        add_composition_layout.addWidget(QLabel('Кол-во:'))
+        add_composition_layout.addWidget(self.composition_quantity_spin)
+
+        add_composition_button = QPushButton('Добавить')
+        add_composition_button.clicked.connect(self.add_composition_to_booking)
+        add_composition_layout.addWidget(add_composition_button)
+
+        add_composition_layout.addStretch()
+        products_layout.addLayout(add_composition_layout)
+
         self.booking_products_table = QTableWidget()
         self.booking_products_table.setEditTriggers(QTableWidget.NoEditTriggers)
         self.booking_products_table.setColumnCount(4)
@@ -781,7 +1175,7 @@ class MainWindow(QMainWindow):
         submit_layout = QHBoxLayout()
         submit_layout.addStretch()
 
-        submit_booking_button = QPushButton('Оформить заказ')
+        self.submit_booking_button = submit_booking_button = QPushButton('Оформить заказ')
         submit_booking_button.setStyleSheet("""
             QPushButton {
                 background-color: white;
@@ -800,21 +1194,37 @@ class MainWindow(QMainWindow):
         layout.addLayout(submit_layout)
         tab.setLayout(layout)
         self.load_booking_products()
+        self.load_delivery_slots()
 
     def load_booking_products(self):
-        if not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        products = self.db.get_products()
-
-        self.product_combo.clear()
-        for product in products:
-            self.product_combo.addItem(f"{product['product_name']} - {product['price']:.2f}", product)
-
         self.booking_items = []
         self.update_booking_table()
+        self.product_picker.clear_selection()
+        self.executor.submit(self.db.get_compositions,
+                             on_done=lambda compositions: fill_compositions(self.composition_combo, compositions),
+                             on_error=self.show_load_error)
+
+    def load_delivery_slots(self):
+        day = self.delivery_date.date().toString('yyyy-MM-dd')
+        self.executor.submit(self.db.available_slots, day,
+                             on_done=lambda slots: self.on_delivery_slots_loaded(day, slots),
+                             on_error=self.show_load_error)
+
+    def on_delivery_slots_loaded(self, day, slots):
+        if day != self.delivery_date.date().toString('yyyy-MM-dd'):
+            return
+        selected = self.delivery_time.currentData()
+        self.delivery_time.clear()
+        for slot in slots:
+            self.delivery_time.addItem(f"{slot['slot_start'][:5]}-{slot['slot_end'][:5]} "
+                                       f"(свободно: {slot['free']})", slot)
+        if selected:
+            index = self.delivery_time.findText(f"{selected['slot_start'][:5]}-", Qt.MatchStartsWith)
+            if index >= 0:
+                self.delivery_time.setCurrentIndex(index)
 
     def add_product_to_booking(self):
-        product = self.product_combo.currentData()
+        product = self.product_picker.currentData()
         quantity = self.quantity_spin.value()
 
         if product:
@@ -826,6 +1236,23 @@ class MainWindow(QMainWindow):
             }
             self.booking_items.append(item)
             self.update_booking_table()
+            self.check_booking_stock()
+
+    def add_composition_to_booking(self):
+        composition = self.composition_combo.currentData()
+        if composition:
+            self.booking_items.append(composition_item(composition, self.composition_quantity_spin.value()))
+            self.update_booking_table()
+            self.check_booking_stock()
+
+    def check_booking_stock(self):
+        # Предварительная проверка остатков по всей корзине одним запросом
+        self.executor.submit(self.db.check_stock, list(self.booking_items),
+                             on_done=self.on_booking_stock_checked)
+
+    def on_booking_stock_checked(self, shortages):
+        if shortages:
+            QMessageBox.warning(self, 'Склад', stock_warning(shortages))
 
     def update_booking_table(self):
         if hasattr(self, 'booking_products_table'):
@@ -854,47 +1281,57 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, 'Ошибка', 'Введите адрес доставки')
             return
 
-        try:
-            if not self.db.connection:
-                self.db.connect('localhost', 'root', '', 'chetochny')
-
-            customer_id = self.user['customer_id']
-            employee_id = 1  # Первый сотрудник по умолчанию
-            delivery_date = self.delivery_date.date().toString('yyyy-MM-dd')
-
-            # Разбираем время из формата "09:00-10:00"
-            time_range = self.delivery_time.currentText()
-            time_parts = time_range.split('-')
-            delivery_time_from = time_parts[0] + ':00'
-            delivery_time_to = time_parts[1] + ':00'
-
-            payment_method = self.payment_method.currentText()
+        delivery_date = self.delivery_date.date().toString('yyyy-MM-dd')
 
-            order_id = self.db.create_order(customer_id, employee_id, delivery_date,
-                                            delivery_time_from, delivery_time_to,
-                                            delivery_address, payment_method, self.booking_items)
+        slot = self.delivery_time.currentData()
+        if not slot:
+            QMessageBox.warning(self, 'Ошибка', 'На выбранную дату нет свободных интервалов доставки')
+            return
 
+        # Цены пересчитываются сервисом по базе; цены корзины и конец интервала
+        # используются, только если база недоступна и заказ уходит в офлайн-очередь
+        self.submit_booking_button.setEnabled(False)
+        self.executor.submit(self.service.place_order, self.user['customer_id'], delivery_date,
+                             slot['slot_start'], delivery_address, self.payment_method.currentText(),
+                             list(self.booking_items), slot_end=slot['slot_end'],
+                             on_done=self.on_booking_submitted, on_error=self.on_booking_failed,
+                             on_cancel=lambda: self.submit_booking_button.setEnabled(True))
+
+    def on_booking_submitted(self, order_id):
+        self.submit_booking_button.setEnabled(True)
+        if order_id is None:
+            QMessageBox.information(self, 'Нет связи',
+                                    'Нет связи с базой данных. Заказ сохранён и будет отправлен '
+                                    'автоматически, когда связь восстановится.')
+        else:
             QMessageBox.information(self, 'Успех', f'Заказ #{order_id} успешно создан!')
 
-            # Очистка формы
-            self.booking_items = []
-            self.update_booking_table()
-            self.delivery_address.clear()
-            self.delivery_date.setDate(QDate.currentDate().addDays(1))
+        # Очистка формы
+        self.booking_items = []
+        self.update_booking_table()
+        self.delivery_address.clear()
+        self.delivery_date.setDate(QDate.currentDate().addDays(1))
+        self.load_delivery_slots()
+        self.load_customer_stats()
+        self.load_order_history()
 
-        except Exception as e:
-            QMessageBox.critical(self, 'Ошибка', f'Ошибка при создании заказа: {str(e)}')
+    def on_booking_failed(self, error):
+        self.submit_booking_button.setEnabled(True)
+        if isinstance(error, SlotFullError):
+            # Интервал заняли другие клиенты — показываем актуальные свободные
+            self.load_delivery_slots()
+            QMessageBox.warning(self, 'Интервал занят', 'Выбранный интервал доставки уже занят, выберите другой')
+            return
+        if isinstance(error, ValidationError):
+            QMessageBox.warning(self, 'Ошибка', str(error))
+            return
+        QMessageBox.critical(self, 'Ошибка', f'Ошибка при создании заказа: {str(error)}')
 
     def setup_history_tab(self, tab):
         layout = QVBoxLayout()
 
-        self.history_table = QTableWidget()
-        self.history_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.history_table.setColumnCount(7)
-        self.history_table.setHorizontalHeaderLabels([
-            'ID', 'Дата заказа', 'Дата доставки', 'Адрес', 'Статус', 'Сумма', 'Оплата'
-        ])
-        self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.history_model = self.make_model(HISTORY_COLUMNS)
+        self.history_table = make_table_view(self.history_model)
         layout.addWidget(self.history_table)
 
         tab.setLayout(layout)
@@ -971,126 +1408,86 @@ class MainWindow(QMainWindow):
         """)
         stats_layout = QVBoxLayout()
 
-        orders_count_label = QLabel('Всего заказов: 3')
-        orders_count_label.setStyleSheet("font-size: 14px; padding: 5px;")
-        stats_layout.addWidget(orders_count_label)
+        self.orders_count_label = QLabel('Всего заказов: ...')
+        self.orders_count_label.setStyleSheet("font-size: 14px; padding: 5px;")
+        stats_layout.addWidget(self.orders_count_label)
 
-        total_spent_label = QLabel('Общая сумма: 4,150.00 руб.')
-        total_spent_label.setStyleSheet("font-size: 14px; padding: 5px;")
-        stats_layout.addWidget(total_spent_label)
+        self.total_spent_label = QLabel('Общая сумма: ...')
+        self.total_spent_label.setStyleSheet("font-size: 14px; padding: 5px;")
+        stats_layout.addWidget(self.total_spent_label)
 
-        last_order_label = QLabel('Последний заказ: 04.03.2024')
-        last_order_label.setStyleSheet("font-size: 14px; padding: 5px;")
-        stats_layout.addWidget(last_order_label)
+        self.last_order_label = QLabel('Последний заказ: ...')
+        self.last_order_label.setStyleSheet("font-size: 14px; padding: 5px;")
+        stats_layout.addWidget(self.last_order_label)
 
         stats_group.setLayout(stats_layout)
         layout.addWidget(stats_group)
 
         layout.addStretch()
         tab.setLayout(layout)
+        self.load_customer_stats()
+
+    def load_customer_stats(self):
+        if hasattr(self, 'orders_count_label'):
+            self.executor.submit(self.db.get_customer_stats, self.user['customer_id'],
+                                 on_done=self.on_customer_stats_loaded, on_error=self.show_load_error)
+
+    def on_customer_stats_loaded(self, stats):
+        last_order = stats['last_order_date']
+        self.orders_count_label.setText(f"Всего заказов: {stats['orders_count']}")
+        self.total_spent_label.setText(f"Общая сумма: {stats['total_spent']:,.2f} руб.")
+        self.last_order_label.setText(
+            f"Последний заказ: {last_order.strftime('%d.%m.%Y') if last_order else 'нет'}")
 
     def load_orders(self):
-        if self.user_type == 'admin' and not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        orders = self.db.get_orders()
-        self.populate_orders_table(orders)
-
-    def populate_orders_table(self, orders):
-        self.orders_table.setRowCount(len(orders))
-        for row, order in enumerate(orders):
-            self.orders_table.setItem(row, 0, QTableWidgetItem(str(order['order_id'])))
-            self.orders_table.setItem(row, 1, QTableWidgetItem(order['customer_name']))
-            self.orders_table.setItem(row, 2, QTableWidgetItem(order['employee_name']))
-            self.orders_table.setItem(row, 3, QTableWidgetItem(str(order['order_date'])))
-            self.orders_table.setItem(row, 4, QTableWidgetItem(str(order['delivery_date'])))
-            self.orders_table.setItem(row, 5, QTableWidgetItem(order['delivery_address']))
-            self.orders_table.setItem(row, 6, QTableWidgetItem(order['status']))
-            self.orders_table.setItem(row, 7, QTableWidgetItem(f"{order['total_amount']:.2f}"))
-            self.orders_table.setItem(row, 8, QTableWidgetItem(order['payment_method']))
+        self.start_orders_paging(None, None)
+
+    def start_orders_paging(self, status, date):
+        fetch = lambda limit, after: self.db.order_rows(status, date, limit=limit, after=after)
+        self.orders_model.reset(keyset_pager(fetch, ('order_date', 'order_id'), PAGE_SIZE))
 
     def load_products(self):
-        if self.user_type == 'admin' and not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        if hasattr(self, 'products_table'):
-            products = self.db.get_products()
-            self.products_table.setRowCount(len(products))
-            for row, product in enumerate(products):
-                self.products_table.setItem(row, 0, QTableWidgetItem(str(product['product_id'])))
-                self.products_table.setItem(row, 1, QTableWidgetItem(product['category_name']))
-                self.products_table.setItem(row, 2, QTableWidgetItem(product['product_name']))
-                self.products_table.setItem(row, 3, QTableWidgetItem(product['description'] or ''))
-                self.products_table.setItem(row, 4, QTableWidgetItem(f"{product['price']:.2f}"))
-                self.products_table.setItem(row, 5, QTableWidgetItem(product['unit']))
+        if hasattr(self, 'products_model'):
+            self.products_model.reset(
+                keyset_pager(self.db.product_rows, ('product_name', 'product_id'), PAGE_SIZE))
 
     def load_customers(self):
-        if self.user_type == 'admin' and not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        if hasattr(self, 'customers_table'):
-            customers = self.db.get_customers()
-            self.customers_table.setRowCount(len(customers))
-            for row, customer in enumerate(customers):
-                self.customers_table.setItem(row, 0, QTableWidgetItem(str(customer['customer_id'])))
-                self.customers_table.setItem(row, 1, QTableWidgetItem(customer['full_name']))
-                self.customers_table.setItem(row, 2, QTableWidgetItem(
-                    str(customer['birthday']) if customer['birthday'] else ''))
-                self.customers_table.setItem(row, 3, QTableWidgetItem(customer['phone']))
-                self.customers_table.setItem(row, 4, QTableWidgetItem(customer['email']))
-                self.customers_table.setItem(row, 5, QTableWidgetItem(
-                    str(customer['registration_date']) if customer['registration_date'] else ''))
-                self.customers_table.setItem(row, 6, QTableWidgetItem(customer['source_c'] or ''))
+        if hasattr(self, 'customers_model'):
+            self.customers_model.reset(
+                keyset_pager(self.db.customer_rows, ('full_name', 'customer_id'), PAGE_SIZE))
 
     def load_order_history(self):
-        if not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        if hasattr(self, 'history_table'):
-            orders = self.db.get_orders()
-            customer_orders = [order for order in orders if order['customer_id'] == self.user['customer_id']]
-
-            self.history_table.setRowCount(len(customer_orders))
-            for row, order in enumerate(customer_orders):
-                self.history_table.setItem(row, 0, QTableWidgetItem(str(order['order_id'])))
-                self.history_table.setItem(row, 1, QTableWidgetItem(str(order['order_date'])))
-                self.history_table.setItem(row, 2, QTableWidgetItem(str(order['delivery_date'])))
-                self.history_table.setItem(row, 3, QTableWidgetItem(order['delivery_address']))
-                self.history_table.setItem(row, 4, QTableWidgetItem(order['status']))
-                self.history_table.setItem(row, 5, QTableWidgetItem(f"{order['total_amount']:.2f}"))
-                self.history_table.setItem(row, 6, QTableWidgetItem(order['payment_method']))
+        if hasattr(self, 'history_model'):
+            customer_id = self.user['customer_id']
+            fetch = lambda limit, after: self.db.order_rows(limit=limit, after=after, customer_id=customer_id)
+            self.history_model.reset(keyset_pager(fetch, ('order_date', 'order_id'), PAGE_SIZE))
 
     def filter_orders(self):
-        if self.user_type == 'admin' and not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
         status = self.status_filter.currentText()
         date = self.date_filter.date().toString('yyyy-MM-dd')
-        orders = self.db.get_orders(status, date)
-        self.populate_orders_table(orders)
+        self.start_orders_paging(status, date)
 
     def show_all_orders(self):
         self.status_filter.setCurrentIndex(0)
         self.load_orders()
 
     def create_new_order(self):
-        if self.user_type == 'admin' and not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        dialog = OrderDialog(self.db, self)
+        dialog = OrderDialog(self.db, self.executor, self)
         if dialog.exec_() == QDialog.Accepted:
             self.load_orders()
 
     def edit_order(self):
-        if self.user_type == 'admin' and not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        current_row = self.orders_table.currentRow()
+        current_row = self.orders_table.currentIndex().row()
         if current_row >= 0:
-            order_id = int(self.orders_table.item(current_row, 0).text())
-            dialog = OrderDialog(self.db, self, order_id)
+            order_id = self.orders_model.row_value(current_row, 'order_id')
+            dialog = OrderDialog(self.db, self.executor, self, order_id)
             if dialog.exec_() == QDialog.Accepted:
                 self.load_orders()
         else:
             QMessageBox.warning(self, 'Внимание', 'Выберите заказ для редактирования')
 
     def show_order_details(self, order_id):
-        if self.user_type == 'admin' and not self.db.connection:
-            self.db.connect('localhost', 'root', '', 'chetochny')
-        dialog = OrderDetailsDialog(order_id, self.db, self)
+        dialog = OrderDetailsDialog(order_id, self.db, self.executor, self)
         dialog.exec_()
 
 
@@ -1098,6 +1495,8 @@ class LoginWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.db = Database()
+        self.service = BookingService(self.db)
+        self.executor = DbExecutor(parent=self)
         self.main_window = None
         self.initUI()
 
@@ -1133,7 +1532,7 @@ class LoginWindow(QMainWindow):
         self.password_input.setStyleSheet("padding: 5px; margin-bottom: 20px; border: 1px solid #ccc;")
         layout.addWidget(self.password_input)
 
-        login_button = QPushButton('Войти')
+        self.login_button = login_button = QPushButton('Войти')
         login_button.setStyleSheet("""
             QPushButton {
                 background-color: white;
@@ -1163,70 +1562,31 @@ class LoginWindow(QMainWindow):
             QMessageBox.warning(self, 'Ошибка', 'Заполните все поля')
             return
 
-        if email == 'admin' and password == 'admin':
-            user = {
-                'employee_id': 1,
-                'full_name': 'Администратор',
-                'email': 'admin',
-                'position': 'Администратор'
-            }
-            try:
-                self.main_window = MainWindow(user, 'admin', self.db)
-                self.main_window.show()
-                self.hide()
-            except Exception as e:
-                QMessageBox.critical(self, 'Ошибка', f'Ошибка при запуске главного окна: {str(e)}')
-            return
-
-        if email == 'client' and password == 'client':
-            user = {
-                'customer_id': 1,
-                'full_name': 'Иванов Иван Иванович',
-                'email': 'client',
-                'phone': '+7 (915) 000-11-22',
-                'birthday': '1985-05-15',
-                'registration_date': '2023-01-12',
-                'source_c': 'Реклама'
-            }
-            try:
-                self.main_window = MainWindow(user, 'customer', self.db)
-                self.main_window.show()
-                self.hide()
-            except Exception as e:
-                QMessageBox.critical(self, 'Ошибка', f'Ошибка при запуске главного окна: {str(e)}')
-            return
-
-        if email == 'client2' and password == 'client2':
-            user = {
-                'customer_id': 2,
-                'full_name': 'Сидорова Анна Петровна',
-                'email': 'client2',
-                'phone': '+7 (917) 000-78-90',
-                'birthday': '1980-11-30',
-                'registration_date': '2024-02-15',
-                'source_c': 'Рекомендация'
-            }
-            try:
-                self.main_window = MainWindow(user, 'customer', self.db)
-                self.main_window.show()
-                self.hide()
-            except Exception as e:
-                QMessageBox.critical(self, 'Ошибка', f'Ошибка при запуске главного окна: {str(e)}')
-            return
-
-        if not self.db.connect('localhost', 'root', '', 'chetochny'):
-            QMessageBox.warning(self, 'Ошибка', 'Не удалось подключиться к базе данных')
-            return
-
-        user = self.db.authenticate_user(email, password, 'customer')
-
-        if user:
-            self.main_window = MainWindow(user, 'customer', self.db)
+        self.login_button.setEnabled(False)
+        self.executor.submit(self.authenticate, email, password,
+                             on_done=self.on_authenticated, on_error=self.on_login_failed,
+                             on_cancel=lambda: self.login_button.setEnabled(True))
+
+    def authenticate(self, email, password):
+        if not self.db.connect():
+            raise ConnectionError('Не удалось подключиться к базе данных')
+        # Проверка хэша пароля идёт здесь, в пуле DbExecutor, а не в GUI-потоке
+        return self.service.login(email, password)
+
+    def on_authenticated(self, result):
+        self.login_button.setEnabled(True)
+        if result:
+            user, user_type = result
+            self.main_window = MainWindow(user, user_type, self.db, self.executor)
             self.main_window.show()
             self.hide()
         else:
             QMessageBox.warning(self, 'Ошибка', 'Неверный логин или пароль')
 
+    def on_login_failed(self, error):
+        self.login_button.setEnabled(True)
+        QMessageBox.warning(self, 'Ошибка', str(error))
+
 
 def main():
     app = QApplication(sys.argv)
@@ -0,0 +1,321 @@
+"""Профилирование SQL-запросов: гистограммы времени, строки, вызывающий метод, медленные запросы.
+
+Database оборачивает курсоры в InstrumentedCursor, поэтому учитываются все
+запросы — и execute_query, и выполненные внутри transaction(). Метрики
+группируются по (вызывающая функция, текст запроса) и выгружаются в JSON-файл
+(FLOWER_SHOP_METRICS_FILE) или через GET /api/metrics.
+
+    python metrics.py metrics.json --top 20
+"""
+import argparse
+import bisect
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+from queries import SELECT_RE, statement_kind
+
+log = logging.getLogger('flower_shop.sql')
+
+# Верхние границы корзин гистограммы, мс; последняя корзина — всё, что дольше
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+DEFAULT_SLOW_MS = 200
+DEFAULT_FLUSH_INTERVAL = 30
+
+# Обёртки, которые не считаются вызывающими: ищется первая функция за ними
+INTERNAL_FILES = tuple(os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+                       for name in ('metrics.py', 'backends.py', 'cache.py'))
+HELPER_FUNCTIONS = {'execute_query', 'run', 'connection', 'transaction', '_cached', '_table_fingerprint',
+                    '<lambda>', '<genexpr>', '<listcomp>', '<dictcomp>', '__enter__', '__exit__'}
+
+WHITESPACE_RE = re.compile(r'\s+')
+PLACEHOLDER_LIST_RE = re.compile(r'\(\s*%s(?:\s*,\s*%s)+\s*\)')
+
+
+def normalize_sql(sql):
+    # IN (%s, %s, ...) разной длины — один и тот же запрос
+    return PLACEHOLDER_LIST_RE.sub('(...)', WHITESPACE_RE.sub(' ', sql).strip())
+
+
+def caller_name():
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if (not code.co_filename.startswith(INTERNAL_FILES) and 'contextlib' not in code.co_filename
+                and code.co_name not in HELPER_FUNCTIONS):
+            return getattr(code, 'co_qualname', code.co_name)
+        frame = frame.f_back
+    return '?'
+
+
+class QueryStats:
+    __slots__ = ('caller', 'sql', 'count', 'errors', 'total', 'max', 'rows', 'max_rows', 'buckets', 'plan')
+
+    def __init__(self, caller, sql):
+        self.caller = caller
+        self.sql = sql
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.max_rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.plan = None
+
+    def add(self, elapsed_ms, rows, error):
+        self.count += 1
+        self.errors += error is not None
+        self.total += elapsed_ms
+        self.max = max(self.max, elapsed_ms)
+        self.rows += rows
+        self.max_rows = max(self.max_rows, rows)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+    def quantile(self, fraction):
+        # Оценка сверху по гистограмме: граница корзины, в которую попадает квантиль
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return self.max
+
+    def as_dict(self):
+        return {
+            'caller': self.caller,
+            'sql': self.sql,
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': round(self.total, 3),
+            'mean_ms': round(self.total / self.count, 3) if self.count else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'max_ms': round(self.max, 3),
+            'rows': self.rows,
+            'max_rows': self.max_rows,
+            'histogram': self.buckets,
+            'plan': self.plan,
+        }
+
+
+class QueryMetrics:
+    """Накопитель метрик запросов с журналом медленных запросов.
+
+    slow_ms — порог, после которого запрос пишется в журнал flower_shop.sql и в
+    список slow; explain_slow — снимать EXPLAIN медленного SELECT (один раз на
+    запрос); path — JSON-файл, который перезаписывается не чаще раза в
+    flush_interval секунд. hooks — функции, получающие каждое событие
+    {'caller', 'sql', 'elapsed_ms', 'rows', 'error'}.
+    """
+
+    def __init__(self, slow_ms=DEFAULT_SLOW_MS, explain_slow=False, path=None,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_slow=100, clock=time.monotonic):
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+        self.path = path
+        self.flush_interval = flush_interval
+        self.clock = clock
+        self.hooks = []
+        self._stats = {}
+        self._slow = deque(maxlen=max_slow)
+        self._lock = threading.Lock()
+        self._flushed_at = clock()
+        self._started = time.time()
+
+    @classmethod
+    def from_env(cls):
+        return cls(slow_ms=float(os.environ.get('FLOWER_SHOP_SLOW_QUERY_MS', DEFAULT_SLOW_MS)),
+                   explain_slow=os.environ.get('FLOWER_SHOP_EXPLAIN_SLOW', '') not in ('', '0'),
+                   path=os.environ.get('FLOWER_SHOP_METRICS_FILE') or None)
+
+    def record(self, sql, elapsed, rows=0, caller='?', error=None, explain=None):
+        """Учитывает выполненный запрос; explain() вызывается для медленного SELECT без плана."""
+        sql = normalize_sql(sql)
+        elapsed_ms = elapsed * 1000
+        slow = elapsed_ms >= self.slow_ms
+        with self._lock:
+            stats = self._stats.get((caller, sql))
+            if stats is None:
+                stats = self._stats[(caller, sql)] = QueryStats(caller, sql)
+            stats.add(elapsed_ms, rows, error)
+            need_plan = slow and self.explain_slow and explain and stats.plan is None and SELECT_RE.match(sql)
+
+        if slow:
+            plan = None
+            if need_plan:
+                try:
+                    plan = explain()
+                except Exception as e:
+                    plan = [{'error': str(e)}]
+                with self._lock:
+                    stats.plan = plan
+            log.warning('Медленный запрос %.1f мс, строк %d, %s: %s', elapsed_ms, rows, caller, sql)
+            with self._lock:
+                self._slow.append({'at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'caller': caller, 'sql': sql,
+                                   'elapsed_ms': round(elapsed_ms, 3), 'rows': rows,
+                                   'error': str(error) if error else None, 'plan': plan})
+
+        if self.hooks:
+            event = {'caller': caller, 'sql': sql, 'elapsed_ms': elapsed_ms, 'rows': rows, 'error': error}
+            for hook in self.hooks:
+                hook(event)
+
+        if self.path and self.clock() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def snapshot(self, top=None):
+        with self._lock:
+            queries = sorted((stats.as_dict() for stats in self._stats.values()),
+                             key=lambda row: row['total_ms'], reverse=True)
+            slow = list(self._slow)
+        return {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'uptime_s': round(time.time() - self._started, 1),
+            'pid': os.getpid(),
+            'slow_ms': self.slow_ms,
+            'buckets_ms': list(BUCKETS_MS),
+            'queries': queries[:top] if top else queries,
+            'slow': slow,
+        }
+
+    def flush(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        self._flushed_at = self.clock()
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f, ensure_ascii=False, indent=1, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning('Не удалось записать метрики запросов в %s: %s', path, e)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+
+
+class InstrumentedCursor:
+    """Курсор, который измеряет запросы для QueryMetrics.
+
+    Время запроса включает выборку строк: событие записывается при следующем
+    execute, при закрытии курсора или после fetchall(), когда известно число строк.
+    EXPLAIN медленного запроса выполняется отдельным курсором соединения conn,
+    поэтому description и результат курсора вызывающего кода не меняются.
+    """
+
+    def __init__(self, cursor, metrics, conn):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._conn = conn
+        self._pending = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _run(self, method, sql, params):
+        self._finish()
+        caller = caller_name()
+        started = time.perf_counter()
+        try:
+            result = method(sql, params)
+        except Exception as e:
+            self._metrics.record(sql, time.perf_counter() - started, 0, caller, e)
+            raise
+        select = statement_kind(sql)[0]
+        rowcount = self._cursor.rowcount
+        self._pending = [sql, params, caller, started, time.perf_counter() - started,
+                         0 if select or rowcount is None or rowcount < 0 else rowcount, select]
+        return result
+
+    def execute(self, sql, params=None):
+        return self._run(self._cursor.execute, sql, params)
+
+    def executemany(self, sql, rows):
+        return self._run(self._cursor.executemany, sql, rows)
+
+    def _fetched(self, rows, count):
+        if self._pending is not None:
+            self._pending[4] = time.perf_counter() - self._pending[3]
+            self._pending[5] += count
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._fetched(row, row is not None)
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._fetched(rows, len(rows))
+        self._finish()
+        return rows
+
+    def _finish(self):
+        if self._pending is None:
+            return
+        sql, params, caller, _, elapsed, rows, select = self._pending
+        self._pending = None
+        explain = (lambda: self._explain(sql, params)) if select else None
+        self._metrics.record(sql, elapsed, rows, caller, explain=explain)
+
+    def _explain(self, sql, params):
+        with self._conn.cursor() as cursor:
+            cursor.execute('EXPLAIN ' + sql, params or None)
+            return cursor.fetchall()
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, metrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self._conn.cursor(*args), self._metrics, self._conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Самые затратные запросы из файла метрик')
+    parser.add_argument('path', help='файл FLOWER_SHOP_METRICS_FILE')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--sort', choices=('total_ms', 'p95_ms', 'max_ms', 'count', 'rows'), default='total_ms')
+    args = parser.parse_args(argv)
+
+    with open(args.path, encoding='utf-8') as f:
+        data = json.load(f)
+    queries = sorted(data['queries'], key=lambda row: row[args.sort], reverse=True)[:args.top]
+    print(f"Снято {data['generated_at']}, порог медленного запроса {data['slow_ms']} мс, "
+          f"медленных в журнале: {len(data['slow'])}")
+    print(f'{"всего, мс":>11} {"вызовов":>8} {"сред.":>8} {"p95≤":>7} {"max":>8} {"строк":>9}  вызывающий / запрос')
+    for row in queries:
+        print(f'{row["total_ms"]:>11.1f} {row["count"]:>8} {row["mean_ms"]:>8.2f} {row["p95_ms"]:>7} '
+              f'{row["max_ms"]:>8.1f} {row["rows"]:>9}  {row["caller"]}')
+        print(f'{"":>56}{row["sql"][:140]}')
+        if row['plan']:
+            print(f'{"":>56}EXPLAIN: {json.dumps(row["plan"], ensure_ascii=False, default=str)[:300]}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+
+from database import Database
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE_RE = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+CREATE_INDEX_RE = re.compile(r'^CREATE\s+(UNIQUE\s+)?INDEX\s+(\w+)\s+ON\s+(\w+)\s*(\(.*\))$',
+                             re.IGNORECASE | re.DOTALL)
+ADD_INDEX_RE = re.compile(r'^ALTER\s+TABLE\s+(\w+)\s+ADD\s+(?:UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)',
+                          re.IGNORECASE)
+ADD_PRIMARY_KEY_RE = re.compile(r'^ALTER\s+TABLE\s+(\w+)\s+ADD\s+PRIMARY\s+KEY', re.IGNORECASE)
+ADD_COLUMN_RE = re.compile(r'^ALTER\s+TABLE\s+(\w+)\s+ADD\s+COLUMN\s+(\w+)', re.IGNORECASE)
+
+SCHEMA_VERSION_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        applied_at DATETIME NOT NULL
+    )
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, encoding='utf-8') as f:
+            self.source = f.read()
+        self.checksum = hashlib.sha256(self.source.encode('utf-8')).hexdigest()
+        self.statements = split_statements(self.source)
+
+
+def split_statements(source):
+    lines = [line for line in source.splitlines() if not line.strip().startswith('--')]
+    return [statement.strip() for statement in '\n'.join(lines).split(';') if statement.strip()]
+
+
+def load_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(directory, filename)))
+    migrations.sort(key=lambda migration: migration.version)
+
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError('Повторяющиеся номера миграций в ' + directory)
+    return migrations
+
+
+class MigrationRunner:
+    """Применяет миграции из migrations/ по порядку номеров и записывает их в schema_version.
+
+    DDL в MySQL фиксируется неявно, поэтому миграция не откатывается целиком:
+    вместо этого каждый шаг идемпотентен — уже существующие индексы, первичные
+    ключи и столбцы пропускаются, и прерванную миграцию можно просто запустить снова.
+    CREATE INDEX выполняется как ALTER TABLE ... ALGORITHM=INPLACE, LOCK=NONE,
+    чтобы таблица оставалась доступной для записи во время построения индекса.
+    """
+
+    def __init__(self, db, directory=MIGRATIONS_DIR, dry_run=False, log=print):
+        self.db = db
+        self.directory = directory
+        self.dry_run = dry_run
+        self.log = log
+
+    def applied(self, cursor):
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.tables
+            WHERE table_schema = DATABASE() AND table_name = 'schema_version'
+        """)
+        if not cursor.fetchone()['n']:
+            return {}
+        cursor.execute("SELECT version, checksum FROM schema_version")
+        return {row['version']: row['checksum'] for row in cursor.fetchall()}
+
+    def pending(self, cursor):
+        applied = self.applied(cursor)
+        pending = []
+        for migration in load_migrations(self.directory):
+            if migration.version not in applied:
+                pending.append(migration)
+            elif applied[migration.version] != migration.checksum:
+                self.log(f'Внимание: миграция {migration.version:04d}_{migration.name} '
+                         f'изменена после применения')
+        return pending
+
+    def run(self):
+        with self.db.connection() as conn:
+            with conn.cursor() as cursor:
+                if not self.dry_run:
+                    cursor.execute(SCHEMA_VERSION_DDL)
+                pending = self.pending(cursor)
+                if not pending:
+                    self.log('Схема актуальна')
+                for migration in pending:
+                    self.apply(cursor, migration)
+        return pending
+
+    def apply(self, cursor, migration):
+        self.log(f'{"[dry-run] " if self.dry_run else ""}Миграция {migration.version:04d}_{migration.name}')
+        for statement in migration.statements:
+            sql = self.plan(cursor, statement)
+            if sql is None:
+                self.log(f'  пропуск (уже применено): {first_line(statement)}')
+                continue
+            self.log(f'  {first_line(sql)}')
+            if not self.dry_run:
+                cursor.execute(sql)
+
+        if not self.dry_run:
+            cursor.execute(
+                "INSERT INTO schema_version (version, name, checksum, applied_at) VALUES (%s, %s, %s, NOW())",
+                (migration.version, migration.name, migration.checksum))
+
+    def plan(self, cursor, statement):
+        """Возвращает SQL для выполнения или None, если шаг уже применён."""
+        match = CREATE_INDEX_RE.match(statement)
+        if match:
+            unique, index, table, columns = match.groups()
+            if self.index_exists(cursor, table, index):
+                return None
+            return (f"ALTER TABLE {table} ADD {'UNIQUE ' if unique else ''}INDEX {index} {columns}, "
+                    f"ALGORITHM=INPLACE, LOCK=NONE")
+
+        match = ADD_INDEX_RE.match(statement)
+        if match and self.index_exists(cursor, match.group(1), match.group(2)):
+            return None
+
+        match = ADD_PRIMARY_KEY_RE.match(statement)
+        if match and self.index_exists(cursor, match.group(1), 'PRIMARY'):
+            return None
+
+        match = ADD_COLUMN_RE.match(statement)
+        if match and self.column_exists(cursor, match.group(1), match.group(2)):
+            return None
+
+        return statement
+
+    def index_exists(self, cursor, table, index):
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        """, (table, index))
+        return cursor.fetchone()['n'] > 0
+
+    def column_exists(self, cursor, table, column):
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """, (table, column))
+        return cursor.fetchone()['n'] > 0
+
+
+def first_line(sql):
+    return ' '.join(sql.split())[:120]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Применение миграций схемы базы данных')
+    parser.add_argument('--dsn', help='DSN базы данных (по умолчанию FLOWER_SHOP_DSN)')
+    parser.add_argument('--dry-run', action='store_true', help='только показать, что будет выполнено')
+    args = parser.parse_args(argv)
+
+    db = Database(args.dsn)
+    if db.backend.name != 'mysql':
+        # Схема SQLite создаётся целиком из flower_shop_sqlite.sql при подключении
+        print(f'Ошибка: миграции применяются только к MySQL, а не к {db.backend.name}')
+        return 1
+    try:
+        MigrationRunner(db, dry_run=args.dry_run).run()
+    except MigrationError as e:
+        print(f'Ошибка: {e}')
+        return 1
+    finally:
+        db.disconnect()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,9 @@
+-- Индексы для списка заказов и его фильтров, истории клиента, поиска и выборки доставок на день.
+-- Нужны базам, созданным из flower_shop.txt до появления в нём этих индексов.
+
+CREATE INDEX idx_orders_date ON orders (order_date, order_id);
+CREATE INDEX idx_orders_status_date ON orders (status, order_date);
+CREATE INDEX idx_orders_customer_date ON orders (customer_id, order_date);
+CREATE INDEX idx_orders_delivery_slot ON orders (delivery_date, delivery_time_from);
+CREATE INDEX idx_customers_full_name ON customers (full_name);
+CREATE INDEX idx_products_product_name ON products (product_name);
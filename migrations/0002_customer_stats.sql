@@ -0,0 +1,21 @@
+-- Сводка по клиенту для вкладки «Профиль»: число и сумма неотменённых заказов, дата последнего заказа.
+-- Поддерживается инкрементально в Database.create_orders/update_order/update_order_status.
+
+CREATE TABLE IF NOT EXISTS customer_stats (
+customer_id INT PRIMARY KEY,
+orders_count INT NOT NULL DEFAULT 0,
+total_spent DECIMAL(12, 2) NOT NULL DEFAULT 0,
+last_order_date DATETIME NULL,
+FOREIGN KEY (customer_id) REFERENCES customers(customer_id));
+
+INSERT INTO customer_stats (customer_id, orders_count, total_spent, last_order_date)
+SELECT customer_id,
+       SUM(status <> 'Отменен'),
+       SUM(CASE WHEN status <> 'Отменен' THEN total_amount ELSE 0 END),
+       MAX(order_date)
+FROM orders
+GROUP BY customer_id
+ON DUPLICATE KEY UPDATE
+    orders_count = VALUES(orders_count),
+    total_spent = VALUES(total_spent),
+    last_order_date = VALUES(last_order_date);
@@ -0,0 +1,43 @@
+-- Дневные сводки продаж для отчётов: по сотруднику и способу оплаты (sales_daily)
+-- и по товару с категорией (sales_daily_products). Отменённые заказы не учитываются.
+-- Поддерживаются инкрементально в Database при создании заказа и смене его статуса/состава.
+
+CREATE TABLE IF NOT EXISTS sales_daily (
+sale_date DATE NOT NULL,
+employee_id INT NOT NULL,
+payment_method VARCHAR(50) NOT NULL,
+orders_count INT NOT NULL DEFAULT 0,
+revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+PRIMARY KEY (sale_date, employee_id, payment_method));
+
+CREATE TABLE IF NOT EXISTS sales_daily_products (
+sale_date DATE NOT NULL,
+product_id INT NOT NULL,
+category_id INT NOT NULL,
+quantity INT NOT NULL DEFAULT 0,
+revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+PRIMARY KEY (sale_date, product_id));
+
+CREATE INDEX idx_sales_daily_products_category ON sales_daily_products (category_id, sale_date);
+
+INSERT INTO sales_daily (sale_date, employee_id, payment_method, orders_count, revenue)
+SELECT DATE(order_date), COALESCE(employee_responsible_id, 0), COALESCE(payment_method, ''),
+       COUNT(*), SUM(total_amount)
+FROM orders
+WHERE status <> 'Отменен'
+GROUP BY DATE(order_date), COALESCE(employee_responsible_id, 0), COALESCE(payment_method, '')
+ON DUPLICATE KEY UPDATE
+    sales_daily.orders_count = VALUES(orders_count),
+    sales_daily.revenue = VALUES(revenue);
+
+INSERT INTO sales_daily_products (sale_date, product_id, category_id, quantity, revenue)
+SELECT DATE(o.order_date), oi.product_id, COALESCE(p.category_id, 0),
+       SUM(oi.quantity), SUM(oi.quantity * oi.price_per_unit)
+FROM orders o
+JOIN order_items oi ON oi.order_id = o.order_id
+JOIN products p ON p.product_id = oi.product_id
+WHERE o.status <> 'Отменен'
+GROUP BY DATE(o.order_date), oi.product_id, COALESCE(p.category_id, 0)
+ON DUPLICATE KEY UPDATE
+    sales_daily_products.quantity = VALUES(quantity),
+    sales_daily_products.revenue = VALUES(revenue);
@@ -0,0 +1,4 @@
+-- Первичный ключ по product_id: резервирование в create_order блокирует ровно одну строку
+-- inventory на товар. Перед применением в inventory не должно быть повторяющихся product_id.
+
+ALTER TABLE inventory ADD PRIMARY KEY (product_id);
@@ -0,0 +1,11 @@
+-- Строки заказа с готовыми композициями. Потребность в товарах считается по текущему
+-- составу из composition_items (Database.get_composition_boms).
+
+CREATE TABLE IF NOT EXISTS order_compositions (
+order_composition_id INT AUTO_INCREMENT PRIMARY KEY,
+order_id INT NOT NULL,
+composition_id INT NOT NULL,
+quantity INT NOT NULL,
+price_per_unit DECIMAL(10, 2) NOT NULL,
+FOREIGN KEY (order_id) REFERENCES orders(order_id),
+FOREIGN KEY (composition_id) REFERENCES floral_compositions(composition_id));
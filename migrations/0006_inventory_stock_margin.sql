@@ -0,0 +1,6 @@
+-- Запас над порогом дозаказа как генерируемый столбец с индексом: товары ниже порога
+-- выбираются диапазоном по индексу (stock_margin < 0) без полного просмотра inventory.
+
+ALTER TABLE inventory ADD COLUMN stock_margin INT AS (quantity_in_stock - min_quantity_threshold) VIRTUAL;
+
+CREATE INDEX idx_inventory_stock_margin ON inventory (stock_margin);
@@ -0,0 +1,34 @@
+-- Интервалы доставки с ограничением числа заказов и счётчики занятости по дням.
+-- Заказ занимает интервал, если его delivery_time_from совпадает с началом интервала;
+-- счётчики поддерживаются в Database.create_orders/update_order/update_order_status.
+
+CREATE TABLE IF NOT EXISTS delivery_slots (
+slot_start TIME PRIMARY KEY,
+slot_end TIME NOT NULL,
+capacity INT NOT NULL);
+
+INSERT IGNORE INTO delivery_slots (slot_start, slot_end, capacity)
+VALUES ('09:00:00', '10:00:00', 4),
+('10:00:00', '11:00:00', 4),
+('11:00:00', '12:00:00', 4),
+('12:00:00', '13:00:00', 4),
+('13:00:00', '14:00:00', 4),
+('14:00:00', '15:00:00', 4),
+('15:00:00', '16:00:00', 4),
+('16:00:00', '17:00:00', 4),
+('17:00:00', '18:00:00', 4);
+
+CREATE TABLE IF NOT EXISTS delivery_slot_usage (
+delivery_date DATE NOT NULL,
+slot_start TIME NOT NULL,
+reserved INT NOT NULL DEFAULT 0,
+PRIMARY KEY (delivery_date, slot_start),
+FOREIGN KEY (slot_start) REFERENCES delivery_slots(slot_start));
+
+INSERT INTO delivery_slot_usage (delivery_date, slot_start, reserved)
+SELECT o.delivery_date, s.slot_start, COUNT(*)
+FROM orders o
+JOIN delivery_slots s ON s.slot_start = o.delivery_time_from
+WHERE o.status <> 'Отменен' AND o.delivery_date IS NOT NULL
+GROUP BY o.delivery_date, s.slot_start
+ON DUPLICATE KEY UPDATE reserved = VALUES(reserved);
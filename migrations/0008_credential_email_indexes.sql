@@ -0,0 +1,7 @@
+-- Вход ищет пользователя только по email, а пароль проверяется в приложении
+-- (credentials.verify_password), поэтому нужен индекс по email в обеих таблицах.
+-- Открытые пароли заменяются хэшами при следующем входе пользователя.
+
+CREATE INDEX idx_employees_email ON employees (email);
+
+CREATE INDEX idx_customers_email ON customers (email);
@@ -0,0 +1,7 @@
+-- Идентификатор заказа, выданный клиентом (UUID), для заказов из офлайн-очереди.
+-- Уникальный индекс не даёт создать заказ дважды, если синхронизация повторяется
+-- после обрыва связи; у заказов, оформленных онлайн, client_ref пустой.
+
+ALTER TABLE orders ADD COLUMN client_ref CHAR(36) NULL;
+
+CREATE UNIQUE INDEX idx_orders_client_ref ON orders (client_ref);
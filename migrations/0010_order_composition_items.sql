@@ -0,0 +1,24 @@
+-- Снимок состава композиции на момент оформления: количество каждого товара на
+-- одну композицию строки заказа. Возврат на склад при удалении строки или отмене,
+-- повторное резервирование и сводки продаж считаются по снимку, поэтому
+-- последующие правки composition_items не меняют уже оформленные заказы.
+
+CREATE TABLE IF NOT EXISTS order_composition_items (
+order_composition_id INT NOT NULL,
+order_id INT NOT NULL,
+product_id INT NOT NULL,
+quantity INT NOT NULL,
+PRIMARY KEY (order_composition_id, product_id),
+INDEX idx_order_composition_items_order (order_id),
+FOREIGN KEY (order_composition_id) REFERENCES order_compositions(order_composition_id),
+FOREIGN KEY (order_id) REFERENCES orders(order_id),
+FOREIGN KEY (product_id) REFERENCES products(product_id));
+
+-- Существующие строки получают снимок по текущему составу
+INSERT INTO order_composition_items (order_composition_id, order_id, product_id, quantity)
+SELECT oc.order_composition_id, oc.order_id, ci.product_id, SUM(ci.quantity)
+FROM order_compositions oc
+JOIN composition_items ci ON ci.composition_id = oc.composition_id
+WHERE NOT EXISTS (SELECT 1 FROM order_composition_items s
+                  WHERE s.order_composition_id = oc.order_composition_id)
+GROUP BY oc.order_composition_id, oc.order_id, ci.product_id;
@@ -0,0 +1,11 @@
+-- Имя клиента и название товара — первые столбцы ключей keyset-пагинации
+-- (full_name, customer_id) и (product_name, product_id). Строка с NULL в имени
+-- делает условие name > %s OR (name = %s AND id > %s) неопределённым, и листание
+-- обрывается или пропускает строки. Пустые имена хранятся как ''; индексы
+-- idx_customers_full_name и idx_products_product_name по-прежнему используются.
+
+UPDATE customers SET full_name = '' WHERE full_name IS NULL;
+ALTER TABLE customers MODIFY full_name VARCHAR(255) NOT NULL DEFAULT '';
+
+UPDATE products SET product_name = '' WHERE product_name IS NULL;
+ALTER TABLE products MODIFY product_name VARCHAR(255) NOT NULL DEFAULT '';
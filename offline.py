@@ -0,0 +1,139 @@
+import json
+import threading
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from backends import SQLiteBackend
+from paths import data_path
+
+# Файл очереди в каталоге данных пользователя (см. paths.py), а не рядом с исходниками
+QUEUE_FILE_NAME = 'offline_orders.db'
+
+QUEUE_DDL = """
+    CREATE TABLE IF NOT EXISTS pending_orders (
+        client_ref CHAR(36) PRIMARY KEY,
+        created_at DATETIME NOT NULL,
+        payload TEXT NOT NULL,
+        last_error TEXT NULL
+    )
+"""
+
+
+def encode_order(order):
+    return json.dumps(order, ensure_ascii=False, default=str)
+
+
+def decode_order(payload):
+    order = json.loads(payload)
+    for item in order['items']:
+        item['price'] = Decimal(str(item['price']))
+    return order
+
+
+class OfflineOrderQueue:
+    """Заказы, оформленные без связи с базой, в локальном файле SQLite (WAL).
+
+    Каждый заказ получает client_ref (UUID) и время оформления в момент постановки
+    в очередь. sync() переносит их в основную базу пакетами через
+    Database.create_orders; уже перенесённые client_ref пропускаются, поэтому
+    синхронизацию, прерванную обрывом связи, можно просто повторить.
+    """
+
+    def __init__(self, path=None):
+        self.backend = SQLiteBackend(path or data_path(QUEUE_FILE_NAME), schema_path=None)
+        self._conn = self.backend.connect()
+        self._lock = threading.Lock()
+        with self._conn.cursor() as cursor:
+            cursor.execute(QUEUE_DDL)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def enqueue(self, order):
+        """Сохраняет заказ (словарь параметров create_order) и возвращает его client_ref."""
+        client_ref = str(uuid.uuid4())
+        order_date = order.get('order_date') or datetime.now().replace(microsecond=0)
+        payload = encode_order({**order, 'client_ref': client_ref, 'order_date': order_date})
+        with self._lock, self._conn.cursor() as cursor:
+            cursor.execute("INSERT INTO pending_orders (client_ref, created_at, payload) VALUES (%s, %s, %s)",
+                           (client_ref, order_date, payload))
+        return client_ref
+
+    def pending(self, limit=None):
+        # Заказы, ещё не отклонённые основной базой, в порядке оформления
+        query = "SELECT payload FROM pending_orders WHERE last_error IS NULL ORDER BY created_at, client_ref"
+        params = ()
+        if limit:
+            query += " LIMIT %s"
+            params = (limit,)
+        with self._lock, self._conn.cursor() as cursor:
+            cursor.execute(query, params)
+            return [decode_order(row['payload']) for row in cursor.fetchall()]
+
+    def rejected(self):
+        # Заказы, которые основная база не приняла (нет товара, занят интервал): разбираются вручную
+        with self._lock, self._conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT client_ref, created_at, payload, last_error FROM pending_orders
+                WHERE last_error IS NOT NULL ORDER BY created_at
+            """)
+            return [{**decode_order(row['payload']), 'error': row['last_error']} for row in cursor.fetchall()]
+
+    def count(self):
+        with self._lock, self._conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) AS n FROM pending_orders WHERE last_error IS NULL")
+            return cursor.fetchone()['n']
+
+    def sync(self, db, batch_size=100):
+        """Переносит очередь в db и возвращает {'synced': число, 'rejected': {client_ref: ошибка}}.
+
+        Пакет заказов создаётся одной транзакцией create_orders. Если пакет
+        отклонён, его заказы повторяются по одному, чтобы один заказ без товара на
+        складе не задерживал остальные. Если база снова стала недоступна
+        (Database.is_unavailable), уже перенесённое фиксируется, а исключение
+        пробрасывается — оставшиеся заказы уйдут при следующей синхронизации.
+        """
+        synced = 0
+        rejected = {}
+        while True:
+            batch = self.pending(batch_size)
+            if not batch:
+                break
+            done = list(db.find_client_refs(order['client_ref'] for order in batch))
+            fresh = [order for order in batch if order['client_ref'] not in done]
+            errors = {}
+            try:
+                if fresh:
+                    db.create_orders(fresh)
+                done.extend(order['client_ref'] for order in fresh)
+            except Exception as e:
+                if db.is_unavailable(e):
+                    raise
+                for order in fresh:
+                    try:
+                        db.create_orders([order])
+                        done.append(order['client_ref'])
+                    except Exception as e:
+                        if db.is_unavailable(e):
+                            self._finish(done, errors)
+                            raise
+                        errors[order['client_ref']] = str(e)
+            self._finish(done, errors)
+            synced += len(done)
+            rejected.update(errors)
+        return {'synced': synced, 'rejected': rejected}
+
+    def _finish(self, done, errors):
+        with self._lock, self._conn.cursor() as cursor:
+            self._conn.begin()
+            try:
+                cursor.executemany("DELETE FROM pending_orders WHERE client_ref = %s",
+                                   [(client_ref,) for client_ref in done])
+                cursor.executemany("UPDATE pending_orders SET last_error = %s WHERE client_ref = %s",
+                                   [(error, client_ref) for client_ref, error in errors.items()])
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
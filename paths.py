@@ -0,0 +1,29 @@
+"""Каталог данных пользователя для файлов, которые приложение создаёт во время работы.
+
+По умолчанию — стандартный каталог данных приложений ОС (как QStandardPaths.AppDataLocation):
+%APPDATA%\\flower_shop, ~/Library/Application Support/flower_shop или
+$XDG_DATA_HOME/flower_shop (~/.local/share/flower_shop). Переменная
+FLOWER_SHOP_DATA_DIR задаёт каталог явно.
+"""
+import os
+import sys
+
+APP_NAME = 'flower_shop'
+
+
+def data_dir():
+    path = os.environ.get('FLOWER_SHOP_DATA_DIR')
+    if not path:
+        if sys.platform == 'win32':
+            base = os.environ.get('APPDATA') or os.path.expanduser('~')
+        elif sys.platform == 'darwin':
+            base = os.path.expanduser('~/Library/Application Support')
+        else:
+            base = os.environ.get('XDG_DATA_HOME') or os.path.expanduser('~/.local/share')
+        path = os.path.join(base, APP_NAME)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(name):
+    return os.path.join(data_dir(), name)
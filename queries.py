@@ -0,0 +1,164 @@
+"""Реестр именованных запросов с объявленной формой результата.
+
+Запрос регистрируется один раз при импорте: текст, признак выборки и таблица,
+запись в которую он делает, вычисляются при регистрации, а не при каждом
+вызове. Database.run() выполняет его курсором, который возвращает кортежи, и
+собирает строки фабрикой row по именам столбцов, определённым один раз на выборку.
+
+Формы результата (shape):
+    'rows'      — список строк;
+    'one'       — первая строка или None;
+    'value'     — значение первого столбца первой строки или None;
+    'rowcount'  — число изменённых строк;
+    'lastrowid' — идентификатор вставленной строки.
+
+Строки по умолчанию — записи Record: кортежи без словаря на каждую строку,
+тип которых создаётся по столбцам первой выборки запроса. record_rows(тип)
+задаёт тип записи явно, dict_rows — словари для кода, которому они нужны.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+SHAPES = ('rows', 'one', 'value', 'rowcount', 'lastrowid')
+
+SELECT_RE = re.compile(r'^\s*(?:SELECT|WITH)\b', re.IGNORECASE)
+WRITE_TABLE_RE = re.compile(r'^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)',
+                            re.IGNORECASE)
+
+
+@lru_cache(maxsize=1024)
+def statement_kind(sql):
+    """(это выборка, таблица записи или None) для текста запроса; результат кэшируется."""
+    match = WRITE_TABLE_RE.match(sql)
+    return SELECT_RE.match(sql) is not None, match.group(1).lower() if match else None
+
+
+def dict_rows(columns, rows):
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class Record(tuple):
+    """Строка-запись: значения по атрибуту (row.status), по имени столбца (row['status']) и по индексу.
+
+    Доступ по имени совместим со строками-словарями, поэтому записи можно передавать
+    в код, который читает row[key] (keyset_pager, LazyTableModel).
+    """
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            # Проверка по _fields, чтобы row['count'] не вернул метод кортежа
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key):
+        # Как у словаря: проверяется имя столбца, а не значение
+        return key in self._fields
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+    def __reduce__(self):
+        # Типы записей создаются динамически, поэтому pickle восстанавливает тип по полям
+        return unpickle_record, (type(self).__name__, self._fields, tuple(self))
+
+
+def record_type(name, fields):
+    """Класс записи с полями fields: кортеж без __dict__, как collections.namedtuple."""
+    return type(name, (Record, namedtuple(name, fields)), {'__slots__': ()})
+
+
+@lru_cache(maxsize=None)
+def _pickled_type(name, fields):
+    return record_type(name, fields)
+
+
+def unpickle_record(name, fields, values):
+    return _pickled_type(name, fields)._make(values)
+
+
+def auto_records(name):
+    """Фабрика строк, создающая тип записи по столбцам выборки и запоминающая его."""
+    typename = 'Row_' + re.sub(r'\W', '_', name)
+    types = {}
+
+    def rows(columns, values):
+        cls = types.get(columns)
+        if cls is None:
+            cls = types[columns] = record_type(typename, columns)
+        return list(map(cls._make, values))
+    return rows
+
+
+def record_rows(cls):
+    """Фабрика строк запроса, собирающая записи cls; столбцы запроса должны совпадать с полями."""
+    def rows(columns, values):
+        if columns != cls._fields:
+            raise ValueError(f'Столбцы запроса {columns} не совпадают с полями {cls.__name__}')
+        return list(map(cls._make, values))
+    return rows
+
+
+class Query:
+    __slots__ = ('name', 'sql', 'shape', 'row', 'is_select', 'table')
+
+    def __init__(self, name, sql, shape='rows', row=None):
+        if shape not in SHAPES:
+            raise ValueError(f'Неизвестная форма результата запроса {name}: {shape}')
+        self.name = name
+        self.sql = sql
+        self.shape = shape
+        # row(columns, rows) -> строки результата из кортежей курсора
+        self.row = row or auto_records(name)
+        self.is_select, self.table = statement_kind(sql)
+
+    def __repr__(self):
+        return f'Query({self.name!r}, shape={self.shape!r})'
+
+    def result(self, cursor):
+        if self.shape == 'rowcount':
+            return cursor.rowcount
+        if self.shape == 'lastrowid':
+            return cursor.lastrowid
+        # Имена столбцов читаются до fetchall(): после выборки курсор может быть переиспользован
+        columns = tuple(column[0] for column in cursor.description) if cursor.description else ()
+        rows = cursor.fetchall()
+        if self.shape == 'value':
+            return rows[0][0] if rows else None
+        rows = self.row(columns, rows)
+        if self.shape == 'one':
+            return rows[0] if rows else None
+        return rows
+
+
+class QueryRegistry:
+    def __init__(self):
+        self._queries = {}
+
+    def register(self, name, sql, shape='rows', row=None):
+        if name in self._queries:
+            raise ValueError(f'Запрос {name} уже зарегистрирован')
+        query = self._queries[name] = Query(name, sql, shape, row)
+        return query
+
+    def __getitem__(self, name):
+        return self._queries[name]
+
+    def __contains__(self, name):
+        return name in self._queries
+
+    def __iter__(self):
+        return iter(self._queries.values())
+
+    def __len__(self):
+        return len(self._queries)
+
+
+QUERIES = QueryRegistry()
+register = QUERIES.register
@@ -0,0 +1,91 @@
+from PyQt5.QtCore import Qt, QTimer, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QStandardItem, QStandardItemModel
+from PyQt5.QtWidgets import QCompleter, QLineEdit, QToolTip
+
+
+class SearchPicker(QLineEdit):
+    """Поле выбора с подсказками по мере ввода.
+
+    search(prefix) выполняется в фоне через executor не чаще, чем раз в delay мс,
+    и должен вернуть ограниченный список строк; format_item(row) даёт текст подсказки.
+    Выбранная строка доступна через currentData(). Если поиск не удался, подсказки
+    очищаются, ошибка показывается всплывающей подсказкой и передаётся в search_failed.
+    """
+
+    selected = pyqtSignal(object)
+    search_failed = pyqtSignal(object)
+
+    def __init__(self, search, executor, format_item, delay=250, parent=None):
+        super().__init__(parent)
+        self.search = search
+        self.executor = executor
+        self.format_item = format_item
+        self._data = None
+        self._task = None
+
+        self._model = QStandardItemModel(self)
+        self._completer = QCompleter(self._model, self)
+        self._completer.setCaseSensitivity(Qt.CaseInsensitive)
+        self._completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self._completer.activated[QModelIndex].connect(self._on_activated)
+        self.setCompleter(self._completer)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._start_search)
+        self.textEdited.connect(self._on_text_edited)
+
+    def currentData(self):
+        return self._data
+
+    def set_current(self, label, data):
+        self._data = data
+        self.setText(label)
+
+    def clear_selection(self):
+        self._data = None
+        self.clear()
+
+    def focusInEvent(self, event):
+        super().focusInEvent(event)
+        if self._data is None:
+            self._timer.start()
+
+    def _on_text_edited(self, text):
+        self._data = None
+        self._timer.start()
+
+    def _start_search(self):
+        if self._task:
+            self.executor.cancel(self._task)
+        prefix = self.text().strip()
+        self._task = self.executor.submit(self.search, prefix,
+                                          on_done=lambda rows: self._on_results(prefix, rows),
+                                          on_error=self._on_failed)
+
+    def _on_results(self, prefix, rows):
+        self._task = None
+        if prefix != self.text().strip():
+            return
+        self._model.clear()
+        for row in rows:
+            item = QStandardItem(self.format_item(row))
+            item.setData(row, Qt.UserRole)
+            self._model.appendRow(item)
+        if rows and self.hasFocus():
+            self._completer.complete()
+
+    def _on_failed(self, error):
+        self._task = None
+        # Прежние подсказки относятся к другому тексту и не должны оставаться в списке
+        self._model.clear()
+        self._completer.popup().hide()
+        if self.hasFocus():
+            QToolTip.showText(self.mapToGlobal(self.rect().bottomLeft()), f'Ошибка поиска: {error}', self)
+        self.search_failed.emit(error)
+
+    def _on_activated(self, index):
+        self._data = index.data(Qt.UserRole)
+        self.setText(index.data())
+        self.selected.emit(self._data)
@@ -0,0 +1,198 @@
+from datetime import date
+
+from database import CANCELLED_STATUS, COMPLETED_STATUS, is_composition, sql_text
+
+# Заказы клиентов назначаются этому сотруднику, пока администратор не сменит ответственного
+DEFAULT_EMPLOYEE_ID = 1
+PAYMENT_METHODS = ('Карта', 'Наличные', 'Онлайн')
+ORDER_STATUSES = ('В обработке', COMPLETED_STATUS, CANCELLED_STATUS)
+MAX_LINE_QUANTITY = 100
+MAX_PAGE_SIZE = 200
+
+
+class ServiceError(Exception):
+    pass
+
+
+class ValidationError(ServiceError):
+    pass
+
+
+class NotFound(ServiceError):
+    pass
+
+
+class BookingService:
+    """Сценарии оформления и просмотра заказов без зависимости от Qt.
+
+    Используется окнами main.py (через DbExecutor) и HTTP API (api.py). Методы
+    блокирующие и потокобезопасные: Database берёт соединения из пула, поэтому
+    один сервис можно вызывать из нескольких потоков одновременно.
+    """
+
+    def __init__(self, db, employee_id=DEFAULT_EMPLOYEE_ID, queue=None):
+        self.db = db
+        self.employee_id = employee_id
+        # offline.OfflineOrderQueue: куда place_order сохраняет заказ, если база недоступна
+        self.queue = queue
+
+    def login(self, email, password):
+        """(пользователь, 'admin' | 'customer') или None."""
+        if not (isinstance(email, str) and isinstance(password, str)) or not email or not password:
+            return None
+        return self.db.authenticate(email, password)
+
+    def search_products(self, prefix='', limit=20):
+        return self.db.search_products(prefix or '', page_size(limit, 20))
+
+    def compositions(self):
+        return self.db.get_compositions()
+
+    def available_slots(self, delivery_date):
+        return self.db.available_slots(parse_date(delivery_date))
+
+    def price_items(self, items):
+        """Строки заказа с ценами из базы; цены, пришедшие от клиента, не используются.
+
+        Каждая строка — {'product_id' или 'composition_id', 'quantity'}. Цены товаров
+        и композиций читаются из базы по одному запросу, а не из кэша справочников.
+        """
+        lines = check_lines(items)
+        products = self.db.get_product_prices(item['product_id'] for item in lines if not is_composition(item))
+        compositions = self.db.get_composition_prices(item['composition_id'] for item in lines
+                                                      if is_composition(item))
+
+        priced = []
+        for item in lines:
+            if is_composition(item):
+                composition = compositions.get(item['composition_id'])
+                if composition is None:
+                    raise ValidationError(f"Композиция #{item['composition_id']} не найдена")
+                priced.append({'composition_id': composition['composition_id'],
+                               'product_name': composition['composition_name'],
+                               'price': composition['price'], 'quantity': item['quantity']})
+            else:
+                product = products.get(item['product_id'])
+                if product is None:
+                    raise ValidationError(f"Товар #{item['product_id']} не найден")
+                priced.append({'product_id': product['product_id'], 'product_name': product['product_name'],
+                               'price': product['price'], 'quantity': item['quantity']})
+        return priced
+
+    def place_order(self, customer_id, delivery_date, slot_start, delivery_address, payment_method, items,
+                    slot_end=None):
+        """Оформляет заказ клиента и возвращает его номер.
+
+        Интервал доставки задаётся началом slot_start; место в нём, как и товар на
+        складе, окончательно резервируется в транзакции create_order
+        (SlotFullError, OutOfStockError).
+
+        Если у сервиса есть очередь и база недоступна, заказ с ценами из корзины
+        и концом интервала slot_end сохраняется в очередь, а возвращается None.
+        """
+        day = parse_date(delivery_date)
+        if day < date.today():
+            raise ValidationError('Дата доставки уже прошла')
+        delivery_address = delivery_address.strip() if isinstance(delivery_address, str) else ''
+        if not delivery_address:
+            raise ValidationError('Введите адрес доставки')
+        if not isinstance(payment_method, str) or payment_method not in PAYMENT_METHODS:
+            raise ValidationError('Неизвестный способ оплаты')
+        if not isinstance(slot_start, str):
+            raise ValidationError('Неизвестный интервал доставки')
+
+        check_lines(items)
+
+        slot_start = sql_text(slot_start)
+        try:
+            slot = next((slot for slot in self.db.get_delivery_slots() if slot['slot_start'] == slot_start), None)
+            if slot is None:
+                raise ValidationError('Неизвестный интервал доставки')
+
+            lines = self.price_items(items)
+            return self.db.create_order(customer_id, self.employee_id, day.isoformat(), slot['slot_start'],
+                                        slot['slot_end'], delivery_address, payment_method, lines)
+        except Exception as e:
+            if (self.queue is None or not self.db.is_unavailable(e) or slot_end is None
+                    or any(item.get('price') is None for item in items)):
+                raise
+
+        self.queue.enqueue({
+            'customer_id': customer_id,
+            'employee_id': self.employee_id,
+            'delivery_date': day.isoformat(),
+            'delivery_time_from': slot_start,
+            'delivery_time_to': sql_text(slot_end),
+            'delivery_address': delivery_address,
+            'payment_method': payment_method,
+            'items': [{key: item[key] for key in ('product_id', 'composition_id', 'quantity', 'price')
+                       if item.get(key) is not None} for item in items],
+        })
+        return None
+
+    def sync_offline_orders(self):
+        """Переносит очередь офлайн-заказов в базу (см. OfflineOrderQueue.sync)."""
+        if self.queue is None:
+            return {'synced': 0, 'rejected': {}}
+        return self.queue.sync(self.db)
+
+    def order_history(self, customer_id, limit=50, after=None):
+        return self.db.get_orders(limit=page_size(limit, 50), after=after, customer_id=customer_id)
+
+    def get_order(self, order_id, customer_id=None):
+        """Заказ со строками; клиенту (customer_id) доступны только его заказы."""
+        order = self.db.get_order(order_id)
+        if order is None or (customer_id is not None and order['customer_id'] != customer_id):
+            raise NotFound(f'Заказ #{order_id} не найден')
+        return order
+
+    def customer_stats(self, customer_id):
+        return self.db.get_customer_stats(customer_id)
+
+    def update_order_status(self, order_id, status):
+        if status not in ORDER_STATUSES:
+            raise ValidationError('Неизвестный статус заказа')
+        try:
+            self.db.update_order_status(order_id, status)
+        except ValueError as e:
+            raise NotFound(str(e))
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def check_lines(items):
+    if not isinstance(items, (list, tuple)):
+        raise ValidationError('Строки заказа должны быть списком')
+    if not items:
+        raise ValidationError('Добавьте хотя бы один товар в заказ')
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValidationError('Строка заказа должна быть объектом')
+        product_id, composition_id = item.get('product_id'), item.get('composition_id')
+        if (product_id is None) == (composition_id is None):
+            raise ValidationError('В строке заказа нужен product_id или composition_id')
+        if not is_int(product_id if product_id is not None else composition_id):
+            raise ValidationError('product_id и composition_id должны быть целыми числами')
+        quantity = item.get('quantity')
+        if not is_int(quantity) or not 0 < quantity <= MAX_LINE_QUANTITY:
+            raise ValidationError(f'Количество должно быть от 1 до {MAX_LINE_QUANTITY}')
+    return list(items)
+
+
+def parse_date(value):
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f'Некорректная дата: {value}')
+
+
+def page_size(value, default):
+    try:
+        value = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        raise ValidationError('Некорректный размер страницы')
+    return max(1, min(value, MAX_PAGE_SIZE))
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SlotIndex:
+    """Занятость интервалов доставки по дням в памяти.
+
+    День загружается из delivery_slot_usage при первом обращении, после чего
+    Database применяет к нему изменения своих зафиксированных транзакций через
+    apply(); записи других клиентов подхватываются по истечении ttl. Индекс —
+    только подсказка для интерфейса: окончательно место проверяется условным
+    UPDATE в транзакции заказа.
+    """
+
+    def __init__(self, ttl=30, max_days=62, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_days = max_days
+        self.clock = clock
+        self._slots = None
+        self._days = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def slots(self, loader):
+        """Определения интервалов [{'slot_start', 'slot_end', 'capacity'}] по возрастанию начала."""
+        now = self.clock()
+        with self._lock:
+            if self._slots is not None and self._slots['expires'] > now:
+                return self._slots['value']
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._slots = {'value': value, 'expires': now + self.ttl}
+        return value
+
+    def reserved(self, day, loader):
+        """Занятость дня {slot_start: число заказов}; loader() читает её из базы."""
+        now = self.clock()
+        with self._lock:
+            entry = self._days.get(day)
+            if entry is not None and entry['expires'] > now:
+                self._days.move_to_end(day)
+                return dict(entry['reserved'])
+            generation = self._generation
+
+        reserved = loader()
+        with self._lock:
+            # Изменения, применённые во время загрузки, могли не попасть в результат:
+            # такой день сохраняем уже устаревшим, чтобы следующее обращение перечитало его
+            expires = now + self.ttl if generation == self._generation else now
+            self._days[day] = {'reserved': dict(reserved), 'expires': expires}
+            self._days.move_to_end(day)
+            while len(self._days) > self.max_days:
+                self._days.popitem(last=False)
+        return reserved
+
+    def apply(self, usage):
+        """Применяет изменения {(day, slot_start): +n/-n} к загруженным дням."""
+        with self._lock:
+            self._generation += 1
+            for (day, slot_start), count in usage.items():
+                entry = self._days.get(day)
+                if entry is not None:
+                    reserved = entry['reserved']
+                    reserved[slot_start] = max(reserved.get(slot_start, 0) + count, 0)
+
+    def forget(self, day):
+        with self._lock:
+            self._generation += 1
+            self._days.pop(day, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._slots = None
+            self._days.clear()
@@ -0,0 +1,129 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+
+def keyset_pager(fetch, cursor_keys, page_size):
+    """Оборачивает fetch(limit=..., after=...) в функцию постраничной загрузки для LazyTableModel."""
+    def fetch_page(cursor):
+        rows = fetch(limit=page_size, after=cursor)
+        if len(rows) < page_size:
+            return rows, None
+        last = rows[-1]
+        return rows, tuple(last[key] for key in cursor_keys)
+    return fetch_page
+
+
+class LazyTableModel(QAbstractTableModel):
+    """Табличная модель только для чтения с догрузкой страниц через canFetchMore/fetchMore.
+
+    columns — список (заголовок, ключ, форматтер). Строки хранятся по столбцам
+    (один список значений на ключ), строки отображения создаются только при
+    запросе видимой ячейки. Если передан executor (workers.DbExecutor), страницы
+    загружаются в фоне, а ответы на устаревшие запросы после reset() отбрасываются.
+    """
+
+    load_failed = pyqtSignal(object)
+
+    def __init__(self, columns, fetch_page=None, executor=None, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.keys = [key for _, key, _ in columns]
+        self.fetch_page = fetch_page
+        self.executor = executor
+        self._data = {key: [] for key in self.keys}
+        self._row_count = 0
+        self._cursor = None
+        self._exhausted = fetch_page is None
+        self._loading = None
+        self._generation = 0
+
+    def reset(self, fetch_page):
+        if self._loading:
+            self.executor.cancel(self._loading)
+            self._loading = None
+        self.beginResetModel()
+        self.fetch_page = fetch_page
+        self._data = {key: [] for key in self.keys}
+        self._row_count = 0
+        self._cursor = None
+        self._exhausted = False
+        self._generation += 1
+        self.endResetModel()
+        self.fetchMore()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.columns[section][0]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        _, key, formatter = self.columns[index.column()]
+        value = self._data[key][index.row()]
+        if value is None:
+            return ''
+        return formatter(value) if formatter else str(value)
+
+    def row_value(self, row, key):
+        return self._data[key][row]
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and not self._loading
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        if self.executor is None:
+            self._append_page(self.fetch_page(self._cursor))
+            return
+
+        generation = self._generation
+        self._loading = self.executor.submit(
+            self.fetch_page, self._cursor,
+            on_done=lambda page: self._on_page_loaded(generation, page),
+            on_error=lambda error: self._on_page_failed(generation, error),
+            on_cancel=lambda: self._on_page_cancelled(generation))
+
+    def _on_page_loaded(self, generation, page):
+        if generation != self._generation:
+            return
+        self._loading = None
+        self._append_page(page)
+
+    def _on_page_cancelled(self, generation):
+        # Отменённую страницу можно запросить снова: модель не считается загружающей
+        if generation == self._generation:
+            self._loading = None
+
+    def _on_page_failed(self, generation, error):
+        if generation != self._generation:
+            return
+        self._loading = None
+        self._exhausted = True
+        self.load_failed.emit(error)
+
+    def _append_page(self, page):
+        rows, self._cursor = page
+        if self._cursor is None:
+            self._exhausted = True
+        if not rows:
+            return
+
+        self.beginInsertRows(QModelIndex(), self._row_count, self._row_count + len(rows) - 1)
+        fields = getattr(rows[0], '_fields', None)
+        if fields is not None:
+            # Записи-кортежи (queries.record_type) транспонируются в столбцы за один проход
+            columns = dict(zip(fields, zip(*rows)))
+            for key in self.keys:
+                self._data[key].extend(columns[key])
+        else:
+            for key in self.keys:
+                self._data[key].extend(row[key] for row in rows)
+        self._row_count += len(rows)
+        self.endInsertRows()
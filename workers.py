@@ -0,0 +1,103 @@
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class TaskSignals(QObject):
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    done = pyqtSignal()
+
+
+class DbTask(QRunnable):
+    """Вызов fn(*args, **kwargs) в пуле потоков; результат приходит сигналами в GUI-поток.
+
+    cancel() не прерывает уже выполняющийся запрос, но гарантирует, что его
+    результат не будет доставлен: вместо finished/failed приходит cancelled.
+    Ровно один из трёх сигналов приходит всегда, за ним — done.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = TaskSignals()
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            if self.cancelled:
+                self.signals.cancelled.emit()
+                return
+            try:
+                result = self.fn(*self.args, **self.kwargs)
+            except Exception as e:
+                if self.cancelled:
+                    self.signals.cancelled.emit()
+                else:
+                    self.signals.failed.emit(e)
+                return
+            if self.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+        finally:
+            self.signals.done.emit()
+
+
+class DbExecutor(QObject):
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, max_threads=4, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._active = set()
+        self._busy = False
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_cancel=None, **kwargs):
+        task = DbTask(fn, *args, **kwargs)
+        if on_done:
+            task.signals.finished.connect(on_done)
+        if on_error:
+            task.signals.failed.connect(on_error)
+        if on_cancel:
+            task.signals.cancelled.connect(on_cancel)
+        task.signals.done.connect(lambda: self._forget(task))
+
+        # Ссылка на задачу держится до её завершения: пул не владеет Python-объектом
+        self._active.add(task)
+        self.pool.start(task)
+        self._update_busy()
+        return task
+
+    def cancel(self, task):
+        if task.cancelled:
+            return
+        task.cancel()
+        if self.pool.tryTake(task):
+            # Задача снята из очереди и не запустится: сигналы отправляются отсюда
+            task.signals.cancelled.emit()
+            task.signals.done.emit()
+        self._update_busy()
+
+    def cancel_all(self):
+        for task in list(self._active):
+            self.cancel(task)
+
+    def is_busy(self):
+        return self._busy
+
+    def _forget(self, task):
+        self._active.discard(task)
+        self._update_busy()
+
+    def _update_busy(self):
+        busy = any(not task.cancelled for task in self._active)
+        if busy != self._busy:
+            self._busy = busy
+            self.busy_changed.emit(busy)